@@ -0,0 +1,169 @@
+"""Feed de alterações por entidade, para sincronização incremental.
+
+Cada entidade é lida em ordem de (`atualizado_em`, id), junto com os registros
+de exclusão (`remocoes`, gravados no flush que apaga o registro). A paginação é
+por keyset: o cursor guarda a chave do último item entregue e a próxima página
+começa logo depois dela, sem OFFSET.
+
+`atualizado_em` é preenchido no flush, antes do commit; uma transação mais
+lenta pode confirmar depois linhas com horário anterior a outras já
+visíveis. Por isso só são entregues linhas anteriores ao "horizonte":
+agora menos `FOLGA_SEGUNDOS` e, no Postgres, também antes do início da
+transação de escrita mais antiga ainda aberta no banco (qualquer linha que
+ela venha a gravar terá horário posterior). Transações que ainda não
+gravaram nada não contam: o que gravarem terá horário de agora em diante,
+já depois do horizonte. Tudo o que está antes do horizonte já foi
+confirmado, então um cursor nunca pula uma alteração. A folga cobre a
+diferença de relógio entre os workers e o banco.
+
+O feed fica atrasado em relação ao banco em `FOLGA_SEGUNDOS` mais, quando há
+uma transação de escrita aberta, a idade dela: uma transação de escrita que
+fique aberta por minutos segura o feed por esses minutos.
+"""
+import base64
+import heapq
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import and_, event, insert, or_, select, text
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models.models import (
+    AlocacaoCronograma, Consultor, Contato, Contrato, Cronograma, Empresa,
+    LinhaEducacional, LinhaTecnologia, Proposta, Remocao,
+)
+
+FOLGA_SEGUNDOS = float(os.getenv("ALTERACOES_FOLGA_SEGUNDOS", "5"))
+
+ENTIDADES = {
+    "empresas": Empresa,
+    "consultores": Consultor,
+    "propostas": Proposta,
+    "cronogramas": Cronograma,
+    "contratos": Contrato,
+    "alocacoes": AlocacaoCronograma,
+    "contatos": Contato,
+    "linha-tecnologia": LinhaTecnologia,
+    "linha-educacional": LinhaEducacional,
+}
+_TABELAS = {modelo.__tablename__ for modelo in ENTIDADES.values()}
+
+ALTERADO, REMOVIDO = 0, 1
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _registrar_remocoes(session: Session, flush_context):
+    removidos = [
+        {"tabela": obj.__tablename__, "registro_id": obj.id, "removido_em": datetime.utcnow()}
+        for obj in session.deleted
+        if getattr(obj, "__tablename__", None) in _TABELAS
+    ]
+    if removidos:
+        session.connection().execute(insert(Remocao), removidos)
+
+
+def codificar_cursor(chave: tuple) -> str:
+    momento, tipo, registro_id = chave
+    dados = json.dumps([momento.isoformat(), tipo, registro_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(dados.encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor: str) -> tuple:
+    """Chave (momento, tipo, id) do cursor; ValueError se for inválido"""
+    try:
+        momento, tipo, registro_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(momento), int(tipo), int(registro_id)
+    except Exception:
+        raise ValueError("Cursor inválido")
+
+
+def chave_inicial(desde: datetime) -> tuple:
+    """Chave que inclui tudo a partir de `desde` (inclusive)"""
+    if desde.tzinfo is not None:
+        desde = desde.astimezone(timezone.utc).replace(tzinfo=None)
+    return desde, -1, 0
+
+
+def horizonte(db: Session) -> datetime:
+    """Instante até o qual (exclusive) todas as alterações já estão confirmadas"""
+    limite = datetime.utcnow() - timedelta(seconds=FOLGA_SEGUNDOS)
+    if db.get_bind().dialect.name == "postgresql":
+        mais_antiga = db.execute(text(
+            "SELECT min(xact_start) AT TIME ZONE 'UTC' FROM pg_stat_activity "
+            "WHERE datname = current_database() AND pid <> pg_backend_pid() AND backend_type = 'client backend' "
+            "AND backend_xid IS NOT NULL"
+        )).scalar()
+        if mais_antiga is not None:
+            limite = min(limite, mais_antiga - timedelta(seconds=FOLGA_SEGUNDOS))
+    return limite
+
+
+def _depois_de(momento, coluna_id, tipo: int, chave: Optional[tuple]):
+    """Condição "(momento, tipo, id) > chave" para um ramo em que `tipo` é constante"""
+    if chave is None:
+        return momento.is_not(None)
+    m, t, i = chave
+    if tipo > t:
+        return momento >= m
+    if tipo < t:
+        return momento > m
+    return or_(momento > m, and_(momento == m, coluna_id > i))
+
+
+def listar_alteracoes(db: Session, entidade: str, chave: Optional[tuple], limite: int) -> dict:
+    modelo = ENTIDADES[entidade]
+    fim = horizonte(db)
+
+    alterados = db.execute(
+        select(modelo.atualizado_em, modelo.id)
+        .where(_depois_de(modelo.atualizado_em, modelo.id, ALTERADO, chave), modelo.atualizado_em < fim)
+        .order_by(modelo.atualizado_em, modelo.id)
+        .limit(limite + 1)
+    ).all()
+    removidos = db.execute(
+        select(Remocao.removido_em, Remocao.registro_id)
+        .where(
+            Remocao.tabela == modelo.__tablename__,
+            _depois_de(Remocao.removido_em, Remocao.registro_id, REMOVIDO, chave),
+            Remocao.removido_em < fim,
+        )
+        .order_by(Remocao.removido_em, Remocao.registro_id)
+        .limit(limite + 1)
+    ).all()
+
+    chaves = list(heapq.merge(
+        ((momento, ALTERADO, registro_id) for momento, registro_id in alterados),
+        ((momento, REMOVIDO, registro_id) for momento, registro_id in removidos),
+    ))
+    tem_mais = len(chaves) > limite
+    chaves = chaves[:limite]
+
+    ids = [registro_id for _, tipo, registro_id in chaves if tipo == ALTERADO]
+    registros = {}
+    if ids:
+        colunas = list(modelo.__table__.columns)
+        for linha in db.execute(select(*colunas).where(modelo.id.in_(ids))):
+            registros[linha.id] = dict(linha._mapping)
+
+    itens = []
+    for momento, tipo, registro_id in chaves:
+        if tipo == REMOVIDO:
+            itens.append({"operacao": "removido", "id": registro_id, "momento": momento})
+        elif registro_id in registros:
+            # Se o registro sumiu entre as consultas, a remoção aparece numa página seguinte
+            itens.append({"operacao": "alterado", "id": registro_id, "momento": momento, "registro": registros[registro_id]})
+
+    # Sem mais itens, a próxima leitura pode começar no horizonte (sem nunca voltar o cursor)
+    proxima = chaves[-1] if tem_mais else (fim, -1, 0)
+    if chave is not None and chave > proxima:
+        proxima = chave
+    return {
+        "entidade": entidade,
+        "itens": itens,
+        "cursor": codificar_cursor(proxima),
+        "tem_mais": tem_mais,
+        "horizonte": fim,
+    }
@@ -0,0 +1,157 @@
+"""Snapshot colunar em memória das linhas Tecnologia e Educacional para tabelas dinâmicas.
+
+O snapshot é um DataFrame com as dimensões categóricas e o valor da proposta.
+Ele é recarregado quando a versão da tabela muda neste processo (escritas pela
+API) ou quando a impressão digital da tabela (quantidade e última alteração)
+muda no banco, verificada no máximo a cada `INTERVALO_VERIFICACAO` segundos
+para enxergar escritas feitas por outros workers.
+"""
+from datetime import datetime
+import threading
+import time
+
+from fastapi import HTTPException
+from sqlalchemy import func
+
+from app.backends import obter_backend
+from app.database import SessionLocal
+from app.models.models import LinhaTecnologia, LinhaEducacional
+from app.versoes import versao
+
+DIMENSOES = ("ano", "mes", "situacao", "consultor", "porte", "er", "linha", "tipo_programa")
+SITUACAO_CONVERTIDA = "FATURADO"
+INTERVALO_VERIFICACAO = 30
+
+
+def _normalizar_mes(valor):
+    pd = obter_backend("pandas")
+    if valor is None or pd.isna(valor):
+        return None
+    try:
+        return str(int(float(valor)))
+    except (TypeError, ValueError):
+        return str(valor)
+
+
+class SnapshotLinha:
+    def __init__(self, modelo):
+        self.modelo = modelo
+        self.tabela = modelo.__tablename__
+        self._lock = threading.Lock()
+        self._df = None
+        self._versao = None
+        self._impressao = None
+        self._verificado_em = 0.0
+        self.gerado_em = None
+
+    def _impressao_digital(self, db):
+        return tuple(db.query(func.count(self.modelo.id), func.max(self.modelo.atualizado_em)).one())
+
+    def _carregar(self, db):
+        pd = obter_backend("pandas")
+        colunas = [getattr(self.modelo, d) for d in DIMENSOES] + [self.modelo.valor_proposta]
+        linhas = db.query(*colunas).all()
+        df = pd.DataFrame.from_records(linhas, columns=list(DIMENSOES) + ["valor_proposta"])
+        df["ano"] = pd.to_numeric(df["ano"], errors="coerce").astype("Int64")
+        df["mes"] = df["mes"].map(_normalizar_mes)
+        for dimensao in DIMENSOES:
+            if dimensao != "ano":
+                df[dimensao] = df[dimensao].astype("category")
+        df["valor_proposta"] = pd.to_numeric(df["valor_proposta"], errors="coerce").fillna(0.0).astype("float64")
+        df["convertido"] = (df["situacao"] == SITUACAO_CONVERTIDA).astype("int64")
+        return df
+
+    def obter(self) -> "pandas.DataFrame":
+        """Retorna o snapshot atual, recarregando-o se os dados mudaram"""
+        versao_atual = versao(self.tabela)
+        agora = time.monotonic()
+        if self._df is not None and self._versao == versao_atual and agora - self._verificado_em < INTERVALO_VERIFICACAO:
+            return self._df
+
+        with self._lock:
+            if self._df is not None and self._versao == versao_atual and agora - self._verificado_em < INTERVALO_VERIFICACAO:
+                return self._df
+            db = SessionLocal()
+            try:
+                impressao = self._impressao_digital(db)
+                if self._df is None or self._versao != versao_atual or self._impressao != impressao:
+                    self._df = self._carregar(db)
+                    self.gerado_em = datetime.now()
+                self._versao = versao_atual
+                self._impressao = impressao
+                self._verificado_em = time.monotonic()
+            finally:
+                db.close()
+            return self._df
+
+    def pivot(self, linhas: str, colunas: str = None, ano: int = None) -> dict:
+        """Totais, quantidades e conversão agrupados por uma ou duas dimensões"""
+        dimensoes = [d for d in (linhas, colunas) if d]
+        invalidas = [d for d in dimensoes if d not in DIMENSOES]
+        if invalidas:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Dimensão inválida: {', '.join(invalidas)}. Use: {', '.join(DIMENSOES)}"
+            )
+        if len(set(dimensoes)) != len(dimensoes):
+            raise HTTPException(status_code=400, detail="As dimensões devem ser diferentes")
+
+        inicio = time.perf_counter()
+        df = self.obter()
+        if ano is not None:
+            df = df[df["ano"] == ano]
+
+        agrupado = df.groupby(dimensoes, observed=True, dropna=False).agg(
+            quantidade=("valor_proposta", "size"),
+            total=("valor_proposta", "sum"),
+            convertidos=("convertido", "sum"),
+        ).reset_index()
+
+        celulas = []
+        for registro in agrupado.itertuples(index=False):
+            valores = registro._asdict()
+            quantidade = int(valores["quantidade"])
+            celula = {d: _valor_json(valores[d]) for d in dimensoes}
+            celula.update({
+                "quantidade": quantidade,
+                "total": round(float(valores["total"]), 2),
+                "convertidos": int(valores["convertidos"]),
+                "conversao": round(int(valores["convertidos"]) / quantidade * 100, 2) if quantidade else 0,
+            })
+            celulas.append(celula)
+
+        return {
+            "dimensoes": dimensoes,
+            "linhas": sorted({c[linhas] for c in celulas}, key=_ordenacao),
+            "colunas": sorted({c[colunas] for c in celulas}, key=_ordenacao) if colunas else [],
+            "celulas": celulas,
+            "totais": {
+                "quantidade": int(len(df)),
+                "total": round(float(df["valor_proposta"].sum()), 2),
+                "convertidos": int(df["convertido"].sum()),
+            },
+            "snapshot_gerado_em": self.gerado_em.isoformat() if self.gerado_em else None,
+            "tempo_ms": round((time.perf_counter() - inicio) * 1000, 3),
+        }
+
+
+def _valor_json(valor):
+    pd = obter_backend("pandas")
+    if valor is None or (not isinstance(valor, str) and pd.isna(valor)):
+        return None
+    if hasattr(valor, "item"):
+        return valor.item()
+    return valor
+
+
+def _ordenacao(valor):
+    if valor is None:
+        return (2, "")
+    if isinstance(valor, (int, float)):
+        return (0, valor)
+    texto = str(valor)
+    return (0, int(texto)) if texto.isdigit() else (1, texto)
+
+
+snapshot_tecnologia = SnapshotLinha(LinhaTecnologia)
+snapshot_educacional = SnapshotLinha(LinhaEducacional)
@@ -0,0 +1,235 @@
+"""Auditoria de propostas, contratos e alocações, gravada em segundo plano.
+
+No flush, cada registro criado, alterado ou removido vira uma entrada com os
+campos que mudaram ({campo: [antes, depois]}) e o usuário da requisição
+(`session.info["usuario_id"]`, preenchido por `get_current_user`). As entradas
+ficam na sessão até o commit (um rollback as descarta) e então vão para um
+buffer em memória. O caminho de escrita só monta o diff; quem grava no banco é
+uma tarefa de fundo que insere o buffer em lotes a cada `INTERVALO_GRAVACAO`
+segundos ou quando ele chega a `TAMANHO_LOTE` entradas.
+
+UPDATEs em massa não passam pelo flush; quem os faz registra as entradas com
+`registrar_em_massa` (a varredura de status, sem usuário).
+
+O buffer é descarregado no desligamento da aplicação (e, fora dela, na saída do
+processo). Se o banco falhar, as entradas voltam para o buffer e são tentadas de
+novo; acima de `MAX_PENDENTES` as mais antigas são descartadas com aviso.
+"""
+import asyncio
+import atexit
+import logging
+import os
+import threading
+from collections import deque
+from datetime import date, datetime
+from decimal import Decimal
+
+from sqlalchemy import event, inspect, insert
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal, engine
+from app.models.models import AlocacaoCronograma, Auditoria, Contrato, Proposta
+
+logger = logging.getLogger(__name__)
+
+INTERVALO_GRAVACAO = float(os.getenv("AUDITORIA_INTERVALO", "1"))
+TAMANHO_LOTE = int(os.getenv("AUDITORIA_TAMANHO_LOTE", "500"))
+MAX_PENDENTES = int(os.getenv("AUDITORIA_MAX_PENDENTES", "100000"))
+CHAVE_SESSAO = "auditoria_pendente"
+
+ENTIDADES = {
+    "propostas": Proposta,
+    "contratos": Contrato,
+    "alocacoes": AlocacaoCronograma,
+}
+_TABELAS = {modelo.__tablename__ for modelo in ENTIDADES.values()}
+# Preenchidos automaticamente; não interessam no diff
+CAMPOS_IGNORADOS = {"criado_em", "atualizado_em"}
+
+
+def _valor(valor):
+    if isinstance(valor, Decimal):
+        return str(valor)
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    return valor
+
+
+def _diferencas(obj, operacao: str) -> dict:
+    estado = inspect(obj)
+    diferencas = {}
+    for coluna in estado.mapper.column_attrs:
+        campo = coluna.key
+        if campo in CAMPOS_IGNORADOS or campo == "id":
+            continue
+        if operacao in ("criado", "removido"):
+            # Só o que já está carregado, sem consultar o banco dentro do flush
+            valor = estado.dict.get(campo)
+            if valor is not None:
+                diferencas[campo] = [None, _valor(valor)] if operacao == "criado" else [_valor(valor), None]
+        else:
+            historico = estado.attrs[campo].history
+            if not historico.added:
+                continue
+            antes = historico.deleted[0] if historico.deleted else None
+            depois = historico.added[0]
+            if antes != depois:
+                diferencas[campo] = [_valor(antes), _valor(depois)]
+    return diferencas
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _capturar(session: Session, flush_context):
+    usuario_id = session.info.get("usuario_id")
+    agora = datetime.utcnow()
+    entradas = []
+    for operacao, objetos in (("criado", session.new), ("alterado", session.dirty), ("removido", session.deleted)):
+        for obj in objetos:
+            if getattr(obj, "__tablename__", None) not in _TABELAS:
+                continue
+            if operacao == "alterado" and not session.is_modified(obj, include_collections=False):
+                continue
+            diferencas = _diferencas(obj, operacao)
+            if operacao == "alterado" and not diferencas:
+                continue
+            entradas.append({
+                "tabela": obj.__tablename__,
+                "registro_id": obj.id,
+                "operacao": operacao,
+                "usuario_id": usuario_id,
+                "alteracoes": diferencas,
+                "criado_em": agora,
+            })
+    if entradas:
+        session.info.setdefault(CHAVE_SESSAO, []).extend(entradas)
+
+
+def registrar_em_massa(session: Session, tabela: str, alteracoes: dict):
+    """Audita um UPDATE em massa, que o flush não vê: {registro_id: {campo: [antes, depois]}}.
+
+    Usado pelas alterações do sistema (varredura de status), sem usuário.
+    """
+    if tabela not in _TABELAS:
+        return
+    agora = datetime.utcnow()
+    session.info.setdefault(CHAVE_SESSAO, []).extend(
+        {
+            "tabela": tabela,
+            "registro_id": registro_id,
+            "operacao": "alterado",
+            "usuario_id": None,
+            "alteracoes": {campo: [_valor(antes), _valor(depois)] for campo, (antes, depois) in diferencas.items()},
+            "criado_em": agora,
+        }
+        for registro_id, diferencas in alteracoes.items()
+    )
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _confirmar(session: Session):
+    entradas = session.info.pop(CHAVE_SESSAO, None)
+    if entradas:
+        escritor_auditoria.registrar(entradas)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _descartar(session: Session):
+    session.info.pop(CHAVE_SESSAO, None)
+
+
+class EscritorAuditoria:
+    """Buffer de entradas confirmadas e a tarefa que as grava em lotes"""
+
+    def __init__(self):
+        self._pendentes = deque()
+        self._lock = threading.Lock()
+        self._gravando = threading.Lock()
+        self._loop = None
+        self._acordar = None
+        self._tarefa = None
+        self.gravadas = 0
+        self.descartadas = 0
+
+    def registrar(self, entradas: list):
+        with self._lock:
+            self._pendentes.extend(entradas)
+            excesso = len(self._pendentes) - MAX_PENDENTES
+            for _ in range(max(excesso, 0)):
+                self._pendentes.popleft()
+            tamanho = len(self._pendentes)
+        if excesso > 0:
+            self.descartadas += excesso
+            logger.warning(f"Buffer de auditoria cheio; {excesso} entradas antigas descartadas")
+        if tamanho >= TAMANHO_LOTE and self._loop is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._acordar.set)
+            except RuntimeError:
+                pass
+
+    def pendentes(self) -> int:
+        return len(self._pendentes)
+
+    def _retirar(self) -> list:
+        with self._lock:
+            return [self._pendentes.popleft() for _ in range(min(TAMANHO_LOTE, len(self._pendentes)))]
+
+    def descarregar(self):
+        """Grava tudo o que está no buffer, em lotes; bloqueante"""
+        with self._gravando:
+            while True:
+                lote = self._retirar()
+                if not lote:
+                    return
+                try:
+                    with engine.begin() as conexao:
+                        conexao.execute(insert(Auditoria), lote)
+                except Exception:
+                    with self._lock:
+                        self._pendentes.extendleft(reversed(lote))
+                    raise
+                self.gravadas += len(lote)
+
+    def iniciar(self):
+        if self._tarefa is None or self._tarefa.done():
+            self._loop = asyncio.get_running_loop()
+            self._acordar = asyncio.Event()
+            self._tarefa = self._loop.create_task(self._executar())
+
+    async def parar(self):
+        if self._tarefa is not None:
+            self._tarefa.cancel()
+            self._tarefa = None
+        self._loop = None
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self.descarregar)
+        except Exception as e:
+            logger.error(f"Erro ao gravar a auditoria no desligamento: {e}")
+
+    async def _executar(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await asyncio.wait_for(self._acordar.wait(), timeout=INTERVALO_GRAVACAO)
+            except asyncio.TimeoutError:
+                pass
+            self._acordar.clear()
+            if not self._pendentes:
+                continue
+            try:
+                await loop.run_in_executor(None, self.descarregar)
+            except Exception as e:
+                logger.error(f"Erro ao gravar a auditoria, nova tentativa em seguida: {e}")
+                await asyncio.sleep(INTERVALO_GRAVACAO * 5)
+
+
+escritor_auditoria = EscritorAuditoria()
+
+
+@atexit.register
+def _descarregar_na_saida():
+    # Scripts e processos que não passam pelo shutdown da aplicação
+    if escritor_auditoria.pendentes():
+        try:
+            escritor_auditoria.descarregar()
+        except Exception as e:
+            logger.error(f"Erro ao gravar a auditoria na saída: {e}")
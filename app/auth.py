@@ -1,7 +1,10 @@
 from datetime import datetime, timedelta
 from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
 from jose import JWTError, jwt
+import asyncio
 import bcrypt
+import weakref
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
@@ -14,15 +17,59 @@ SECRET_KEY = os.getenv("SESSION_SECRET", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 480
 
+# Custo do bcrypt para novos hashes; hashes mais fracos são refeitos no próximo login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Hashes simultâneos por worker e quanto tempo uma requisição pode esperar por uma vaga
+HASH_MAX_CONCORRENCIA = int(os.getenv("HASH_MAX_CONCORRENCIA", str(min(4, os.cpu_count() or 1))))
+HASH_TIMEOUT_FILA = float(os.getenv("HASH_TIMEOUT_FILA", "5"))
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/login")
 
+_executor_hash = ThreadPoolExecutor(max_workers=HASH_MAX_CONCORRENCIA, thread_name_prefix="bcrypt")
+_vagas_hash = weakref.WeakKeyDictionary()
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
 
 def get_password_hash(password: str) -> str:
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
     return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
 
+def precisa_rehash(hashed_password: str) -> bool:
+    """Indica se o hash foi gerado com custo menor que o configurado"""
+    try:
+        return int(hashed_password.split("$")[2]) < BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
+async def _executar_hash(funcao, *args):
+    # O bcrypt libera o GIL, então roda em paralelo no pool sem travar o event loop.
+    # A fila é limitada: quem não consegue vaga a tempo recebe 503 em vez de acumular.
+    loop = asyncio.get_running_loop()
+    vagas = _vagas_hash.get(loop)
+    if vagas is None:
+        vagas = _vagas_hash[loop] = asyncio.Semaphore(HASH_MAX_CONCORRENCIA)
+    try:
+        await asyncio.wait_for(vagas.acquire(), timeout=HASH_TIMEOUT_FILA)
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Servidor ocupado, tente novamente em instantes",
+            headers={"Retry-After": "1"},
+        )
+    try:
+        return await loop.run_in_executor(_executor_hash, funcao, *args)
+    finally:
+        vagas.release()
+
+async def verificar_senha(plain_password: str, hashed_password: str) -> bool:
+    """Versão de verify_password que não bloqueia o event loop"""
+    return await _executar_hash(verify_password, plain_password, hashed_password)
+
+async def gerar_hash_senha(password: str) -> str:
+    """Versão de get_password_hash que não bloqueia o event loop"""
+    return await _executar_hash(get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -50,6 +97,9 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     user = db.query(Usuario).filter(Usuario.email == email).first()
     if user is None:
         raise credentials_exception
+    # A rota recebe a mesma sessão (Depends(get_db) é resolvido uma vez por requisição);
+    # a auditoria usa este id para saber quem fez as alterações
+    db.info["usuario_id"] = user.id
     return user
 
 def require_role(*allowed_roles: str):
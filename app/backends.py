@@ -0,0 +1,95 @@
+"""Registro de bibliotecas pesadas carregadas sob demanda.
+
+pandas, openpyxl, reportlab e pyarrow só são usados para importar e exportar
+arquivos, mas custam segundos de import e dezenas de MB por worker. As rotas
+pedem o backend com `obter_backend(nome)` dentro da função; a primeira chamada
+faz o import e as seguintes reaproveitam o resultado.
+
+Para carregar algum backend já na subida (por exemplo, num worker dedicado a
+exportações), use BACKENDS_PRE_CARREGAR=pandas,excel,pdf,parquet ou "todos".
+"""
+import importlib
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+
+def _pandas():
+    return importlib.import_module("pandas")
+
+
+def _excel():
+    openpyxl = importlib.import_module("openpyxl")
+    estilos = importlib.import_module("openpyxl.styles")
+    return SimpleNamespace(
+        Workbook=openpyxl.Workbook,
+        load_workbook=openpyxl.load_workbook,
+        Font=estilos.Font,
+        Alignment=estilos.Alignment,
+        PatternFill=estilos.PatternFill,
+    )
+
+
+def _pdf():
+    pagesizes = importlib.import_module("reportlab.lib.pagesizes")
+    platypus = importlib.import_module("reportlab.platypus")
+    estilos = importlib.import_module("reportlab.lib.styles")
+    return SimpleNamespace(
+        colors=importlib.import_module("reportlab.lib.colors"),
+        letter=pagesizes.letter,
+        A4=pagesizes.A4,
+        landscape=pagesizes.landscape,
+        inch=importlib.import_module("reportlab.lib.units").inch,
+        TA_CENTER=importlib.import_module("reportlab.lib.enums").TA_CENTER,
+        SimpleDocTemplate=platypus.SimpleDocTemplate,
+        Table=platypus.Table,
+        TableStyle=platypus.TableStyle,
+        Paragraph=platypus.Paragraph,
+        Spacer=platypus.Spacer,
+        PageBreak=platypus.PageBreak,
+        getSampleStyleSheet=estilos.getSampleStyleSheet,
+        ParagraphStyle=estilos.ParagraphStyle,
+    )
+
+
+def _parquet():
+    pyarrow = importlib.import_module("pyarrow")
+    return SimpleNamespace(pa=pyarrow, pq=importlib.import_module("pyarrow.parquet"))
+
+
+CARREGADORES = {
+    "pandas": _pandas,
+    "excel": _excel,
+    "pdf": _pdf,
+    "parquet": _parquet,
+}
+
+_carregados = {}
+_tempos_ms = {}
+_lock = threading.Lock()
+
+
+def obter_backend(nome: str):
+    """Retorna o backend, importando-o na primeira chamada"""
+    backend = _carregados.get(nome)
+    if backend is not None:
+        return backend
+    with _lock:
+        if nome not in _carregados:
+            inicio = time.perf_counter()
+            _carregados[nome] = CARREGADORES[nome]()
+            _tempos_ms[nome] = round((time.perf_counter() - inicio) * 1000, 1)
+        return _carregados[nome]
+
+
+def estado() -> dict:
+    """Quais backends já foram carregados neste processo e quanto tempo levaram"""
+    return {nome: {"carregado": nome in _carregados, "tempo_ms": _tempos_ms.get(nome)} for nome in CARREGADORES}
+
+
+def pre_carregar(nomes: str = None):
+    nomes = nomes if nomes is not None else os.getenv("BACKENDS_PRE_CARREGAR", "")
+    lista = list(CARREGADORES) if nomes.strip() == "todos" else [n.strip() for n in nomes.split(",") if n.strip()]
+    for nome in lista:
+        obter_backend(nome)
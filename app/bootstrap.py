@@ -0,0 +1,183 @@
+"""Inicialização coordenada do banco (esquema, usuário admin, dados iniciais e backfills).
+
+Só um processo executa a inicialização: no Postgres ela roda sob um advisory
+lock e, se todas as etapas terminarem bem, grava a versão atual na tabela
+`inicializacao` (senão a próxima subida tenta de novo). Os demais
+workers apenas conferem essa versão (uma consulta) e, se outro processo estiver
+inicializando, esperam o lock e conferem de novo.
+
+Para tirar esse custo da subida dos workers, rode no deploy:
+
+    python -m app.bootstrap
+"""
+import argparse
+import hashlib
+import logging
+import os
+import sys
+import time
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from app.database import Base, SessionLocal, engine, init_db, ATUALIZACOES_ESQUEMA
+
+logger = logging.getLogger(__name__)
+
+# Incrementar quando a rotina de inicialização mudar sem alterar o esquema
+REVISAO_INICIALIZACAO = 1
+CHAVE_LOCK = 727100034
+
+
+def versao_atual() -> str:
+    """Impressão digital das tabelas, colunas e atualizações de esquema esperadas"""
+    from app.models import models  # noqa: F401 - registra os modelos no metadata
+    partes = [f"revisao:{REVISAO_INICIALIZACAO}"]
+    for tabela in sorted(Base.metadata.tables.values(), key=lambda t: t.name):
+        colunas = ",".join(f"{c.name}:{c.type}" for c in tabela.columns)
+        partes.append(f"{tabela.name}({colunas})")
+    partes.extend(ATUALIZACOES_ESQUEMA)
+    return hashlib.sha256("\n".join(partes).encode()).hexdigest()
+
+
+def esta_pronto(versao: str = None) -> bool:
+    """Verificação barata: a inicialização desta versão já foi concluída?"""
+    try:
+        with engine.connect() as conexao:
+            return conexao.execute(
+                text("SELECT 1 FROM inicializacao WHERE versao = :versao"),
+                {"versao": versao or versao_atual()}
+            ).first() is not None
+    except DBAPIError:
+        # Tabela ainda não existe
+        return False
+
+
+def criar_admin():
+    from app.auth import get_password_hash
+    from app.models.models import Usuario
+
+    admin_email = os.getenv("ADMIN_EMAIL", "admin@sistema.com")
+    admin_password = os.getenv("ADMIN_PASSWORD", "admin123")
+
+    db = SessionLocal()
+    try:
+        if not db.query(Usuario).filter(Usuario.email == admin_email).first():
+            db.add(Usuario(
+                nome="Administrador",
+                email=admin_email,
+                senha_hash=get_password_hash(admin_password),
+                funcao="Admin"
+            ))
+            db.commit()
+            print(f"✓ Usuário admin criado com email: {admin_email}")
+    finally:
+        db.close()
+
+
+def executar_inicializacao(versao: str) -> bool:
+    """Executa todas as etapas e registra a versão como concluída.
+
+    Uma etapa que falha não impede as demais, mas a versão só é registrada se
+    todas terminarem bem, para que a próxima subida tente de novo.
+    """
+    inicio = time.perf_counter()
+    init_db()
+    criar_admin()
+    falhas = []
+
+    # Importar dados iniciais das planilhas Excel (apenas se não existirem)
+    try:
+        from app.seed_data import seed_all_data
+        seed_all_data()
+    except Exception as e:
+        print(f"⚠ Erro ao importar dados iniciais: {e}")
+        falhas.append("dados iniciais")
+
+    # Preencher a chave de CNPJ normalizada em registros antigos
+    try:
+        from app.cnpj import preencher_cnpj_normalizado
+        preencher_cnpj_normalizado()
+    except Exception as e:
+        print(f"⚠ Erro ao normalizar CNPJs: {e}")
+        falhas.append("CNPJs")
+
+    # Popular o resumo mensal do BI na primeira inicialização
+    try:
+        from app.resumo_mensal import garantir_resumo
+        garantir_resumo()
+    except Exception as e:
+        print(f"⚠ Erro ao reconstruir resumo mensal: {e}")
+        falhas.append("resumo mensal")
+
+    # Preencher os contadores de tarefas dos cronogramas
+    try:
+        from app.progresso import garantir_progresso
+        garantir_progresso()
+    except Exception as e:
+        print(f"⚠ Erro ao recalcular progresso dos cronogramas: {e}")
+        falhas.append("progresso dos cronogramas")
+
+    duracao_ms = int((time.perf_counter() - inicio) * 1000)
+    if falhas:
+        print(f"⚠ Inicialização incompleta ({', '.join(falhas)}); será repetida na próxima subida")
+        return False
+    with engine.begin() as conexao:
+        conexao.execute(text("DELETE FROM inicializacao WHERE versao = :versao"), {"versao": versao})
+        conexao.execute(
+            text("INSERT INTO inicializacao (versao, concluido_em, duracao_ms) VALUES (:versao, CURRENT_TIMESTAMP, :duracao)"),
+            {"versao": versao, "duracao": duracao_ms}
+        )
+    print(f"✓ Inicialização concluída em {duracao_ms} ms")
+    return True
+
+
+def garantir_inicializacao(forcar: bool = False) -> bool:
+    """Garante que a inicialização desta versão rodou exatamente uma vez.
+
+    Retorna True se este processo executou a inicialização.
+    """
+    versao = versao_atual()
+    if not forcar and esta_pronto(versao):
+        return False
+
+    if engine.dialect.name != "postgresql":
+        executar_inicializacao(versao)
+        return True
+
+    # Conexão dedicada: o advisory lock pertence à sessão do banco
+    with engine.connect() as conexao:
+        conexao.execution_options(isolation_level="AUTOCOMMIT")
+        if not conexao.execute(text("SELECT pg_try_advisory_lock(:chave)"), {"chave": CHAVE_LOCK}).scalar():
+            print("… Aguardando outro processo concluir a inicialização")
+            conexao.execute(text("SELECT pg_advisory_lock(:chave)"), {"chave": CHAVE_LOCK})
+        try:
+            if not forcar and esta_pronto(versao):
+                return False
+            executar_inicializacao(versao)
+            return True
+        finally:
+            conexao.execute(text("SELECT pg_advisory_unlock(:chave)"), {"chave": CHAVE_LOCK})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inicializa o banco (esquema, admin, dados iniciais e backfills)")
+    parser.add_argument("--forcar", action="store_true", help="Executa mesmo se esta versão já foi inicializada")
+    parser.add_argument("--verificar", action="store_true", help="Apenas informa se a versão atual está pronta")
+    args = parser.parse_args(argv)
+
+    if args.verificar:
+        pronto = esta_pronto()
+        print("✓ Banco inicializado" if pronto else "⚠ Inicialização pendente")
+        return 0 if pronto else 1
+
+    executou = garantir_inicializacao(forcar=args.forcar)
+    if not esta_pronto():
+        return 1
+    if not executou:
+        print("✓ Banco já inicializado para esta versão")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
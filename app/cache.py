@@ -0,0 +1,55 @@
+"""Cache LRU em memória cujas entradas só valem para a versão de dados com que foram geradas."""
+from collections import OrderedDict
+import threading
+
+
+class CacheVersionado:
+    def __init__(self, max_itens: int = 256):
+        self.max_itens = max_itens
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+
+    def obter(self, chave, versao):
+        """Retorna o valor guardado para a chave ou None se não existir ou estiver desatualizado"""
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None or item[0] != versao:
+                self.falhas += 1
+                return None
+            self._itens.move_to_end(chave)
+            self.acertos += 1
+            return item[1]
+
+    def guardar(self, chave, versao, valor):
+        with self._lock:
+            self._itens[chave] = (versao, valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+    def obter_ou_calcular(self, chave, versao, calcular):
+        valor = self.obter(chave, versao)
+        if valor is None:
+            valor = calcular()
+            self.guardar(chave, versao, valor)
+        return valor
+
+    def remover(self, chave):
+        with self._lock:
+            self._itens.pop(chave, None)
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            total = self.acertos + self.falhas
+            return {
+                "itens": len(self._itens),
+                "acertos": self.acertos,
+                "falhas": self.falhas,
+                "taxa_acerto": round(self.acertos / total * 100, 2) if total else 0,
+            }
@@ -0,0 +1,172 @@
+"""Calendário de dias úteis (segunda a sexta, exceto os feriados cadastrados).
+
+O calendário é pré-calculado para um intervalo de anos: para cada data guarda
+se é dia útil e quantos dias úteis vieram antes dela, além da lista de datas
+úteis em ordem. Com isso "dias úteis entre", "somar N dias úteis" e "é dia
+útil" são consultas O(1) em memória.
+
+Fica carregado no processo e é recriado quando a tabela `feriados` muda
+(versão local) ou a cada `INTERVALO_RECARGA` segundos, para enxergar feriados
+cadastrados por outros workers. Datas fora do intervalo ampliam o calendário.
+"""
+from array import array
+from datetime import date, timedelta
+from typing import Dict, Optional
+import threading
+import time
+
+from app.database import SessionLocal
+from app.models.models import Feriado
+from app.versoes import versao
+
+ANOS_ANTES = 5
+ANOS_DEPOIS = 5
+# Datas além deste limite (em anos a partir de hoje) não ampliam o calendário
+ANOS_LIMITE = 100
+INTERVALO_RECARGA = 300
+
+# Janela dos alertas de vencimento próximo
+PRAZO_ALERTA_DIAS_UTEIS = 5
+
+
+class CalendarioUteis:
+    """Dias úteis pré-calculados de `inicio` a `fim` (inclusive)"""
+
+    def __init__(self, inicio: date, fim: date, feriados: Dict[date, str]):
+        self.inicio = inicio
+        self.fim = fim
+        self.feriados = feriados
+        total = (fim - inicio).days + 1
+        self._util = bytearray(total)
+        # _anteriores[i]: dias úteis em [inicio, inicio + i)
+        self._anteriores = array("i", bytes(4 * (total + 1)))
+        self._uteis = array("i")
+        for i in range(total):
+            dia = inicio + timedelta(days=i)
+            util = dia.weekday() < 5 and dia not in feriados
+            self._util[i] = util
+            self._anteriores[i + 1] = self._anteriores[i] + util
+            if util:
+                self._uteis.append(i)
+
+    def cobre(self, dia: date) -> bool:
+        return self.inicio <= dia <= self.fim
+
+    def _posicao(self, dia: date) -> int:
+        if not self.cobre(dia):
+            raise ValueError(f"Data fora do calendário: {dia}")
+        return (dia - self.inicio).days
+
+    def eh_dia_util(self, dia: date) -> bool:
+        return bool(self._util[self._posicao(dia)])
+
+    def dias_uteis_entre(self, inicio: date, fim: date) -> int:
+        """Dias úteis depois de `inicio` até `fim` (inclusive); negativo se `fim` vem antes"""
+        return self._anteriores[self._posicao(fim) + 1] - self._anteriores[self._posicao(inicio) + 1]
+
+    def somar_dias_uteis(self, dia: date, dias: int) -> date:
+        """Data N dias úteis depois (ou antes, se negativo) de `dia`"""
+        if dias == 0:
+            return dia
+        # Índice, em _uteis, do último dia útil até `dia`
+        indice = self._anteriores[self._posicao(dia) + 1] - 1
+        if dias < 0 and not self._util[self._posicao(dia)]:
+            indice += 1
+        alvo = indice + dias
+        if not 0 <= alvo < len(self._uteis):
+            raise ValueError(f"Data fora do calendário: {dias} dias úteis a partir de {dia}")
+        return self.inicio + timedelta(days=self._uteis[alvo])
+
+
+_lock = threading.Lock()
+_atual: Optional[CalendarioUteis] = None
+_versao = None
+_carregado_em = 0.0
+
+
+def _carregar_feriados() -> Dict[date, str]:
+    db = SessionLocal()
+    try:
+        return {data: descricao or "Feriado" for data, descricao in db.query(Feriado.data, Feriado.descricao)}
+    finally:
+        db.close()
+
+
+def obter_calendario(*datas: date) -> CalendarioUteis:
+    """Calendário atual, recarregado se os feriados mudaram e ampliado para cobrir `datas`"""
+    global _atual, _versao, _carregado_em
+    versao_atual = versao(Feriado.__tablename__)
+    calendario = _atual
+    if (
+        calendario is not None
+        and _versao == versao_atual
+        and time.monotonic() - _carregado_em < INTERVALO_RECARGA
+        and all(calendario.cobre(d) for d in datas)
+    ):
+        return calendario
+    with _lock:
+        calendario = _atual
+        recarregar = (
+            calendario is None
+            or _versao != versao_atual
+            or time.monotonic() - _carregado_em >= INTERVALO_RECARGA
+        )
+        if not recarregar and all(calendario.cobre(d) for d in datas):
+            return calendario
+        ano = date.today().year
+        for d in datas:
+            if abs(d.year - ano) > ANOS_LIMITE:
+                raise ValueError(f"Data fora do calendário: {d}")
+        inicio = min([date(ano - ANOS_ANTES, 1, 1)] + [date(d.year, 1, 1) for d in datas])
+        fim = max([date(ano + ANOS_DEPOIS, 12, 31)] + [date(d.year, 12, 31) for d in datas])
+        if calendario is not None and not recarregar:
+            inicio, fim = min(inicio, calendario.inicio), max(fim, calendario.fim)
+            feriados = calendario.feriados
+        else:
+            feriados = _carregar_feriados()
+        _atual = CalendarioUteis(inicio, fim, feriados)
+        _versao = versao_atual
+        _carregado_em = time.monotonic()
+        return _atual
+
+
+def eh_dia_util(dia: date) -> bool:
+    return obter_calendario(dia).eh_dia_util(dia)
+
+
+def dias_uteis_entre(inicio: date, fim: date) -> int:
+    """Dias úteis depois de `inicio` até `fim` (inclusive); negativo se `fim` vem antes"""
+    return obter_calendario(inicio, fim).dias_uteis_entre(inicio, fim)
+
+
+def dias_uteis_no_periodo(inicio: date, fim: date) -> int:
+    """Dias úteis de `inicio` a `fim`, incluindo os dois"""
+    if fim < inicio:
+        return 0
+    anterior = inicio - timedelta(days=1)
+    return obter_calendario(anterior, fim).dias_uteis_entre(anterior, fim)
+
+
+def somar_dias_uteis(dia: date, dias: int) -> date:
+    # Margem folgada para fins de semana e feriados
+    margem = timedelta(days=abs(dias) * 2 + 31)
+    return obter_calendario(dia - margem, dia + margem).somar_dias_uteis(dia, dias)
+
+
+def limite_alerta(hoje: Optional[date] = None) -> date:
+    """Última data da janela de "vencimento próximo" dos alertas"""
+    return somar_dias_uteis(hoje or date.today(), PRAZO_ALERTA_DIAS_UTEIS)
+
+
+def motivo_nao_util(dia: date) -> Optional[str]:
+    """Por que a data não é dia útil (feriado ou fim de semana), ou None se for"""
+    calendario = obter_calendario(dia)
+    if calendario.eh_dia_util(dia):
+        return None
+    if dia in calendario.feriados:
+        return f"feriado ({calendario.feriados[dia]})"
+    return "fim de semana"
+
+
+def texto_dias_uteis(dias: int) -> str:
+    return "1 dia útil" if dias == 1 else f"{dias} dias úteis"
@@ -0,0 +1,90 @@
+"""Cache semântico das respostas do chatbot.
+
+Perguntas com redação diferente chegam à mesma chave: o texto é normalizado
+(acentos, caixa e palavras vazias) e, quando uma intenção é reconhecida, a
+chave passa a ser a intenção com as entidades canônicas (ids de empresa e
+consultor e o período). A resposta vale enquanto as versões das tabelas lidas
+pela intenção e a data de hoje não mudarem; no Postgres essas versões também
+sobem com as escritas feitas em outros workers (`app/eventos.py`).
+"""
+from collections import Counter
+import re
+import threading
+import time
+import unicodedata
+
+from app.cache import CacheVersionado
+
+STOPWORDS = {
+    "a", "o", "as", "os", "um", "uma", "uns", "umas", "de", "da", "do", "das", "dos", "em", "no", "na",
+    "nos", "nas", "por", "pelo", "pela", "para", "pra", "com", "e", "ou", "que", "qual", "quais",
+    "quanto", "quanta", "quantos", "quantas", "me", "mostre", "mostrar", "mostra", "liste", "listar",
+    "lista", "quero", "ver", "saber", "gostaria", "poderia", "pode", "favor", "sobre",
+    "tem", "ha", "existe", "existem", "estao", "sao", "eh", "meu", "minha", "nosso", "nossa",
+    "todos", "todas",
+}
+
+
+def normalizar_pergunta(texto: str) -> str:
+    """Remove acentos, caixa, pontuação e palavras vazias, preservando a ordem das demais"""
+    texto = unicodedata.normalize("NFKD", (texto or "").lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return " ".join(p for p in re.findall(r"[a-z0-9]+", texto) if p not in STOPWORDS)
+
+
+class CacheRespostas:
+    """Cache versionado que também mede acertos por intenção e o tempo de banco economizado"""
+
+    def __init__(self, max_itens: int = 1024):
+        self._cache = CacheVersionado(max_itens)
+        self._lock = threading.Lock()
+        self.tempo_economizado = 0.0
+        self.tempo_calculando = 0.0
+        self.acertos_por_intencao = Counter()
+        self.falhas_por_intencao = Counter()
+
+    def obter(self, chave, versao, rotulo: str = None):
+        item = self._cache.obter(chave, versao)
+        if item is None:
+            return None
+        valor, duracao = item
+        with self._lock:
+            self.tempo_economizado += duracao
+            self.acertos_por_intencao[rotulo] += 1
+        return valor
+
+    def guardar(self, chave, versao, valor, duracao: float, rotulo: str = None):
+        """Guarda a resposta junto com o tempo gasto para gerá-la"""
+        self._cache.guardar(chave, versao, (valor, duracao))
+        with self._lock:
+            self.tempo_calculando += duracao
+            self.falhas_por_intencao[rotulo] += 1
+
+    def obter_ou_calcular(self, chave, versao, calcular, rotulo: str = None):
+        valor = self.obter(chave, versao, rotulo)
+        if valor is not None:
+            return valor, True
+        inicio = time.perf_counter()
+        valor = calcular()
+        self.guardar(chave, versao, valor, time.perf_counter() - inicio, rotulo)
+        return valor, False
+
+    def limpar(self):
+        self._cache.limpar()
+
+    def metricas(self) -> dict:
+        with self._lock:
+            return {
+                **self._cache.estatisticas(),
+                "tempo_economizado_ms": round(self.tempo_economizado * 1000, 3),
+                "tempo_calculando_ms": round(self.tempo_calculando * 1000, 3),
+                "por_intencao": {
+                    nome: {"acertos": self.acertos_por_intencao[nome], "falhas": self.falhas_por_intencao[nome]}
+                    for nome in sorted(set(self.acertos_por_intencao) | set(self.falhas_por_intencao), key=str)
+                },
+            }
+
+
+# Pergunta normalizada -> chave canônica (intenção + entidades), válida enquanto os nomes não mudarem
+cache_chaves = CacheVersionado(4096)
+cache_perguntas = CacheRespostas(1024)
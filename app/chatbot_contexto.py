@@ -0,0 +1,119 @@
+"""Resumo compacto dos dados usado para fundamentar as respostas do modelo de linguagem.
+
+O modelo nunca recebe tabelas brutas: apenas agregados (contagens por status,
+receita mensal do resumo_mensal, contratos a vencer etc.). O resumo e as
+respostas ficam em cache pela versão das tabelas envolvidas e pela data de hoje.
+No Postgres as versões também sobem com os commits dos outros workers
+(`app/eventos.py`), então uma escrita em qualquer worker descarta o cache.
+"""
+from datetime import date, timedelta
+import json
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.cache import CacheVersionado
+from app.chatbot_cache import CacheRespostas
+from app.models.models import Proposta, Cronograma, Contrato, Consultor, Empresa, ResumoMensal
+from app.versoes import versao
+
+TABELAS_CONTEXTO = ("propostas", "contratos", "cronogramas", "empresas", "consultores", "resumo_mensal")
+
+INSTRUCOES = (
+    "Você é o assistente do sistema de gestão de propostas, contratos e projetos. "
+    "Responda em português, de forma curta, usando somente os dados abaixo. "
+    "Se a informação não estiver nos dados, diga que não a encontrou. "
+    "Valores monetários estão em reais."
+)
+
+cache_contexto = CacheVersionado(4)
+cache_respostas = CacheRespostas(1024)
+
+
+def versao_dados() -> tuple:
+    return versao(*TABELAS_CONTEXTO) + (date.today().isoformat(),)
+
+
+def _contagem_por(db: Session, coluna) -> dict:
+    return {(chave or "Sem status"): total for chave, total in db.query(coluna, func.count()).group_by(coluna).all()}
+
+
+def montar_resumo(db: Session) -> dict:
+    hoje = date.today()
+
+    receita_mensal = (
+        db.query(ResumoMensal.ano, ResumoMensal.mes, func.sum(ResumoMensal.receita))
+        .filter(ResumoMensal.status == "Pago")
+        .group_by(ResumoMensal.ano, ResumoMensal.mes)
+        .order_by(ResumoMensal.ano.desc(), ResumoMensal.mes.desc())
+        .limit(12)
+        .all()
+    )
+    horas_mensais = (
+        db.query(ResumoMensal.ano, ResumoMensal.mes, func.sum(ResumoMensal.horas_executadas))
+        .group_by(ResumoMensal.ano, ResumoMensal.mes)
+        .having(func.sum(ResumoMensal.horas_executadas) > 0)
+        .order_by(ResumoMensal.ano.desc(), ResumoMensal.mes.desc())
+        .limit(12)
+        .all()
+    )
+
+    receita_total, receita_pendente = db.query(
+        func.coalesce(func.sum(Contrato.valor).filter(Contrato.status_pagamento == "Pago"), 0),
+        func.coalesce(func.sum(Contrato.valor).filter(Contrato.status_pagamento.in_(["Pendente", "Vencido"])), 0),
+    ).one()
+
+    contratos_vencendo = db.query(func.count(Contrato.id)).filter(
+        Contrato.data_vencimento >= hoje,
+        Contrato.data_vencimento <= hoje + timedelta(days=7),
+        Contrato.status_pagamento.in_(["Pendente", "Vencido"])
+    ).scalar()
+
+    propostas_paradas = db.query(func.count(Proposta.id)).filter(
+        Proposta.status == "Em andamento",
+        Proposta.data_proposta <= hoje - timedelta(days=30)
+    ).scalar()
+
+    valor_propostas_abertas = db.query(func.coalesce(func.sum(Proposta.valor_proposta), 0)).filter(
+        Proposta.status == "Em andamento"
+    ).scalar()
+
+    top_consultores = (
+        db.query(Consultor.nome, func.coalesce(func.sum(ResumoMensal.receita), 0))
+        .join(ResumoMensal, ResumoMensal.consultor_id == Consultor.id)
+        .filter(ResumoMensal.status == "Pago")
+        .group_by(Consultor.nome)
+        .order_by(func.sum(ResumoMensal.receita).desc())
+        .limit(5)
+        .all()
+    )
+
+    return {
+        "data_de_hoje": hoje.isoformat(),
+        "empresas_cadastradas": db.query(func.count(Empresa.id)).scalar(),
+        "consultores_ativos": db.query(func.count(Consultor.id)).filter(Consultor.ativo == True).scalar(),
+        "propostas_por_status": _contagem_por(db, Proposta.status),
+        "propostas_paradas_mais_de_30_dias": propostas_paradas,
+        "valor_propostas_em_andamento": round(float(valor_propostas_abertas), 2),
+        "contratos_por_status_pagamento": _contagem_por(db, Contrato.status_pagamento),
+        "contratos_vencendo_proximos_7_dias": contratos_vencendo,
+        "receita_total_paga": round(float(receita_total), 2),
+        "receita_pendente": round(float(receita_pendente), 2),
+        "receita_mensal_paga": {f"{mes:02d}/{ano}": round(float(total or 0), 2) for ano, mes, total in receita_mensal},
+        "receita_por_consultor": {nome: round(float(total), 2) for nome, total in top_consultores},
+        "projetos_por_status": _contagem_por(db, Cronograma.status),
+        "horas_executadas_por_mes": {f"{mes:02d}/{ano}": round(float(total or 0), 2) for ano, mes, total in horas_mensais},
+    }
+
+
+def obter_resumo(db: Session) -> dict:
+    return cache_contexto.obter_ou_calcular("resumo", versao_dados(), lambda: montar_resumo(db))
+
+
+def montar_mensagens(db: Session, pergunta: str) -> list:
+    resumo = obter_resumo(db)
+    contexto = INSTRUCOES + "\nDADOS:" + json.dumps(resumo, ensure_ascii=False, separators=(",", ":"))
+    return [
+        {"role": "system", "content": contexto},
+        {"role": "user", "content": pergunta},
+    ]
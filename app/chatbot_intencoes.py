@@ -0,0 +1,514 @@
+"""Motor de intenções do chatbot.
+
+Cada intenção declara grupos de radicais que precisam aparecer na pergunta e as
+entidades de que depende (empresa, consultor, período). A classificação é feita
+só em memória: a pergunta é normalizada, os nomes de empresas e consultores são
+procurados em índices montados uma vez por versão dos dados, e a intenção com
+maior pontuação responde com uma única consulta com joins.
+"""
+from calendar import monthrange
+from dataclasses import dataclass
+from datetime import date, timedelta
+import re
+import threading
+import time
+import unicodedata
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, or_, and_
+from sqlalchemy.orm import Session
+
+from app.chatbot_cache import cache_chaves, cache_perguntas, normalizar_pergunta
+from app.models.models import Proposta, Cronograma, Contrato, Consultor, Empresa, AlocacaoCronograma
+from app.versoes import versao
+
+MESES_NOMES = {
+    "janeiro": 1, "fevereiro": 2, "marco": 3, "abril": 4, "maio": 5, "junho": 6,
+    "julho": 7, "agosto": 8, "setembro": 9, "outubro": 10, "novembro": 11, "dezembro": 12,
+}
+
+# Palavras que não identificam uma empresa ou consultor sozinhas
+GENERICOS = {
+    "de", "da", "do", "das", "dos", "e", "em", "a", "o", "as", "os", "para", "por", "com",
+    "ltda", "sa", "me", "epp", "eireli", "cia", "industria", "industrias", "comercio",
+    "servicos", "brasil", "grupo", "empresa", "empresas", "consultor", "consultora",
+    "proposta", "propostas", "contrato", "contratos", "projeto", "projetos", "agenda",
+    "receita", "faturamento", "mes", "ano", "semana", "hoje",
+} | set(MESES_NOMES)
+
+INTERVALO_RECARGA = 300
+
+
+def normalizar(texto: str) -> str:
+    texto = unicodedata.normalize("NFKD", (texto or "").lower())
+    return "".join(c for c in texto if not unicodedata.combining(c))
+
+
+def tokens(texto: str) -> List[str]:
+    return re.findall(r"[a-z0-9]+", normalizar(texto))
+
+
+class IndiceNomes:
+    """Índice em memória de nomes (sequência completa de palavras e palavras distintivas) para ids"""
+
+    def __init__(self, tabela: str, carregar: Callable[[Session], List[Tuple[int, str, List[str]]]]):
+        self.tabela = tabela
+        self._carregar = carregar
+        self._lock = threading.Lock()
+        self._versao = None
+        self._carregado_em = 0.0
+        self.geracao = 0
+        self._por_inicio: Dict[str, List[Tuple[tuple, int]]] = {}
+        self._por_palavra: Dict[str, set] = {}
+        self.nomes: Dict[int, str] = {}
+
+    def atualizar(self, db: Session):
+        versao_atual = versao(self.tabela)
+        if self._versao == versao_atual and time.monotonic() - self._carregado_em < INTERVALO_RECARGA:
+            return
+        with self._lock:
+            if self._versao == versao_atual and time.monotonic() - self._carregado_em < INTERVALO_RECARGA:
+                return
+            por_inicio, por_palavra, nomes = {}, {}, {}
+            for id_, nome, apelidos in self._carregar(db):
+                nomes[id_] = nome
+                for texto in [nome] + [a for a in apelidos if a]:
+                    sequencia = tuple(tokens(texto))
+                    if not sequencia:
+                        continue
+                    por_inicio.setdefault(sequencia[0], []).append((sequencia, id_))
+                    for palavra in sequencia:
+                        if len(palavra) >= 4 and palavra not in GENERICOS:
+                            por_palavra.setdefault(palavra, set()).add(id_)
+            for candidatos in por_inicio.values():
+                candidatos.sort(key=lambda c: -len(c[0]))
+            self._por_inicio, self._por_palavra, self.nomes = por_inicio, por_palavra, nomes
+            self._versao = versao_atual
+            self._carregado_em = time.monotonic()
+            self.geracao += 1
+
+    def procurar(self, palavras: List[str]) -> Optional[int]:
+        """Retorna o id do nome mais longo citado por completo ou, se único, o dono de uma palavra distintiva"""
+        melhor, tamanho = None, 0
+        for i, palavra in enumerate(palavras):
+            for sequencia, id_ in self._por_inicio.get(palavra, ()):
+                if len(sequencia) > tamanho and tuple(palavras[i:i + len(sequencia)]) == sequencia:
+                    if len(sequencia) == 1 and (palavra in GENERICOS or len(palavra) < 3):
+                        continue
+                    melhor, tamanho = id_, len(sequencia)
+                    break
+        if melhor is not None:
+            return melhor
+        for palavra in palavras:
+            ids = self._por_palavra.get(palavra)
+            if ids and len(ids) == 1:
+                return next(iter(ids))
+        return None
+
+
+indice_empresas = IndiceNomes(
+    "empresas",
+    lambda db: [(id_, nome, [sigla]) for id_, nome, sigla in db.query(Empresa.id, Empresa.nome, Empresa.sigla).all()]
+)
+indice_consultores = IndiceNomes(
+    "consultores",
+    lambda db: [(id_, nome, []) for id_, nome in db.query(Consultor.id, Consultor.nome).all()]
+)
+
+
+def extrair_periodo(palavras: List[str], hoje: date) -> Optional[Tuple[date, date]]:
+    texto = " ".join(palavras)
+    ano = next((int(p) for p in palavras if len(p) == 4 and p.isdigit() and 2000 <= int(p) <= 2100), None)
+
+    for nome, numero in MESES_NOMES.items():
+        if nome in palavras:
+            ano_mes = ano or hoje.year
+            return date(ano_mes, numero, 1), date(ano_mes, numero, monthrange(ano_mes, numero)[1])
+
+    dias = re.search(r"proxim[oa]s (\d+) dias", texto)
+    if dias:
+        return hoje, hoje + timedelta(days=int(dias.group(1)))
+    if "hoje" in palavras:
+        return hoje, hoje
+    if re.search(r"(esta|essa|nesta|nessa) semana|semana atual", texto):
+        inicio = hoje - timedelta(days=hoje.weekday())
+        return inicio, inicio + timedelta(days=6)
+    if re.search(r"proxima semana|semana que vem", texto):
+        inicio = hoje - timedelta(days=hoje.weekday()) + timedelta(days=7)
+        return inicio, inicio + timedelta(days=6)
+    if re.search(r"(este|esse|neste|nesse) mes|mes atual", texto):
+        return hoje.replace(day=1), hoje.replace(day=monthrange(hoje.year, hoje.month)[1])
+    if re.search(r"proximo mes|mes que vem", texto):
+        inicio = (hoje.replace(day=1) + timedelta(days=32)).replace(day=1)
+        return inicio, inicio.replace(day=monthrange(inicio.year, inicio.month)[1])
+    if re.search(r"mes passado|ultimo mes", texto):
+        fim = hoje.replace(day=1) - timedelta(days=1)
+        return fim.replace(day=1), fim
+    if re.search(r"(este|esse|neste|nesse) ano|ano atual", texto):
+        return date(hoje.year, 1, 1), date(hoje.year, 12, 31)
+    if re.search(r"ano passado", texto):
+        return date(hoje.year - 1, 1, 1), date(hoje.year - 1, 12, 31)
+    if ano:
+        return date(ano, 1, 1), date(ano, 12, 31)
+    return None
+
+
+@dataclass
+class Entidades:
+    palavras: List[str]
+    hoje: date
+    empresa_id: Optional[int] = None
+    consultor_id: Optional[int] = None
+    periodo: Optional[Tuple[date, date]] = None
+
+    def valor(self, nome: str):
+        return {"empresa": self.empresa_id, "consultor": self.consultor_id, "periodo": self.periodo}[nome]
+
+    def tem(self, nome: str) -> bool:
+        return self.valor(nome) is not None
+
+    def chave(self, nomes: tuple) -> tuple:
+        """Forma canônica das entidades relevantes para a intenção"""
+        return tuple((nome, self.valor(nome)) for nome in nomes)
+
+
+@dataclass
+class Intencao:
+    nome: str
+    grupos: List[set]
+    responder: Callable[[Session, Entidades], dict]
+    requer: tuple = ()
+    usa: tuple = ()
+    tabelas: tuple = ()
+    exemplo: str = ""
+
+
+REGISTRO: List[Intencao] = []
+
+
+def intencao(nome: str, grupos: List[List[str]], requer: tuple = (), usa: tuple = (), tabelas: tuple = (), exemplo: str = ""):
+    """Registra uma intenção; `grupos` são listas de radicais e cada grupo precisa casar com uma palavra.
+    `tabelas` são as tabelas lidas pela resposta, usadas para invalidar o cache."""
+    def decorador(funcao):
+        REGISTRO.append(Intencao(nome, [set(g) for g in grupos], funcao, requer, usa, tabelas, exemplo))
+        return funcao
+    return decorador
+
+
+def _casa(radical: str, palavras: List[str]) -> bool:
+    # Radicais curtos (como "er") precisam ser a palavra inteira
+    if len(radical) <= 3:
+        return radical in palavras
+    return any(p.startswith(radical) for p in palavras)
+
+
+def classificar(pergunta: str, db: Session, hoje: date = None) -> Tuple[Optional[Intencao], Entidades]:
+    """Escolhe a intenção com mais grupos e entidades reconhecidos"""
+    palavras = tokens(pergunta)
+    entidades = Entidades(palavras=palavras, hoje=hoje or date.today())
+    indice_empresas.atualizar(db)
+    indice_consultores.atualizar(db)
+    entidades.consultor_id = indice_consultores.procurar(palavras)
+    entidades.empresa_id = indice_empresas.procurar(palavras)
+    entidades.periodo = extrair_periodo(palavras, entidades.hoje)
+
+    melhor, pontuacao = None, 0
+    for candidata in REGISTRO:
+        if not all(any(_casa(r, palavras) for r in grupo) for grupo in candidata.grupos):
+            continue
+        if not all(entidades.tem(e) for e in candidata.requer):
+            continue
+        pontos = 2 * len(candidata.grupos) + sum(entidades.tem(e) for e in candidata.requer + candidata.usa)
+        if pontos > pontuacao:
+            melhor, pontuacao = candidata, pontos
+    return melhor, entidades
+
+
+def _filtrar_entidades(query, entidades: Entidades, usa: tuple):
+    if "empresa" in usa and entidades.empresa_id:
+        query = query.filter(Proposta.empresa_id == entidades.empresa_id)
+    if "consultor" in usa and entidades.consultor_id:
+        query = query.filter(Proposta.consultor_id == entidades.consultor_id)
+    return query
+
+
+def _descricao_filtros(entidades: Entidades, usa: tuple) -> str:
+    partes = []
+    if "empresa" in usa and entidades.empresa_id:
+        partes.append(f"da empresa {indice_empresas.nomes.get(entidades.empresa_id)}")
+    if "consultor" in usa and entidades.consultor_id:
+        partes.append(f"do consultor {indice_consultores.nomes.get(entidades.consultor_id)}")
+    return (" " + " ".join(partes)) if partes else ""
+
+
+def _data_br(data: date) -> str:
+    return data.strftime("%d/%m/%Y")
+
+
+@intencao(
+    "contratos_vencendo",
+    [["contrat"], ["vence", "vencer", "proxim", "semana"]],
+    usa=("empresa", "consultor", "periodo"),
+    tabelas=("contratos", "propostas", "empresas"),
+    exemplo="Contratos vencendo nos próximos 7 dias"
+)
+def _contratos_vencendo(db: Session, e: Entidades) -> dict:
+    inicio, fim = e.periodo or (e.hoje, e.hoje + timedelta(days=7))
+    query = db.query(Contrato.numero_contrato, Empresa.nome, Contrato.data_vencimento, Contrato.valor).join(
+        Proposta, Proposta.id == Contrato.proposta_id
+    ).join(
+        Empresa, Empresa.id == Proposta.empresa_id
+    ).filter(
+        Contrato.data_vencimento >= inicio,
+        Contrato.data_vencimento <= fim,
+        Contrato.status_pagamento.in_(["Pendente", "Vencido"])
+    )
+    linhas = _filtrar_entidades(query, e, ("empresa", "consultor")).order_by(Contrato.data_vencimento).all()
+
+    periodo = "nos próximos 7 dias" if e.periodo is None else f"entre {_data_br(inicio)} e {_data_br(fim)}"
+    filtros = _descricao_filtros(e, ("empresa", "consultor"))
+    if not linhas:
+        return {"resposta": f"Não há contratos{filtros} vencendo {periodo}.", "dados": {"contratos": []}}
+    return {
+        "resposta": f"Encontrei {len(linhas)} contrato(s){filtros} vencendo {periodo}.",
+        "dados": {"contratos": [
+            {"numero": numero, "empresa": empresa, "vencimento": str(vencimento), "valor": float(valor or 0)}
+            for numero, empresa, vencimento, valor in linhas
+        ]}
+    }
+
+
+@intencao(
+    "contratos_vencidos_por_er",
+    [["contrat"], ["vencid", "atrasad", "inadimpl"]],
+    usa=("empresa", "consultor"),
+    tabelas=("contratos", "propostas", "empresas"),
+    exemplo="Contratos vencidos por ER"
+)
+def _contratos_vencidos_por_er(db: Session, e: Entidades) -> dict:
+    er = func.coalesce(Empresa.er, "Sem ER")
+    query = db.query(er, func.count(Contrato.id), func.coalesce(func.sum(Contrato.valor), 0)).join(
+        Proposta, Proposta.id == Contrato.proposta_id
+    ).join(
+        Empresa, Empresa.id == Proposta.empresa_id
+    ).filter(or_(
+        Contrato.status_pagamento == "Vencido",
+        and_(Contrato.status_pagamento == "Pendente", Contrato.data_vencimento < e.hoje)
+    ))
+    linhas = _filtrar_entidades(query, e, ("empresa", "consultor")).group_by(er).order_by(
+        func.sum(Contrato.valor).desc()
+    ).all()
+
+    filtros = _descricao_filtros(e, ("empresa", "consultor"))
+    if not linhas:
+        return {"resposta": f"Não há contratos vencidos{filtros}.", "dados": {"contratos_vencidos_por_er": []}}
+    total = sum(quantidade for _, quantidade, _ in linhas)
+    valor_total = sum(float(valor) for _, _, valor in linhas)
+    return {
+        "resposta": f"Há {total} contrato(s) vencido(s){filtros}, somando R$ {valor_total:,.2f}, em {len(linhas)} ER(s).",
+        "dados": {"contratos_vencidos_por_er": [
+            {"er": nome, "quantidade": quantidade, "valor": float(valor)}
+            for nome, quantidade, valor in linhas
+        ]}
+    }
+
+
+@intencao(
+    "projetos_ativos",
+    [["projet", "cronogram"], ["ativo", "ativos", "andament"]],
+    usa=("empresa", "consultor"),
+    tabelas=("cronogramas", "propostas", "empresas"),
+    exemplo="Projetos em andamento"
+)
+def _projetos_ativos(db: Session, e: Entidades) -> dict:
+    query = db.query(
+        Proposta.numero_proposta, Empresa.nome, Cronograma.percentual_conclusao, Cronograma.data_termino
+    ).join(
+        Proposta, Proposta.id == Cronograma.proposta_id
+    ).join(
+        Empresa, Empresa.id == Proposta.empresa_id
+    ).filter(Cronograma.status == "Em andamento")
+    linhas = _filtrar_entidades(query, e, ("empresa", "consultor")).order_by(Cronograma.data_termino).all()
+
+    return {
+        "resposta": f"Há {len(linhas)} projeto(s) em andamento{_descricao_filtros(e, ('empresa', 'consultor'))}.",
+        "dados": {"projetos": [
+            {
+                "numero_proposta": numero or "N/A",
+                "empresa": empresa,
+                "percentual": float(percentual or 0),
+                "termino_previsto": str(termino) if termino else "N/A"
+            }
+            for numero, empresa, percentual, termino in linhas
+        ]}
+    }
+
+
+@intencao(
+    "propostas_paradas",
+    [["propost"], ["parad", "pendent"]],
+    usa=("empresa", "consultor"),
+    tabelas=("propostas", "empresas", "consultores"),
+    exemplo="Propostas paradas há mais de 30 dias"
+)
+def _propostas_paradas(db: Session, e: Entidades) -> dict:
+    query = db.query(Proposta.numero_proposta, Empresa.nome, Consultor.nome, Proposta.data_proposta).join(
+        Empresa, Empresa.id == Proposta.empresa_id
+    ).outerjoin(
+        Consultor, Consultor.id == Proposta.consultor_id
+    ).filter(
+        Proposta.status == "Em andamento",
+        Proposta.data_proposta <= e.hoje - timedelta(days=30)
+    )
+    linhas = _filtrar_entidades(query, e, ("empresa", "consultor")).order_by(Proposta.data_proposta).all()
+
+    return {
+        "resposta": f"Encontrei {len(linhas)} proposta(s){_descricao_filtros(e, ('empresa', 'consultor'))} parada(s) há mais de 30 dias.",
+        "dados": {"propostas": [
+            {
+                "numero": numero,
+                "empresa": empresa,
+                "consultor": consultor or "N/A",
+                "dias_parada": (e.hoje - data_proposta).days if data_proposta else 0
+            }
+            for numero, empresa, consultor, data_proposta in linhas
+        ]}
+    }
+
+
+@intencao(
+    "propostas_da_empresa",
+    [["propost"]],
+    requer=("empresa",),
+    usa=("consultor", "periodo"),
+    tabelas=("propostas", "consultores"),
+    exemplo="Propostas da empresa X"
+)
+def _propostas_da_empresa(db: Session, e: Entidades) -> dict:
+    query = db.query(
+        Proposta.numero_proposta, Proposta.solucao, Proposta.status, Proposta.valor_proposta,
+        Proposta.data_proposta, Consultor.nome
+    ).outerjoin(
+        Consultor, Consultor.id == Proposta.consultor_id
+    ).filter(Proposta.empresa_id == e.empresa_id)
+    query = _filtrar_entidades(query, e, ("consultor",))
+    if e.periodo:
+        query = query.filter(Proposta.data_proposta >= e.periodo[0], Proposta.data_proposta <= e.periodo[1])
+    linhas = query.order_by(Proposta.data_proposta.desc()).all()
+
+    nome = indice_empresas.nomes.get(e.empresa_id)
+    total = sum(float(valor or 0) for _, _, _, valor, _, _ in linhas)
+    return {
+        "resposta": f"A empresa {nome} tem {len(linhas)} proposta(s), somando R$ {total:,.2f}.",
+        "dados": {"propostas_empresa": [
+            {
+                "numero": numero,
+                "solucao": solucao,
+                "status": status,
+                "valor": float(valor or 0),
+                "data": str(data_proposta) if data_proposta else "N/A",
+                "consultor": consultor or "N/A"
+            }
+            for numero, solucao, status, valor, data_proposta, consultor in linhas
+        ]}
+    }
+
+
+@intencao(
+    "agenda_consultor",
+    [["agenda", "aloca", "escala"]],
+    requer=("consultor",),
+    usa=("periodo",),
+    tabelas=("alocacoes_cronograma",),
+    exemplo="Agenda do consultor Y em novembro"
+)
+def _agenda_consultor(db: Session, e: Entidades) -> dict:
+    inicio, fim = e.periodo or (e.hoje.replace(day=1), e.hoje.replace(day=monthrange(e.hoje.year, e.hoje.month)[1]))
+    linhas = db.query(
+        AlocacaoCronograma.data, AlocacaoCronograma.periodo, AlocacaoCronograma.codigo_projeto,
+        AlocacaoCronograma.observacao
+    ).filter(
+        AlocacaoCronograma.consultor_id == e.consultor_id,
+        AlocacaoCronograma.data >= inicio,
+        AlocacaoCronograma.data <= fim
+    ).order_by(AlocacaoCronograma.data, AlocacaoCronograma.periodo).all()
+
+    nome = indice_consultores.nomes.get(e.consultor_id)
+    return {
+        "resposta": f"{nome} tem {len(linhas)} período(s) alocado(s) entre {_data_br(inicio)} e {_data_br(fim)}.",
+        "dados": {"agenda": [
+            {
+                "data": str(data),
+                "periodo": "Manhã" if periodo == "M" else "Tarde",
+                "projeto": projeto or "-",
+                "observacao": observacao or ""
+            }
+            for data, periodo, projeto, observacao in linhas
+        ]}
+    }
+
+
+@intencao(
+    "receita",
+    [["receita", "faturament", "faturad"]],
+    usa=("empresa", "consultor", "periodo"),
+    tabelas=("contratos", "propostas"),
+    exemplo="Receita do consultor Y este ano"
+)
+def _receita(db: Session, e: Entidades) -> dict:
+    inicio, fim = e.periodo or (e.hoje.replace(day=1), e.hoje.replace(day=monthrange(e.hoje.year, e.hoje.month)[1]))
+    no_periodo = and_(Contrato.data_assinatura >= inicio, Contrato.data_assinatura <= fim)
+    query = db.query(
+        func.coalesce(func.sum(Contrato.valor), 0),
+        func.coalesce(func.sum(Contrato.valor).filter(no_periodo), 0)
+    ).join(
+        Proposta, Proposta.id == Contrato.proposta_id
+    ).filter(Contrato.status_pagamento == "Pago")
+    receita_total, receita_periodo = _filtrar_entidades(query, e, ("empresa", "consultor")).one()
+
+    filtros = _descricao_filtros(e, ("empresa", "consultor"))
+    rotulo = "este mês" if e.periodo is None else f"de {_data_br(inicio)} a {_data_br(fim)}"
+    return {
+        "resposta": f"Receita total{filtros}: R$ {float(receita_total):,.2f} | Receita {rotulo}: R$ {float(receita_periodo):,.2f}",
+        "dados": {
+            "receita_total": float(receita_total),
+            "receita_mes" if e.periodo is None else "receita_periodo": float(receita_periodo)
+        }
+    }
+
+
+def responder(pergunta: str, db: Session, hoje: date = None) -> Optional[dict]:
+    """Classifica a pergunta e executa a intenção; retorna None se nenhuma intenção reconhecer a pergunta.
+
+    A classificação e a resposta passam pelo cache semântico, de modo que a
+    mesma pergunta com outra redação é respondida da memória.
+    """
+    hoje = hoje or date.today()
+    indice_empresas.atualizar(db)
+    indice_consultores.atualizar(db)
+
+    versao_nomes = (indice_empresas.geracao, indice_consultores.geracao, hoje)
+    normalizada = normalizar_pergunta(pergunta)
+    classificada = cache_chaves.obter(normalizada, versao_nomes)
+    if classificada is None:
+        classificada = classificar(pergunta, db, hoje)
+        cache_chaves.guardar(normalizada, versao_nomes, classificada)
+    escolhida, entidades = classificada
+    if escolhida is None:
+        return None
+
+    def calcular():
+        resultado = escolhida.responder(db, entidades)
+        resultado["intencao"] = escolhida.nome
+        return resultado
+
+    # As respostas citam nomes dos índices, então a geração deles também entra na versão
+    chave = (escolhida.nome, entidades.chave(escolhida.requer + escolhida.usa))
+    resultado, _ = cache_perguntas.obter_ou_calcular(
+        chave, versao(*escolhida.tabelas) + versao_nomes, calcular, rotulo=escolhida.nome
+    )
+    return resultado
+
+
+def sugestoes() -> List[str]:
+    return [i.exemplo for i in REGISTRO if i.exemplo]
@@ -0,0 +1,61 @@
+"""Normalização de CNPJ para a chave de 14 dígitos usada nas junções entre entidades."""
+import re
+from typing import Optional
+
+_NAO_DIGITOS = re.compile(r"\D")
+_DECIMAL_ZERO = re.compile(r"^\s*(\d+)\.0+\s*$")
+
+
+def normalizar_cnpj(valor) -> Optional[str]:
+    """Retorna o CNPJ com 14 dígitos (zeros à esquerda) ou None se não houver um CNPJ válido"""
+    if valor is None:
+        return None
+    if isinstance(valor, float):
+        if valor != valor:  # NaN
+            return None
+        valor = int(valor)
+    texto = str(valor)
+    # Planilhas às vezes trazem o CNPJ como número ("12345678000190.0")
+    decimal = _DECIMAL_ZERO.match(texto)
+    if decimal:
+        texto = decimal.group(1)
+    digitos = _NAO_DIGITOS.sub("", texto)
+    if not digitos or len(digitos) > 14 or not digitos.strip("0"):
+        return None
+    return digitos.zfill(14)
+
+
+def preencher_cnpj_normalizado(lote: int = 1000) -> dict:
+    """Preenche `cnpj_normalizado` nas linhas antigas, em lotes por ordem de id"""
+    from sqlalchemy import update
+    from app.database import SessionLocal
+    from app.models.models import MODELOS_COM_CNPJ
+
+    atualizados = {}
+    db = SessionLocal()
+    try:
+        for modelo in MODELOS_COM_CNPJ:
+            total = 0
+            ultimo_id = 0
+            while True:
+                linhas = db.query(modelo.id, modelo.cnpj).filter(
+                    modelo.id > ultimo_id,
+                    modelo.cnpj_normalizado.is_(None),
+                    modelo.cnpj.isnot(None)
+                ).order_by(modelo.id).limit(lote).all()
+                if not linhas:
+                    break
+                ultimo_id = linhas[-1].id
+                valores = [
+                    {"id": linha.id, "cnpj_normalizado": normalizar_cnpj(linha.cnpj)}
+                    for linha in linhas
+                ]
+                valores = [v for v in valores if v["cnpj_normalizado"]]
+                if valores:
+                    db.execute(update(modelo), valores)
+                db.commit()
+                total += len(valores)
+            atualizados[modelo.__tablename__] = total
+    finally:
+        db.close()
+    return atualizados
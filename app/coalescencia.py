@@ -0,0 +1,113 @@
+"""Requisições idênticas e simultâneas compartilham uma única execução.
+
+Rotas caras de leitura (BI, alertas, relatórios) recebem `@coalescer` logo
+abaixo do `@router.get`. A chave é a rota, os parâmetros e o escopo do
+usuário (função e consultor). Se já existe uma execução em andamento para
+a mesma chave, a requisição só espera o resultado dela. Não há cache: a
+primeira requisição que chega depois do fim da execução calcula de novo.
+
+Essas rotas fazem consultas síncronas, então o cálculo roda numa thread (com
+um event loop próprio para a corrotina da rota); assim o loop principal
+continua livre para receber as requisições que vão se juntar a ele. Respostas
+em arquivo (PDF, Excel) são lidas inteiras uma vez e cada requisição recebe
+uma cópia.
+"""
+import asyncio
+import functools
+import threading
+
+from fastapi.responses import Response, StreamingResponse
+
+# Argumentos da rota que não fazem parte da chave
+IGNORADOS = {"db", "current_user"}
+
+
+class _Corpo:
+    """Resposta já materializada, para ser entregue a várias requisições"""
+
+    def __init__(self, conteudo: bytes, status_code: int, headers: dict, media_type: str):
+        self.conteudo = conteudo
+        self.status_code = status_code
+        self.headers = headers
+        self.media_type = media_type
+
+    def resposta(self) -> Response:
+        return Response(self.conteudo, status_code=self.status_code, headers=self.headers, media_type=self.media_type)
+
+
+class Coalescedor:
+    def __init__(self):
+        self._em_andamento = {}
+        self._lock = threading.Lock()
+        self._contadores = {}
+
+    def _contar(self, rota: str, campo: str):
+        with self._lock:
+            contadores = self._contadores.setdefault(rota, {"execucoes": 0, "coalescidas": 0})
+            contadores[campo] += 1
+
+    async def executar(self, rota: str, chave: tuple, calcular):
+        """Resultado de `calcular()` (bloqueante), compartilhado entre chamadas simultâneas com a mesma chave"""
+        futuro = self._em_andamento.get(chave)
+        if futuro is None:
+            self._contar(rota, "execucoes")
+            futuro = asyncio.get_running_loop().run_in_executor(None, calcular)
+            self._em_andamento[chave] = futuro
+            futuro.add_done_callback(lambda _: self._em_andamento.pop(chave, None))
+        else:
+            self._contar(rota, "coalescidas")
+        # shield: se um cliente desistir, os demais continuam esperando o mesmo cálculo
+        return await asyncio.shield(futuro)
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            rotas = {rota: dict(c) for rota, c in self._contadores.items()}
+        execucoes = sum(c["execucoes"] for c in rotas.values())
+        coalescidas = sum(c["coalescidas"] for c in rotas.values())
+        return {
+            "em_andamento": len(self._em_andamento),
+            "execucoes": execucoes,
+            "coalescidas": coalescidas,
+            "rotas": rotas,
+        }
+
+
+coalescedor = Coalescedor()
+
+
+def _escopo(usuario) -> tuple:
+    if usuario is None:
+        return ()
+    return (getattr(usuario, "funcao", None), getattr(usuario, "consultor_id", None))
+
+
+async def _materializar(resultado):
+    if isinstance(resultado, StreamingResponse):
+        conteudo = b"".join([parte async for parte in resultado.body_iterator])
+    elif isinstance(resultado, Response):
+        conteudo = resultado.body
+    else:
+        return resultado
+    headers = {
+        nome: valor for nome, valor in resultado.headers.items()
+        if nome.lower() not in ("content-length", "content-type")
+    }
+    return _Corpo(conteudo, resultado.status_code, headers, resultado.media_type)
+
+
+def coalescer(funcao):
+    """Decorador de rota: chamadas simultâneas com os mesmos parâmetros e escopo compartilham a execução"""
+    rota = f"{funcao.__module__.rsplit('.', 1)[-1]}.{funcao.__name__}"
+
+    @functools.wraps(funcao)
+    async def envoltorio(*args, **kwargs):
+        parametros = tuple(sorted((nome, repr(valor)) for nome, valor in kwargs.items() if nome not in IGNORADOS))
+        chave = (rota, parametros, _escopo(kwargs.get("current_user")))
+
+        async def _executar():
+            return await _materializar(await funcao(*args, **kwargs))
+
+        resultado = await coalescedor.executar(rota, chave, lambda: asyncio.run(_executar()))
+        return resultado.resposta() if isinstance(resultado, _Corpo) else resultado
+
+    return envoltorio
@@ -1,5 +1,8 @@
+import logging
 import os
-from sqlalchemy import create_engine
+import threading
+import time
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
@@ -20,8 +23,28 @@ engine = create_engine(
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Réplica opcional para rotas somente leitura (BI, relatórios, exportações, filtros e alertas)
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL")
+REPLICA_ATRASO_MAXIMO = float(os.getenv("REPLICA_ATRASO_MAXIMO", "30"))
+REPLICA_INTERVALO_VERIFICACAO = float(os.getenv("REPLICA_INTERVALO_VERIFICACAO", "5"))
+
+engine_leitura = None
+SessionLeitura = None
+if DATABASE_REPLICA_URL:
+    engine_leitura = create_engine(
+        DATABASE_REPLICA_URL,
+        pool_pre_ping=True,
+        pool_recycle=300,
+        pool_size=int(os.getenv("REPLICA_POOL_SIZE", "10")),
+        max_overflow=int(os.getenv("REPLICA_MAX_OVERFLOW", "20")),
+        connect_args={"connect_timeout": 3} if DATABASE_REPLICA_URL.startswith("postgres") else {}
+    )
+    SessionLeitura = sessionmaker(autocommit=False, autoflush=False, bind=engine_leitura)
+
 Base = declarative_base()
 
+logger = logging.getLogger(__name__)
+
 def get_db():
     db = SessionLocal()
     try:
@@ -29,6 +52,157 @@ def get_db():
     finally:
         db.close()
 
+# Atraso de replicação em segundos; 0 se a réplica aplicou tudo o que recebeu
+# ou se não é um standby (ex.: uma segunda instância usada em testes)
+CONSULTA_ATRASO = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+class EstadoReplica:
+    """Acompanha, numa thread, se a réplica responde e está dentro do atraso tolerado"""
+
+    def __init__(self):
+        self.disponivel = False
+        self.atraso = None
+        self.erro = None
+        self.verificado_em = None
+        self.leituras_replica = 0
+        self.leituras_primario = 0
+        self._thread = None
+
+    def verificar(self):
+        try:
+            with engine_leitura.connect() as conexao:
+                if engine_leitura.dialect.name == "postgresql":
+                    atraso = float(conexao.execute(CONSULTA_ATRASO).scalar() or 0)
+                else:
+                    conexao.execute(text("SELECT 1"))
+                    atraso = 0.0
+            self.atraso, self.erro = atraso, None
+            disponivel = atraso <= REPLICA_ATRASO_MAXIMO
+        except Exception as e:
+            self.atraso, self.erro = None, str(e).splitlines()[0]
+            disponivel = False
+        if disponivel != self.disponivel:
+            if disponivel:
+                logger.info("Réplica disponível; leituras voltam para a réplica")
+            else:
+                logger.warning(f"Réplica indisponível ou atrasada ({self.erro or f'{self.atraso:.1f}s'}); usando o primário")
+        self.disponivel = disponivel
+        self.verificado_em = time.time()
+
+    def _executar(self):
+        while True:
+            self.verificar()
+            time.sleep(REPLICA_INTERVALO_VERIFICACAO)
+
+    def iniciar(self):
+        if engine_leitura is not None and self._thread is None:
+            self.verificar()
+            self._thread = threading.Thread(target=self._executar, name="replica-atraso", daemon=True)
+            self._thread.start()
+
+estado_replica = EstadoReplica()
+
+def abrir_sessao_leitura():
+    """Nova sessão somente leitura: a réplica, se configurada e em dia; senão o primário"""
+    if estado_replica.disponivel:
+        estado_replica.leituras_replica += 1
+        return SessionLeitura()
+    estado_replica.leituras_primario += 1
+    return SessionLocal()
+
+def get_db_leitura():
+    """Sessão para rotas somente leitura: a réplica, se configurada e em dia; senão o primário"""
+    db = abrir_sessao_leitura()
+    try:
+        yield db
+    finally:
+        db.close()
+
+_checkouts = {}
+
+def _contar_checkouts(nome, eng):
+    _checkouts[nome] = 0
+
+    @event.listens_for(eng, "checkout")
+    def _checkout(*args):
+        _checkouts[nome] += 1
+
+_contar_checkouts("primario", engine)
+if engine_leitura is not None:
+    _contar_checkouts("replica", engine_leitura)
+
+def _metricas_pool(nome, eng) -> dict:
+    pool = eng.pool
+    metricas = {"url": eng.url.render_as_string(hide_password=True), "checkouts": _checkouts.get(nome, 0)}
+    for chave, metodo in (("tamanho", "size"), ("em_uso", "checkedout"), ("livres", "checkedin"), ("excedente", "overflow")):
+        if hasattr(pool, metodo):
+            metricas[chave] = getattr(pool, metodo)()
+    return metricas
+
+def metricas_pools() -> dict:
+    """Uso dos pools de conexão e roteamento das leituras neste processo"""
+    metricas = {"primario": _metricas_pool("primario", engine)}
+    if engine_leitura is not None:
+        metricas["replica"] = _metricas_pool("replica", engine_leitura)
+    metricas["roteamento"] = {
+        "replica_configurada": engine_leitura is not None,
+        "replica_disponivel": estado_replica.disponivel,
+        "atraso_segundos": estado_replica.atraso,
+        "atraso_maximo_segundos": REPLICA_ATRASO_MAXIMO,
+        "erro": estado_replica.erro,
+        "verificado_em": estado_replica.verificado_em,
+        "leituras_replica": estado_replica.leituras_replica,
+        "leituras_primario": estado_replica.leituras_primario,
+    }
+    return metricas
+
+# create_all não altera tabelas já existentes; colunas e índices adicionados
+# depois da criação inicial são aplicados aqui de forma idempotente.
+ATUALIZACOES_ESQUEMA = [
+    "ALTER TABLE empresas ADD COLUMN IF NOT EXISTS cnpj_normalizado VARCHAR(14)",
+    "CREATE INDEX IF NOT EXISTS ix_empresas_cnpj_normalizado ON empresas (cnpj_normalizado)",
+    "ALTER TABLE contatos ADD COLUMN IF NOT EXISTS cnpj_normalizado VARCHAR(14)",
+    "CREATE INDEX IF NOT EXISTS ix_contatos_cnpj_normalizado ON contatos (cnpj_normalizado)",
+    "ALTER TABLE linha_tecnologia ADD COLUMN IF NOT EXISTS cnpj_normalizado VARCHAR(14)",
+    "CREATE INDEX IF NOT EXISTS ix_linha_tecnologia_cnpj_normalizado ON linha_tecnologia (cnpj_normalizado)",
+    "ALTER TABLE linha_educacional ADD COLUMN IF NOT EXISTS cnpj_normalizado VARCHAR(14)",
+    "CREATE INDEX IF NOT EXISTS ix_linha_educacional_cnpj_normalizado ON linha_educacional (cnpj_normalizado)",
+    "CREATE INDEX IF NOT EXISTS ix_propostas_empresa_id ON propostas (empresa_id)",
+    "CREATE INDEX IF NOT EXISTS ix_cronogramas_proposta_id ON cronogramas (proposta_id)",
+    "CREATE INDEX IF NOT EXISTS ix_contratos_proposta_id ON contratos (proposta_id)",
+    "ALTER TABLE cronogramas ADD COLUMN IF NOT EXISTS total_tarefas INTEGER DEFAULT 0",
+    "ALTER TABLE cronogramas ADD COLUMN IF NOT EXISTS tarefas_concluidas INTEGER DEFAULT 0",
+    "CREATE INDEX IF NOT EXISTS ix_tarefas_cronograma_id ON tarefas (cronograma_id)",
+    "ALTER TABLE empresas ADD COLUMN IF NOT EXISTS atualizado_em TIMESTAMP",
+    "UPDATE empresas SET atualizado_em = COALESCE(criado_em, now() AT TIME ZONE 'UTC') WHERE atualizado_em IS NULL",
+    "ALTER TABLE consultores ADD COLUMN IF NOT EXISTS atualizado_em TIMESTAMP",
+    "UPDATE consultores SET atualizado_em = COALESCE(criado_em, now() AT TIME ZONE 'UTC') WHERE atualizado_em IS NULL",
+    # Feed de alterações: leitura por (atualizado_em, id)
+    "CREATE INDEX IF NOT EXISTS ix_empresas_atualizado_em_id ON empresas (atualizado_em, id)",
+    "CREATE INDEX IF NOT EXISTS ix_consultores_atualizado_em_id ON consultores (atualizado_em, id)",
+    "CREATE INDEX IF NOT EXISTS ix_propostas_atualizado_em_id ON propostas (atualizado_em, id)",
+    "CREATE INDEX IF NOT EXISTS ix_cronogramas_atualizado_em_id ON cronogramas (atualizado_em, id)",
+    "CREATE INDEX IF NOT EXISTS ix_contratos_atualizado_em_id ON contratos (atualizado_em, id)",
+    "CREATE INDEX IF NOT EXISTS ix_alocacoes_cronograma_atualizado_em_id ON alocacoes_cronograma (atualizado_em, id)",
+    "CREATE INDEX IF NOT EXISTS ix_contatos_atualizado_em_id ON contatos (atualizado_em, id)",
+    "CREATE INDEX IF NOT EXISTS ix_linha_tecnologia_atualizado_em_id ON linha_tecnologia (atualizado_em, id)",
+    "CREATE INDEX IF NOT EXISTS ix_linha_educacional_atualizado_em_id ON linha_educacional (atualizado_em, id)",
+]
+
 def init_db():
     from app.models import models
     Base.metadata.create_all(bind=engine)
+    atualizar_esquema()
+
+def atualizar_esquema():
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.begin() as conn:
+        for comando in ATUALIZACOES_ESQUEMA:
+            conn.execute(text(comando))
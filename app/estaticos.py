@@ -0,0 +1,158 @@
+"""Arquivos estáticos com hash no nome, pré-comprimidos, e páginas HTML pré-renderizadas.
+
+Na primeira requisição, cada arquivo de `app/static` é lido, ganha um nome com o
+hash do conteúdo (`js/dashboard.js` -> `js/dashboard.1a2b3c4d5e.js`) e é
+comprimido uma vez em gzip e, se o módulo `brotli` estiver instalado, em
+brotli. Os templates usam `{{ static_url('js/dashboard.js') }}`; como o nome
+muda quando o conteúdo muda, o navegador pode guardar o arquivo por um ano
+(`immutable`) sem nunca servir uma versão velha. O nome sem hash continua
+funcionando, mas é revalidado a cada uso.
+
+As páginas são só a casca HTML (os dados vêm da API), então cada template é
+renderizado uma vez por caminho e guardado já comprimido, com ETag. O navegador
+revalida a página (`no-cache`) e recebe 304 enquanto nada mudou.
+
+Tudo fica em memória e vale até o processo reiniciar; em desenvolvimento,
+ESTATICOS_RECARREGAR=true refaz tudo a cada requisição.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from fastapi.responses import Response
+from fastapi.templating import Jinja2Templates
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli é opcional
+    brotli = None
+
+DIRETORIO = "app/static"
+RECARREGAR = os.getenv("ESTATICOS_RECARREGAR", "false").lower() in ("1", "true", "sim")
+CACHE_IMUTAVEL = "public, max-age=31536000, immutable"
+CACHE_REVALIDAR = "no-cache"
+COMPRIMIVEIS = {".css", ".js", ".html", ".svg", ".json", ".txt", ".map"}
+
+templates = Jinja2Templates(directory="app/templates")
+
+
+class Recurso:
+    """Conteúdo com suas versões comprimidas e ETag"""
+
+    def __init__(self, conteudo: bytes, media_type: str, comprimir: bool = True):
+        self.media_type = media_type
+        self.hash = hashlib.sha256(conteudo).hexdigest()
+        self.variantes = {"identity": conteudo}
+        if comprimir:
+            comprimido = gzip.compress(conteudo, compresslevel=9, mtime=0)
+            if len(comprimido) < len(conteudo):
+                self.variantes["gzip"] = comprimido
+            if brotli is not None:
+                comprimido = brotli.compress(conteudo, quality=11)
+                if len(comprimido) < len(conteudo):
+                    self.variantes["br"] = comprimido
+
+    def _etag(self, codificacao: str) -> str:
+        sufixo = "" if codificacao == "identity" else f"-{codificacao}"
+        return f'"{self.hash[:20]}{sufixo}"'
+
+    def responder(self, request: Request, cache_control: str) -> Response:
+        codificacao = _escolher_codificacao(request.headers.get("accept-encoding", ""), self.variantes)
+        etag = self._etag(codificacao)
+        headers = {"Cache-Control": cache_control, "ETag": etag, "Vary": "Accept-Encoding"}
+        pedidas = request.headers.get("if-none-match")
+        if pedidas and any(e.strip() in (etag, "*") for e in pedidas.split(",")):
+            return Response(status_code=304, headers=headers)
+        if codificacao != "identity":
+            headers["Content-Encoding"] = codificacao
+        return Response(self.variantes[codificacao], media_type=self.media_type, headers=headers)
+
+
+def _escolher_codificacao(aceitas: str, variantes: dict) -> str:
+    qualidades = {}
+    for parte in aceitas.split(","):
+        nome, _, parametros = parte.strip().partition(";")
+        q = 1.0
+        if parametros.strip().startswith("q="):
+            try:
+                q = float(parametros.strip()[2:])
+            except ValueError:
+                q = 0.0
+        qualidades[nome.strip().lower()] = q
+    for codificacao in ("br", "gzip"):
+        if codificacao in variantes and qualidades.get(codificacao, qualidades.get("*", 0)) > 0:
+            return codificacao
+    return "identity"
+
+
+_lock = threading.Lock()
+_arquivos: Optional[Dict[str, Tuple[Recurso, bool]]] = None  # caminho servido -> (recurso, tem hash)
+_nomes: Dict[str, str] = {}  # caminho lógico -> caminho com hash
+_paginas: Dict[Tuple[str, str], Recurso] = {}
+
+
+def _nome_com_hash(caminho: str, hash_conteudo: str) -> str:
+    base, extensao = os.path.splitext(caminho)
+    return f"{base}.{hash_conteudo[:10]}{extensao}"
+
+
+def _carregar_arquivos():
+    global _arquivos
+    arquivos, nomes = {}, {}
+    for pasta, _, nomes_arquivos in os.walk(DIRETORIO):
+        for nome in nomes_arquivos:
+            completo = os.path.join(pasta, nome)
+            caminho = os.path.relpath(completo, DIRETORIO).replace(os.sep, "/")
+            with open(completo, "rb") as arquivo:
+                conteudo = arquivo.read()
+            media_type = mimetypes.guess_type(nome)[0] or "application/octet-stream"
+            if media_type.startswith("text/") or media_type == "application/javascript":
+                media_type += "; charset=utf-8"
+            recurso = Recurso(conteudo, media_type, os.path.splitext(nome)[1].lower() in COMPRIMIVEIS)
+            com_hash = _nome_com_hash(caminho, recurso.hash)
+            arquivos[caminho] = (recurso, False)
+            arquivos[com_hash] = (recurso, True)
+            nomes[caminho] = com_hash
+    _nomes.clear()
+    _nomes.update(nomes)
+    _arquivos = arquivos
+
+
+def _obter_arquivos() -> Dict[str, Tuple[Recurso, bool]]:
+    if _arquivos is None or RECARREGAR:
+        with _lock:
+            if _arquivos is None or RECARREGAR:
+                _carregar_arquivos()
+    return _arquivos
+
+
+def static_url(caminho: str) -> str:
+    """URL do arquivo estático com o hash do conteúdo no nome"""
+    _obter_arquivos()
+    return f"/static/{_nomes.get(caminho, caminho)}"
+
+
+templates.env.globals["static_url"] = static_url
+
+
+def servir_estatico(caminho: str, request: Request) -> Response:
+    item = _obter_arquivos().get(caminho)
+    if item is None:
+        raise HTTPException(status_code=404, detail="Arquivo não encontrado")
+    recurso, com_hash = item
+    return recurso.responder(request, CACHE_IMUTAVEL if com_hash else CACHE_REVALIDAR)
+
+
+def pagina(nome: str, request: Request) -> Response:
+    """Casca HTML do template, renderizada uma vez por caminho"""
+    chave = (nome, request.url.path)
+    recurso = None if RECARREGAR else _paginas.get(chave)
+    if recurso is None:
+        html = templates.get_template(nome).render({"request": request})
+        recurso = Recurso(html.encode("utf-8"), "text/html; charset=utf-8")
+        _paginas[chave] = recurso
+    return recurso.responder(request, CACHE_REVALIDAR)
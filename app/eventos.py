@@ -0,0 +1,378 @@
+"""Canal de eventos enviados por Server-Sent Events aos navegadores e aos outros workers.
+
+Três tipos de evento são publicados:
+
+- "alocacao": criação, alteração ou remoção de uma alocação do calendário,
+  já no formato de `/api/cronogramas/alocacoes/listar`, entregue apenas a quem
+  assina o mês (e, opcionalmente, o consultor) da alocação;
+- "alertas": os contadores de `/api/alertas/resumo`, recalculados só quando
+  contratos, cronogramas ou propostas mudam (ou o dia vira) e enviados apenas
+  se algum valor mudou;
+- "tabelas": as tabelas alteradas pela transação, só entre workers. Quem recebe
+  incrementa as versões delas (`app/versoes.py`), o que invalida os caches em
+  memória (visão 360, grade do calendário, chatbot etc.) e agenda o recálculo
+  dos alertas quando for o caso.
+
+No Postgres os eventos saem com NOTIFY dentro da própria transação, então só
+são entregues se ela for confirmada e chegam a todos os workers, cada um
+escutando o canal em uma thread. O payload do NOTIFY é limitado a 8000 bytes,
+por isso a alocação viaja só com as chaves (id, consultor, data, período) e o
+worker que recebe relê a linha antes de entregar aos navegadores. Em outros
+bancos a entrega é local, após o commit.
+"""
+import asyncio
+import json
+import logging
+import select
+import threading
+import uuid
+from datetime import date
+
+from sqlalchemy import event, inspect, select as sql_select, text
+from sqlalchemy.orm import Session
+
+from app.database import Base, SessionLocal, engine
+from app.models.models import AlocacaoCronograma, Consultor
+from app.versoes import CHAVE_SESSAO as CHAVE_VERSOES, ao_alterar, incrementar
+
+logger = logging.getLogger(__name__)
+
+CANAL_PG = "eventos_app"
+TABELAS_ALERTAS = {"contratos", "cronogramas", "propostas"}
+CHAVE_SESSAO = "eventos_pendentes"
+INTERVALO_ALERTAS = 300
+ESPERA_AGRUPAR = 1.0
+# O Postgres rejeita payloads de NOTIFY a partir de 8000 bytes
+LIMITE_NOTIFY = 8000
+CAMPOS_AVISO = ("id", "consultor_id", "data", "periodo")
+# Identifica este processo nos eventos "tabelas" (as próprias versões já sobem no commit)
+ORIGEM = uuid.uuid4().hex
+
+
+def _usa_notify() -> bool:
+    return engine.dialect.name == "postgresql"
+
+
+class Assinatura:
+    def __init__(self, loop, ano: int = None, mes: int = None, consultor_id: int = None, alertas: bool = False):
+        self.loop = loop
+        self.fila = asyncio.Queue(maxsize=1000)
+        self.ano = ano
+        self.mes = mes
+        self.consultor_id = consultor_id
+        self.alertas = alertas
+
+    def _cobre(self, data: str, consultor_id: int) -> bool:
+        if self.ano is None or self.mes is None or not data:
+            return False
+        ano, mes = int(data[:4]), int(data[5:7])
+        if (ano, mes) != (self.ano, self.mes):
+            return False
+        return self.consultor_id is None or self.consultor_id == consultor_id
+
+    def aceita(self, evento: dict) -> bool:
+        if evento["tipo"] == "alertas":
+            return self.alertas
+        if evento["tipo"] == "alocacao":
+            alocacao = evento["alocacao"]
+            anterior = evento.get("anterior") or {}
+            return self._cobre(alocacao["data"], alocacao["consultor_id"]) or self._cobre(
+                anterior.get("data"), anterior.get("consultor_id")
+            )
+        return False
+
+    def entregar(self, evento: dict):
+        try:
+            self.fila.put_nowait(evento)
+        except asyncio.QueueFull:
+            logger.warning("Fila de eventos cheia; evento descartado para um assinante lento")
+
+
+class Broker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._assinaturas = set()
+
+    def assinar(self, **filtros) -> Assinatura:
+        assinatura = Assinatura(asyncio.get_running_loop(), **filtros)
+        with self._lock:
+            self._assinaturas.add(assinatura)
+        if assinatura.alertas:
+            monitor_alertas.iniciar()
+        return assinatura
+
+    def cancelar(self, assinatura: Assinatura):
+        with self._lock:
+            self._assinaturas.discard(assinatura)
+
+    def assinantes_alertas(self) -> int:
+        with self._lock:
+            return sum(1 for a in self._assinaturas if a.alertas)
+
+    def interessado(self, evento: dict) -> bool:
+        with self._lock:
+            return any(a.aceita(evento) for a in self._assinaturas)
+
+    def publicar(self, evento: dict):
+        """Entrega o evento às assinaturas interessadas; pode ser chamado de qualquer thread"""
+        with self._lock:
+            destinos = [a for a in self._assinaturas if a.aceita(evento)]
+        for assinatura in destinos:
+            try:
+                assinatura.loop.call_soon_threadsafe(assinatura.entregar, evento)
+            except RuntimeError:
+                self.cancelar(assinatura)
+
+
+broker = Broker()
+
+
+class MonitorAlertas:
+    """Recalcula os contadores de alertas quando necessário e publica só as mudanças"""
+
+    def __init__(self):
+        self.ultimo = None
+        self._dia = None
+        self._loop = None
+        self._acordar = None
+        self._tarefa = None
+
+    def iniciar(self):
+        if self._tarefa is None or self._tarefa.done():
+            self._loop = asyncio.get_running_loop()
+            self._acordar = asyncio.Event()
+            self._tarefa = self._loop.create_task(self._executar())
+
+    def agendar(self):
+        """Pede um recálculo; pode ser chamado de qualquer thread"""
+        if self._loop is not None and self._acordar is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._acordar.set)
+            except RuntimeError:
+                pass
+
+    async def atual(self) -> dict:
+        if self.ultimo is None or self._dia != date.today():
+            await self._recalcular(publicar=False)
+        return self.ultimo
+
+    async def _recalcular(self, publicar: bool = True):
+        resumo = await asyncio.get_running_loop().run_in_executor(None, _calcular_alertas)
+        self._dia = date.today()
+        if resumo != self.ultimo:
+            self.ultimo = resumo
+            if publicar:
+                broker.publicar({"tipo": "alertas", "resumo": resumo})
+
+    async def _executar(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._acordar.wait(), timeout=INTERVALO_ALERTAS)
+                # Agrupar rajadas de commits em um único recálculo
+                await asyncio.sleep(ESPERA_AGRUPAR)
+            except asyncio.TimeoutError:
+                pass
+            self._acordar.clear()
+            if not broker.assinantes_alertas():
+                # Sem ninguém escutando, o próximo assinante recalcula na conexão
+                self.ultimo = None
+                continue
+            try:
+                await self._recalcular()
+            except Exception as e:
+                logger.error(f"Erro ao recalcular alertas: {e}")
+
+
+monitor_alertas = MonitorAlertas()
+
+
+def _calcular_alertas() -> dict:
+    from app.routes.alertas import calcular_resumo_alertas
+    db = SessionLocal()
+    try:
+        return calcular_resumo_alertas(db)
+    finally:
+        db.close()
+
+
+@ao_alterar
+def _tabelas_alteradas(tabelas: set):
+    if tabelas & TABELAS_ALERTAS:
+        monitor_alertas.agendar()
+
+
+def dados_alocacao(obj: AlocacaoCronograma, consultor_nome: str) -> dict:
+    """Alocação no formato de `/api/cronogramas/alocacoes/listar`"""
+    return {
+        "id": obj.id,
+        "consultor_id": obj.consultor_id,
+        "consultor_nome": consultor_nome,
+        "nif": obj.nif,
+        "data": str(obj.data) if obj.data else None,
+        "periodo": obj.periodo,
+        "codigo_projeto": obj.codigo_projeto,
+        "observacao": obj.observacao,
+    }
+
+
+def _valor_anterior(obj, campo):
+    historico = inspect(obj).attrs[campo].history
+    return historico.deleted[0] if historico.deleted else getattr(obj, campo)
+
+
+# Carregar o valor antigo ao trocar data/consultor, para avisar quem assinava o mês anterior
+for _campo in ("data", "consultor_id"):
+    event.listen(getattr(AlocacaoCronograma, _campo), "set", lambda *args: None, active_history=True)
+
+
+def _aviso(evento: dict) -> dict:
+    """Versão do evento para o NOTIFY: a alocação vai só com as chaves"""
+    if evento["tipo"] != "alocacao":
+        return evento
+    return {**evento, "alocacao": {campo: evento["alocacao"][campo] for campo in CAMPOS_AVISO}}
+
+
+def _enviar(session: Session, eventos: list):
+    if _usa_notify():
+        conexao = session.connection()
+        for evento in eventos:
+            dados = json.dumps(_aviso(evento), ensure_ascii=False)
+            if len(dados.encode()) >= LIMITE_NOTIFY:
+                # Falhar aqui derrubaria a gravação; os caches ainda expiram pelas versões
+                logger.warning(f"Evento {evento['tipo']} grande demais para o NOTIFY; não enviado")
+                continue
+            conexao.execute(text("SELECT pg_notify(:canal, :dados)"), {"canal": CANAL_PG, "dados": dados})
+    else:
+        session.info.setdefault(CHAVE_SESSAO, []).extend(eventos)
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _registrar_eventos(session: Session, flush_context):
+    alteradas = [(obj, "criada") for obj in session.new if isinstance(obj, AlocacaoCronograma)]
+    alteradas += [
+        (obj, "atualizada") for obj in session.dirty
+        if isinstance(obj, AlocacaoCronograma) and session.is_modified(obj, include_collections=False)
+    ]
+    alteradas += [(obj, "removida") for obj in session.deleted if isinstance(obj, AlocacaoCronograma)]
+
+    eventos = []
+    if alteradas:
+        nomes = {}
+        faltando = set()
+        for obj, _ in alteradas:
+            consultor = session.identity_map.get((Consultor, (obj.consultor_id,), None)) if obj.consultor_id else None
+            if consultor is not None:
+                nomes[obj.consultor_id] = consultor.nome
+            elif obj.consultor_id:
+                faltando.add(obj.consultor_id)
+        if faltando:
+            nomes.update(session.connection().execute(
+                sql_select(Consultor.id, Consultor.nome).where(Consultor.id.in_(faltando))
+            ).all())
+
+        for obj, acao in alteradas:
+            evento = {"tipo": "alocacao", "acao": acao, "alocacao": dados_alocacao(obj, nomes.get(obj.consultor_id))}
+            if acao == "atualizada":
+                data_anterior = _valor_anterior(obj, "data")
+                evento["anterior"] = {
+                    "data": str(data_anterior) if data_anterior else None,
+                    "consultor_id": _valor_anterior(obj, "consultor_id"),
+                }
+            eventos.append(evento)
+
+    if eventos:
+        _enviar(session, eventos)
+
+
+@event.listens_for(SessionLocal, "before_commit")
+def _avisar_tabelas(session: Session):
+    # Avisar os outros workers de todas as tabelas que este commit altera (flush,
+    # UPDATE/DELETE em massa e SQL marcado com `marcar_alterada`)
+    if not _usa_notify():
+        return
+    session.flush()
+    tabelas = session.info.get(CHAVE_VERSOES)
+    if tabelas:
+        _enviar(session, [{"tipo": "tabelas", "tabelas": sorted(tabelas), "origem": ORIGEM}])
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _publicar_pendentes(session: Session):
+    for evento in session.info.pop(CHAVE_SESSAO, None) or ():
+        broker.publicar(evento)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _descartar_pendentes(session: Session):
+    session.info.pop(CHAVE_SESSAO, None)
+
+
+def _completar_alocacoes(eventos: list) -> list:
+    """Relê as alocações avisadas por NOTIFY para entregá-las no formato completo"""
+    ids = {e["alocacao"]["id"] for e in eventos if e["acao"] != "removida"}
+    linhas = {}
+    if ids:
+        db = SessionLocal()
+        try:
+            consulta = (
+                sql_select(AlocacaoCronograma, Consultor.nome)
+                .outerjoin(Consultor, Consultor.id == AlocacaoCronograma.consultor_id)
+                .where(AlocacaoCronograma.id.in_(ids))
+            )
+            linhas = {obj.id: dados_alocacao(obj, nome) for obj, nome in db.execute(consulta).all()}
+        finally:
+            db.close()
+
+    completos = []
+    for evento in eventos:
+        if evento["acao"] == "removida":
+            completos.append(evento)
+        elif evento["alocacao"]["id"] in linhas:
+            # Removida depois do aviso: o evento da remoção vem em seguida
+            completos.append({**evento, "alocacao": linhas[evento["alocacao"]["id"]]})
+    return completos
+
+
+def _receber_notificacoes():
+    import psycopg2
+
+    url = engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+    while True:
+        try:
+            conexao = psycopg2.connect(url)
+            conexao.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            conexao.cursor().execute(f"LISTEN {CANAL_PG}")
+            # Avisos perdidos enquanto a conexão estava fora: invalidar tudo
+            incrementar(*Base.metadata.tables)
+            while True:
+                if select.select([conexao], [], [], 60) == ([], [], []):
+                    continue
+                conexao.poll()
+                alocacoes = []
+                while conexao.notifies:
+                    evento = json.loads(conexao.notifies.pop(0).payload)
+                    if evento["tipo"] == "tabelas":
+                        if evento.get("origem") != ORIGEM:
+                            incrementar(*evento.get("tabelas", ()))
+                    elif evento["tipo"] == "alocacao":
+                        # Só reler a linha se algum navegador deste worker assina o mês
+                        if broker.interessado(evento):
+                            alocacoes.append(evento)
+                    else:
+                        broker.publicar(evento)
+                for evento in _completar_alocacoes(alocacoes):
+                    broker.publicar(evento)
+        except Exception as e:
+            logger.error(f"Conexão de eventos perdida, reconectando: {e}")
+            threading.Event().wait(5)
+
+
+_ouvinte = None
+
+
+def iniciar_ouvinte():
+    """Começa a escutar o canal do Postgres neste processo (uma única vez)"""
+    global _ouvinte
+    if _usa_notify() and _ouvinte is None:
+        _ouvinte = threading.Thread(target=_receber_notificacoes, name="eventos-pg", daemon=True)
+        _ouvinte.start()
@@ -0,0 +1,138 @@
+"""Exportação de tabelas inteiras em CSV ou Parquet, transmitida em lotes.
+
+A consulta roda com cursor no servidor (`yield_per`) e é lida em lotes de
+`TAMANHO_LOTE` linhas: no CSV cada lote vira um pedaço da resposta e no
+Parquet um row group. O download começa assim que o primeiro lote chega e a
+memória usada não cresce com o tamanho da tabela.
+
+Como o corpo é gerado depois que a rota retorna (e a sessão de `Depends` já
+foi fechada), o gerador abre a própria sessão de leitura, na réplica quando
+disponível.
+"""
+import csv
+import io
+import os
+from datetime import date
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Boolean, Date, DateTime, Float, Integer, Numeric, select
+
+from app.backends import obter_backend
+from app.database import abrir_sessao_leitura
+
+TAMANHO_LOTE = int(os.getenv("EXPORTACAO_TAMANHO_LOTE", "5000"))
+
+FORMATOS = {
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+}
+PADRAO_FORMATO = "^(csv|parquet)$"
+
+
+def _linhas(consulta):
+    """Lotes de tuplas lidos com cursor no servidor"""
+    db = abrir_sessao_leitura()
+    try:
+        resultado = db.execute(consulta.execution_options(yield_per=TAMANHO_LOTE))
+        for lote in resultado.partitions():
+            yield lote
+    finally:
+        db.close()
+
+
+def _gerar_csv(colunas, consulta):
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow([coluna.name for coluna in colunas])
+    yield buffer.getvalue().encode("utf-8")
+    for lote in _linhas(consulta):
+        buffer.seek(0)
+        buffer.truncate()
+        escritor.writerows(lote)
+        yield buffer.getvalue().encode("utf-8")
+
+
+def _tipo_arrow(pa, coluna):
+    tipo = coluna.type
+    if isinstance(tipo, Boolean):
+        return pa.bool_()
+    if isinstance(tipo, Integer):
+        return pa.int64()
+    if isinstance(tipo, Numeric) and not isinstance(tipo, Float) and tipo.precision:
+        return pa.decimal128(tipo.precision, tipo.scale or 0)
+    if isinstance(tipo, (Numeric, Float)):
+        return pa.float64()
+    if isinstance(tipo, DateTime):
+        return pa.timestamp("us")
+    if isinstance(tipo, Date):
+        return pa.date32()
+    return pa.string()
+
+
+class _Saida:
+    """Destino do ParquetWriter que acumula só o que ainda não foi enviado"""
+
+    def __init__(self):
+        self._partes = []
+        self._posicao = 0
+        self.closed = False
+
+    def write(self, dados):
+        self._partes.append(bytes(dados))
+        self._posicao += len(dados)
+        return len(dados)
+
+    def tell(self):
+        return self._posicao
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def esvaziar(self) -> bytes:
+        dados = b"".join(self._partes)
+        self._partes.clear()
+        return dados
+
+
+def _gerar_parquet(colunas, consulta, parquet):
+    pa, pq = parquet.pa, parquet.pq
+    esquema = pa.schema([(coluna.name, _tipo_arrow(pa, coluna)) for coluna in colunas])
+    saida = _Saida()
+    escritor = pq.ParquetWriter(saida, esquema, compression="snappy")
+    try:
+        for lote in _linhas(consulta):
+            valores = list(zip(*lote))
+            tabela = pa.Table.from_arrays(
+                [pa.array(valores[i], type=campo.type) for i, campo in enumerate(esquema)],
+                schema=esquema,
+            )
+            escritor.write_table(tabela, row_group_size=len(lote))
+            yield saida.esvaziar()
+    finally:
+        escritor.close()
+    yield saida.esvaziar()
+
+
+def exportar_tabela(modelo, condicoes, formato: str, nome: str) -> StreamingResponse:
+    """Resposta que transmite as linhas de `modelo` que atendem a `condicoes`, com todas as colunas"""
+    colunas = list(modelo.__table__.columns)
+    consulta = select(*colunas).where(*condicoes).order_by(*modelo.__table__.primary_key.columns)
+    if formato == "parquet":
+        try:
+            parquet = obter_backend("parquet")
+        except ImportError:
+            raise HTTPException(status_code=503, detail="Exportação Parquet indisponível: pyarrow não está instalado")
+        corpo = _gerar_parquet(colunas, consulta, parquet)
+    else:
+        corpo = _gerar_csv(colunas, consulta)
+
+    arquivo = f"{nome}_{date.today().strftime('%Y%m%d')}.{formato}"
+    return StreamingResponse(
+        corpo,
+        media_type=FORMATOS[formato],
+        headers={"Content-Disposition": f"attachment; filename={arquivo}"},
+    )
@@ -0,0 +1,133 @@
+"""Backends de modelo de linguagem para o chatbot.
+
+O backend é escolhido pela variável CHATBOT_LLM ("openai" ou "local"). Sem
+configuração, usa o OpenAI quando OPENAI_API_KEY está definida e, caso
+contrário, o modelo local determinístico, que também é o usado em testes.
+"""
+from abc import ABC, abstractmethod
+import asyncio
+import json
+import os
+import re
+import unicodedata
+from typing import AsyncIterator, List, Optional
+
+LLM_MAX_CONCORRENCIA = int(os.getenv("LLM_MAX_CONCORRENCIA", "4"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))
+CHATBOT_MODELO = os.getenv("CHATBOT_MODELO", "gpt-4o-mini")
+
+
+class LLMIndisponivel(Exception):
+    """O backend não conseguiu atender dentro do limite de concorrência ou de tempo"""
+
+
+class BackendLLM(ABC):
+    nome = "base"
+
+    @abstractmethod
+    def gerar(self, mensagens: List[dict]) -> AsyncIterator[str]:
+        """Gera a resposta em pedaços (tokens) a partir das mensagens no formato chat"""
+
+
+class BackendOpenAI(BackendLLM):
+    nome = "openai"
+
+    def __init__(self, modelo: str = CHATBOT_MODELO, max_concorrencia: int = LLM_MAX_CONCORRENCIA):
+        self.modelo = modelo
+        self.max_concorrencia = max_concorrencia
+        self._cliente = None
+        self._semaforo = None
+
+    def _obter_cliente(self):
+        # O cliente e seu pool de conexões são criados uma vez e reutilizados
+        if self._cliente is None:
+            import httpx
+            from openai import AsyncOpenAI
+            self._cliente = AsyncOpenAI(
+                http_client=httpx.AsyncClient(
+                    limits=httpx.Limits(
+                        max_connections=self.max_concorrencia,
+                        max_keepalive_connections=self.max_concorrencia
+                    ),
+                    timeout=LLM_TIMEOUT
+                ),
+                max_retries=2
+            )
+            self._semaforo = asyncio.Semaphore(self.max_concorrencia)
+        return self._cliente
+
+    async def gerar(self, mensagens: List[dict]) -> AsyncIterator[str]:
+        cliente = self._obter_cliente()
+        try:
+            await asyncio.wait_for(self._semaforo.acquire(), timeout=LLM_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise LLMIndisponivel("Muitas perguntas em andamento, tente novamente em instantes")
+        try:
+            stream = await cliente.chat.completions.create(
+                model=self.modelo,
+                messages=mensagens,
+                stream=True,
+                temperature=0
+            )
+            async for pedaco in stream:
+                if pedaco.choices and pedaco.choices[0].delta.content:
+                    yield pedaco.choices[0].delta.content
+        finally:
+            self._semaforo.release()
+
+    async def fechar(self):
+        if self._cliente is not None:
+            await self._cliente.close()
+            self._cliente = None
+
+
+def _normalizar(texto: str) -> str:
+    texto = unicodedata.normalize("NFKD", texto.lower())
+    return "".join(c for c in texto if not unicodedata.combining(c))
+
+
+class BackendLocal(BackendLLM):
+    """Modelo determinístico: responde com os itens do resumo que compartilham palavras com a pergunta"""
+    nome = "local"
+
+    async def gerar(self, mensagens: List[dict]) -> AsyncIterator[str]:
+        contexto = next((m["content"] for m in mensagens if m["role"] == "system"), "")
+        pergunta = next((m["content"] for m in reversed(mensagens) if m["role"] == "user"), "")
+        resumo = {}
+        if "DADOS:" in contexto:
+            try:
+                resumo = json.loads(contexto.split("DADOS:", 1)[1])
+            except ValueError:
+                resumo = {}
+
+        palavras = {p for p in re.findall(r"\w+", _normalizar(pergunta)) if len(p) > 3}
+        linhas = []
+        for chave, valor in resumo.items():
+            termos = set(_normalizar(chave).split("_"))
+            if any(p[:5] == t[:5] for p in palavras for t in termos):
+                linhas.append(f"{chave.replace('_', ' ')}: {json.dumps(valor, ensure_ascii=False)}")
+
+        if linhas:
+            resposta = "Com base nos dados atuais, " + "; ".join(linhas) + "."
+        else:
+            resposta = "Não encontrei essa informação no resumo dos dados disponíveis."
+
+        for token in re.findall(r"\S+\s*", resposta):
+            yield token
+
+
+_backend: Optional[BackendLLM] = None
+
+
+def obter_backend() -> BackendLLM:
+    global _backend
+    if _backend is None:
+        escolha = os.getenv("CHATBOT_LLM") or ("openai" if os.getenv("OPENAI_API_KEY") else "local")
+        _backend = BackendOpenAI() if escolha == "openai" else BackendLocal()
+    return _backend
+
+
+def definir_backend(backend: Optional[BackendLLM]):
+    """Substitui o backend em uso (por exemplo, pelo BackendLocal em testes)"""
+    global _backend
+    _backend = backend
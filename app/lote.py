@@ -0,0 +1,175 @@
+"""Atualização e exclusão de vários registros numa única transação.
+
+Os registros do lote são carregados com uma única consulta, validados de uma
+vez e gravados num único flush. O SQLAlchemy agrupa os UPDATEs com as mesmas
+colunas em um executemany. As alterações passam pelo ORM (e não por um UPDATE
+em massa) para que os eventos de flush continuem valendo: resumo mensal,
+eventos do calendário, CNPJ normalizado e versões de cache.
+
+Itens inválidos não impedem os demais; cada um aparece no resultado com o
+motivo. Com `tudo_ou_nada=True`, qualquer erro cancela o lote inteiro.
+"""
+from typing import Callable, Dict, Iterable, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import inspect
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+MAX_ITENS_LOTE = 1000
+
+# Validador: recebe os registros encontrados e as alterações pedidas e devolve {id: (status, detalhe)}
+Validador = Callable[[Session, Dict[int, object], Dict[int, dict]], Dict[int, tuple]]
+
+
+def _verificar_tamanho(quantidade: int):
+    if quantidade == 0:
+        raise HTTPException(status_code=400, detail="Nenhum item informado")
+    if quantidade > MAX_ITENS_LOTE:
+        raise HTTPException(status_code=400, detail=f"O lote aceita no máximo {MAX_ITENS_LOTE} itens")
+
+
+def alteracoes_por_id(itens: Iterable[dict]) -> tuple:
+    """Separa uma lista de registros com `id` em {id: dados} e erros de ids repetidos"""
+    alteracoes, repetidos = {}, {}
+    for item in itens:
+        item = dict(item)
+        registro_id = item.pop("id")
+        if registro_id in alteracoes:
+            repetidos[registro_id] = (400, "Registro repetido no lote")
+        else:
+            alteracoes[registro_id] = item
+    return alteracoes, repetidos
+
+
+def campos_nulos(modelo, alteracoes: Dict[int, dict]) -> Dict[int, tuple]:
+    """Erros para itens que pedem null em colunas NOT NULL (senão o lote inteiro falharia no commit)"""
+    obrigatorios = {
+        atributo.key for atributo in inspect(modelo).column_attrs
+        if not any(coluna.nullable or coluna.primary_key for coluna in atributo.columns)
+    }
+    erros = {}
+    for registro_id, dados in alteracoes.items():
+        nulos = sorted(campo for campo, valor in dados.items() if valor is None and campo in obrigatorios)
+        if nulos:
+            erros[registro_id] = (400, f"Campo(s) obrigatório(s) não pode(m) ser nulo(s): {', '.join(nulos)}")
+    return erros
+
+
+def conflitos_unicos(db: Session, modelo, coluna, campo: str, alteracoes: Dict[int, dict],
+                     detalhe: str, normalizar: Callable = None) -> Dict[int, tuple]:
+    """Erros para itens cujo novo valor de um campo único já existe no banco ou se repete no lote"""
+    normalizar = normalizar or (lambda valor: valor)
+    pedidos = {}
+    for registro_id, dados in alteracoes.items():
+        chave = normalizar(dados[campo]) if dados.get(campo) is not None else None
+        if chave is not None:
+            pedidos.setdefault(chave, []).append(registro_id)
+    if not pedidos:
+        return {}
+
+    erros = {}
+    for ids in pedidos.values():
+        if len(ids) > 1:
+            erros.update({registro_id: (400, detalhe) for registro_id in ids})
+    existentes = db.query(modelo.id, coluna).filter(coluna.in_(list(pedidos))).all()
+    for existente_id, chave in existentes:
+        for registro_id in pedidos.get(chave, ()):
+            if registro_id != existente_id:
+                erros[registro_id] = (400, detalhe)
+    return erros
+
+
+def _resultado(ordem: List[int], erros: Dict[int, tuple], registros: Dict[int, object], schema) -> dict:
+    itens = []
+    for registro_id in ordem:
+        if registro_id in erros:
+            status, detalhe = erros[registro_id]
+            itens.append({"id": registro_id, "ok": False, "status": status, "detail": detalhe})
+        else:
+            item = {"id": registro_id, "ok": True}
+            if schema is not None and registro_id in registros:
+                item["registro"] = schema.model_validate(registros[registro_id])
+            itens.append(item)
+    return {
+        "total": len(ordem),
+        "sucesso": len(ordem) - len(erros),
+        "erros": len(erros),
+        "itens": itens,
+    }
+
+
+def _carregar(db: Session, modelo, ids) -> Dict[int, object]:
+    return {registro.id: registro for registro in db.query(modelo).filter(modelo.id.in_(list(ids))).all()}
+
+
+def _confirmar(db: Session, tudo_ou_nada: bool, erros: Dict[int, tuple], ordem: List[int]):
+    if erros and tudo_ou_nada:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=_resultado(ordem, erros, {}, None))
+    try:
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        raise HTTPException(status_code=409, detail=f"Lote não gravado por conflito de dados: {e.orig}")
+
+
+def atualizar_lote(
+    db: Session,
+    modelo,
+    alteracoes: Dict[int, dict],
+    schema,
+    nao_encontrado: str,
+    validar: Optional[Validador] = None,
+    erros_previos: Optional[Dict[int, tuple]] = None,
+    tudo_ou_nada: bool = False,
+) -> dict:
+    """Aplica `alteracoes` ({id: {campo: valor}}) e retorna o resultado de cada item"""
+    erros = dict(erros_previos or {})
+    ordem = list(alteracoes)
+    _verificar_tamanho(len(ordem))
+
+    registros = _carregar(db, modelo, alteracoes)
+    for registro_id in alteracoes:
+        if registro_id not in registros:
+            erros[registro_id] = (404, nao_encontrado)
+    for registro_id, erro in campos_nulos(modelo, alteracoes).items():
+        erros.setdefault(registro_id, erro)
+    if validar:
+        encontrados = {i: r for i, r in registros.items() if i not in erros}
+        erros.update(validar(db, encontrados, {i: alteracoes[i] for i in encontrados}))
+
+    validos = [registro_id for registro_id in alteracoes if registro_id not in erros]
+    for registro_id in validos:
+        registro = registros[registro_id]
+        for campo, valor in alteracoes[registro_id].items():
+            setattr(registro, campo, valor)
+    _confirmar(db, tudo_ou_nada, erros, ordem)
+
+    # Recarregar os registros gravados numa única consulta (o commit os expirou)
+    atualizados = _carregar(db, modelo, validos) if validos else {}
+    return _resultado(ordem, erros, atualizados, schema)
+
+
+def excluir_lote(
+    db: Session,
+    modelo,
+    ids: List[int],
+    nao_encontrado: str,
+    validar: Optional[Callable[[Session, Dict[int, object]], Dict[int, tuple]]] = None,
+    tudo_ou_nada: bool = False,
+) -> dict:
+    """Exclui os registros informados e retorna o resultado de cada item"""
+    ordem = list(dict.fromkeys(ids))
+    _verificar_tamanho(len(ordem))
+
+    registros = _carregar(db, modelo, ordem)
+    erros = {registro_id: (404, nao_encontrado) for registro_id in ordem if registro_id not in registros}
+    if validar:
+        erros.update(validar(db, {i: r for i, r in registros.items() if i not in erros}))
+
+    for registro_id in ordem:
+        if registro_id not in erros:
+            db.delete(registros[registro_id])
+    _confirmar(db, tudo_ou_nada, erros, ordem)
+    return _resultado(ordem, erros, {}, None)
@@ -1,15 +1,12 @@
 from fastapi import FastAPI, Request, Depends
-from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
 from fastapi.responses import HTMLResponse
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
-import os
 
-from app.database import get_db, init_db, engine
-from app.models.models import Usuario
+from app.database import engine
 from app.auth import get_current_user
-from app.routes import auth, empresas, consultores, propostas, cronogramas, contratos, bi, importacao, chatbot, relatorios, alertas, contatos, linha_tecnologia, linha_educacional
+from app.estaticos import pagina, servir_estatico
+from app.routes import auth, empresas, consultores, propostas, cronogramas, contratos, bi, importacao, chatbot, relatorios, alertas, contatos, linha_tecnologia, linha_educacional, eventos, sistema, feriados, alteracoes, auditoria
 
 app = FastAPI(
     title="Sistema de relacionamento com a industria",
@@ -24,8 +21,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-app.mount("/static", StaticFiles(directory="app/static"), name="static")
-templates = Jinja2Templates(directory="app/templates")
+# Estáticos com hash no nome e pré-comprimidos; páginas renderizadas uma vez (app/estaticos.py)
+@app.api_route("/static/{caminho:path}", methods=["GET", "HEAD"], include_in_schema=False)
+async def arquivo_estatico(caminho: str, request: Request):
+    return servir_estatico(caminho, request)
 
 app.include_router(auth.router, prefix="/api", tags=["Autenticação"])
 app.include_router(empresas.router, prefix="/api/empresas", tags=["Empresas"])
@@ -41,96 +40,111 @@ app.include_router(alertas.router, prefix="/api/alertas", tags=["Alertas"])
 app.include_router(contatos.router, prefix="/api/contatos", tags=["Contatos"])
 app.include_router(linha_tecnologia.router, prefix="/api/linha-tecnologia", tags=["Linha Tecnologia"])
 app.include_router(linha_educacional.router, prefix="/api/linha-educacional", tags=["Linha Educacional"])
+app.include_router(eventos.router, prefix="/api/eventos", tags=["Eventos"])
+app.include_router(sistema.router, prefix="/api/sistema", tags=["Sistema"])
+app.include_router(feriados.router, prefix="/api/feriados", tags=["Feriados"])
+app.include_router(alteracoes.router, prefix="/api/alteracoes", tags=["Alterações"])
+app.include_router(auditoria.router, prefix="/api/auditoria", tags=["Auditoria"])
 
 @app.on_event("startup")
 async def startup_event():
-    init_db()
-    db = next(get_db())
+    # Esquema, admin e dados iniciais rodam uma única vez (neste ou em outro
+    # processo, ou antes no deploy com `python -m app.bootstrap`)
+    from app.bootstrap import garantir_inicializacao
+    garantir_inicializacao()
     
-    admin_email = os.getenv("ADMIN_EMAIL", "admin@sistema.com")
-    admin_password = os.getenv("ADMIN_PASSWORD", "admin123")
+    # Bibliotecas de importação/exportação são carregadas sob demanda,
+    # a menos que BACKENDS_PRE_CARREGAR peça o contrário
+    from app.backends import pre_carregar
+    pre_carregar()
     
-    admin_exists = db.query(Usuario).filter(Usuario.email == admin_email).first()
-    if not admin_exists:
-        from app.auth import get_password_hash
-        admin = Usuario(
-            nome="Administrador",
-            email=admin_email,
-            senha_hash=get_password_hash(admin_password),
-            funcao="Admin"
-        )
-        db.add(admin)
-        db.commit()
-        print(f"✓ Usuário admin criado com email: {admin_email}")
+    # Escutar eventos publicados pelos outros workers (Postgres)
+    from app.eventos import iniciar_ouvinte
+    iniciar_ouvinte()
     
-    db.close()
+    # Acompanhar o atraso da réplica de leitura, se configurada
+    from app.database import estado_replica
+    estado_replica.iniciar()
     
-    # Importar dados iniciais das planilhas Excel (apenas se não existirem)
-    try:
-        from app.seed_data import seed_all_data
-        seed_all_data()
-    except Exception as e:
-        print(f"⚠ Erro ao importar dados iniciais: {e}")
+    # Status que mudam com a data (cronogramas atrasados, contratos vencidos)
+    from app.varredura import agendador_varredura
+    agendador_varredura.iniciar()
+    
+    # Gravação em lotes da auditoria de propostas, contratos e alocações
+    from app.auditoria import escritor_auditoria
+    escritor_auditoria.iniciar()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Gravar as entradas de auditoria que ainda estão no buffer
+    from app.auditoria import escritor_auditoria
+    await escritor_auditoria.parar()
+    
+    # Fechar o pool de conexões do cliente do modelo de linguagem, se criado
+    from app.llm import obter_backend
+    backend = obter_backend()
+    if hasattr(backend, "fechar"):
+        await backend.fechar()
 
 @app.get("/", response_class=HTMLResponse)
 async def root(request: Request):
-    return templates.TemplateResponse("login.html", {"request": request})
+    return pagina("login.html", request)
 
 @app.get("/dashboard", response_class=HTMLResponse)
 async def dashboard(request: Request):
-    return templates.TemplateResponse("dashboard.html", {"request": request})
+    return pagina("dashboard.html", request)
 
 @app.get("/alertas", response_class=HTMLResponse)
 async def alertas_page(request: Request):
-    return templates.TemplateResponse("alertas.html", {"request": request})
+    return pagina("alertas.html", request)
 
 @app.get("/empresas", response_class=HTMLResponse)
 async def empresas_page(request: Request):
-    return templates.TemplateResponse("empresas.html", {"request": request})
+    return pagina("empresas.html", request)
 
 @app.get("/consultores", response_class=HTMLResponse)
 async def consultores_page(request: Request):
-    return templates.TemplateResponse("consultores.html", {"request": request})
+    return pagina("consultores.html", request)
 
 @app.get("/prospeccao", response_class=HTMLResponse)
 async def prospeccao(request: Request):
-    return templates.TemplateResponse("prospeccao.html", {"request": request})
+    return pagina("prospeccao.html", request)
 
 @app.get("/cronograma", response_class=HTMLResponse)
 async def cronograma_page(request: Request):
-    return templates.TemplateResponse("cronograma.html", {"request": request})
+    return pagina("cronograma.html", request)
 
 @app.get("/contratos", response_class=HTMLResponse)
 async def contratos_page(request: Request):
-    return templates.TemplateResponse("contratos.html", {"request": request})
+    return pagina("contratos.html", request)
 
 @app.get("/chatbot", response_class=HTMLResponse)
 async def chatbot_page(request: Request):
-    return templates.TemplateResponse("chatbot.html", {"request": request})
+    return pagina("chatbot.html", request)
 
 @app.get("/importacao", response_class=HTMLResponse)
 async def importacao_page(request: Request):
-    return templates.TemplateResponse("importacao.html", {"request": request})
+    return pagina("importacao.html", request)
 
 @app.get("/usuarios", response_class=HTMLResponse)
 async def usuarios_page(request: Request):
-    return templates.TemplateResponse("usuarios.html", {"request": request})
+    return pagina("usuarios.html", request)
 
 @app.get("/relatorios", response_class=HTMLResponse)
 async def relatorios_page(request: Request):
-    return templates.TemplateResponse("relatorios.html", {"request": request})
+    return pagina("relatorios.html", request)
 
 @app.get("/contatos", response_class=HTMLResponse)
 async def contatos_page(request: Request):
-    return templates.TemplateResponse("contatos.html", {"request": request})
+    return pagina("contatos.html", request)
 
 @app.get("/linha-tecnologia", response_class=HTMLResponse)
 async def linha_tecnologia_page(request: Request):
-    return templates.TemplateResponse("linha_tecnologia.html", {"request": request})
+    return pagina("linha_tecnologia.html", request)
 
 @app.get("/linha-educacional", response_class=HTMLResponse)
 async def linha_educacional_page(request: Request):
-    return templates.TemplateResponse("linha_educacional.html", {"request": request})
+    return pagina("linha_educacional.html", request)
 
 @app.get("/health")
 async def health_check():
@@ -1,7 +1,9 @@
-from sqlalchemy import Column, Integer, String, Date, Numeric, ForeignKey, Text, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, Date, Numeric, ForeignKey, Text, DateTime, Boolean, UniqueConstraint, Index, JSON
+from sqlalchemy import event
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database import Base
+from app.cnpj import normalizar_cnpj
 import enum
 
 class FuncaoUsuario(str, enum.Enum):
@@ -29,6 +31,7 @@ class Empresa(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     cnpj = Column(String(18), unique=True, nullable=False, index=True)
+    cnpj_normalizado = Column(String(14), index=True)  # 14 dígitos, mantido pelo ORM
     nome = Column(String(255), nullable=False)
     sigla = Column(String(50))
     porte = Column(String(50))
@@ -50,6 +53,7 @@ class Empresa(Base):
     segmento = Column(String(255))
     regiao = Column(String(100))
     criado_em = Column(DateTime, default=datetime.utcnow)
+    atualizado_em = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relacionamentos
     propostas = relationship("Proposta", back_populates="empresa")
@@ -64,6 +68,7 @@ class Consultor(Base):
     cargo = Column(String(100))
     ativo = Column(Boolean, default=True)
     criado_em = Column(DateTime, default=datetime.utcnow)
+    atualizado_em = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relacionamentos
     propostas = relationship("Proposta", back_populates="consultor")
@@ -73,7 +78,7 @@ class Proposta(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     numero_proposta = Column(String(50), unique=True, index=True)
-    empresa_id = Column(Integer, ForeignKey("empresas.id"), nullable=False)
+    empresa_id = Column(Integer, ForeignKey("empresas.id"), nullable=False, index=True)
     consultor_id = Column(Integer, ForeignKey("consultores.id"))
     solucao = Column(String(255))
     data_contato = Column(Date)
@@ -96,12 +101,14 @@ class Cronograma(Base):
     __tablename__ = "cronogramas"
     
     id = Column(Integer, primary_key=True, index=True)
-    proposta_id = Column(Integer, ForeignKey("propostas.id"), nullable=False)
+    proposta_id = Column(Integer, ForeignKey("propostas.id"), nullable=False, index=True)
     data_inicio = Column(Date)
     data_termino = Column(Date)
     horas_previstas = Column(Numeric(8, 2))
     horas_executadas = Column(Numeric(8, 2), default=0)
     percentual_conclusao = Column(Numeric(5, 2), default=0)
+    total_tarefas = Column(Integer, default=0)  # Mantidos por app.progresso
+    tarefas_concluidas = Column(Integer, default=0)
     status = Column(String(50))  # Não iniciado, Em andamento, Concluído, Atrasado
     observacoes = Column(Text)
     criado_em = Column(DateTime, default=datetime.utcnow)
@@ -115,7 +122,7 @@ class Tarefa(Base):
     __tablename__ = "tarefas"
     
     id = Column(Integer, primary_key=True, index=True)
-    cronograma_id = Column(Integer, ForeignKey("cronogramas.id"), nullable=False)
+    cronograma_id = Column(Integer, ForeignKey("cronogramas.id"), nullable=False, index=True)
     descricao = Column(String(500), nullable=False)
     data_vencimento = Column(Date)
     concluida = Column(Boolean, default=False)
@@ -129,7 +136,7 @@ class Contrato(Base):
     __tablename__ = "contratos"
     
     id = Column(Integer, primary_key=True, index=True)
-    proposta_id = Column(Integer, ForeignKey("propostas.id"), nullable=False)
+    proposta_id = Column(Integer, ForeignKey("propostas.id"), nullable=False, index=True)
     numero_contrato = Column(String(50), unique=True, index=True)
     data_assinatura = Column(Date)
     data_vencimento = Column(Date)
@@ -172,6 +179,7 @@ class Contato(Base):
     id = Column(Integer, primary_key=True, index=True)
     empresa = Column(String(255), index=True)
     cnpj = Column(String(18), index=True)
+    cnpj_normalizado = Column(String(14), index=True)  # 14 dígitos, mantido pelo ORM
     carteira = Column(String(100))
     porte = Column(String(50))
     er = Column(String(100))
@@ -197,6 +205,7 @@ class LinhaTecnologia(Base):
     linha = Column(String(100))
     tipo_programa = Column(String(100))
     cnpj = Column(String(18), index=True)
+    cnpj_normalizado = Column(String(14), index=True)  # 14 dígitos, mantido pelo ORM
     empresa = Column(String(255), index=True)
     porte = Column(String(50))
     er = Column(String(100))
@@ -233,6 +242,7 @@ class LinhaEducacional(Base):
     linha = Column(String(100))
     tipo_programa = Column(String(100))
     cnpj = Column(String(18), index=True)
+    cnpj_normalizado = Column(String(14), index=True)  # 14 dígitos, mantido pelo ORM
     empresa = Column(String(255), index=True)
     porte = Column(String(50))
     er = Column(String(100))
@@ -259,3 +269,78 @@ class LinhaEducacional(Base):
     dados_iniciais = Column(Boolean, default=False)  # Marca se é dado inicial fixo
     criado_em = Column(DateTime, default=datetime.utcnow)
     atualizado_em = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class ResumoMensal(Base):
+    __tablename__ = "resumo_mensal"
+    __table_args__ = (
+        UniqueConstraint("ano", "mes", "consultor_id", "status", name="uq_resumo_mensal_chave"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    ano = Column(Integer, nullable=False)  # 0 quando a data de referência é nula
+    mes = Column(Integer, nullable=False)  # 0 quando a data de referência é nula
+    consultor_id = Column(Integer, nullable=False)  # 0 quando não há consultor
+    status = Column(String(50), nullable=False)  # Status da proposta, do contrato ou do cronograma
+    receita = Column(Numeric(14, 2), nullable=False, default=0)
+    contratos = Column(Integer, nullable=False, default=0)
+    propostas_abertas = Column(Integer, nullable=False, default=0)
+    propostas_fechadas = Column(Integer, nullable=False, default=0)
+    propostas_perdidas = Column(Integer, nullable=False, default=0)
+    horas_executadas = Column(Numeric(12, 2), nullable=False, default=0)
+    cronogramas = Column(Integer, nullable=False, default=0)
+
+class Inicializacao(Base):
+    __tablename__ = "inicializacao"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    versao = Column(String(64), unique=True, nullable=False)  # Impressão digital do esquema e da rotina de inicialização
+    concluido_em = Column(DateTime, default=datetime.utcnow)
+    duracao_ms = Column(Integer)
+
+class ExecucaoVarredura(Base):
+    __tablename__ = "execucoes_varredura"
+
+    id = Column(Integer, primary_key=True, index=True)
+    data_referencia = Column(Date, nullable=False, index=True)  # "Hoje" usado para comparar as datas
+    origem = Column(String(20), nullable=False)  # agendada, manual
+    iniciado_em = Column(DateTime, default=datetime.utcnow)
+    duracao_ms = Column(Integer)
+    cronogramas_atrasados = Column(Integer, nullable=False, default=0)
+    cronogramas_em_andamento = Column(Integer, nullable=False, default=0)
+    contratos_vencidos = Column(Integer, nullable=False, default=0)
+
+class Remocao(Base):
+    """Registro de exclusão (tombstone) para o feed de alterações"""
+    __tablename__ = "remocoes"
+    __table_args__ = (
+        Index("ix_remocoes_tabela_removido_em", "tabela", "removido_em", "registro_id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    tabela = Column(String(50), nullable=False)
+    registro_id = Column(Integer, nullable=False)
+    removido_em = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+class Auditoria(Base):
+    """Alteração de campos de um registro auditado, com o usuário responsável"""
+    __tablename__ = "auditoria"
+    __table_args__ = (
+        Index("ix_auditoria_tabela_registro", "tabela", "registro_id", "id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    tabela = Column(String(50), nullable=False)
+    registro_id = Column(Integer, nullable=False)
+    operacao = Column(String(20), nullable=False)  # criado, alterado, removido
+    usuario_id = Column(Integer, index=True)  # None quando não houve usuário (rotinas do sistema)
+    alteracoes = Column(JSON, nullable=False)  # {campo: [antes, depois]}
+    criado_em = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+MODELOS_COM_CNPJ = (Empresa, Contato, LinhaTecnologia, LinhaEducacional)
+
+def _preencher_cnpj_normalizado(mapper, connection, target):
+    target.cnpj_normalizado = normalizar_cnpj(target.cnpj)
+
+for _modelo in MODELOS_COM_CNPJ:
+    event.listen(_modelo, "before_insert", _preencher_cnpj_normalizado)
+    event.listen(_modelo, "before_update", _preencher_cnpj_normalizado)
@@ -0,0 +1,181 @@
+"""Progresso dos cronogramas mantido a partir das tarefas.
+
+Cada cronograma guarda `total_tarefas` e `tarefas_concluidas`. Quando uma
+tarefa é criada, marcada/desmarcada, movida ou excluída, o flush ajusta os
+contadores do cronograma (com a linha travada, para não perder incrementos
+concorrentes), recalcula `percentual_conclusao` e o status. A alteração do
+cronograma entra no mesmo flush, pelo ORM, então resumo mensal, alertas e
+versões de cache a enxergam normalmente.
+
+`recalcular_progresso` reconstrói os contadores com uma consulta agrupada.
+"""
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+from typing import Iterable, Optional
+
+from sqlalchemy import case, event, func, inspect, select
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models.models import Cronograma, Tarefa
+
+CAMPOS_TAREFA = ("cronograma_id", "concluida")
+
+
+def atualizar_status(cronograma: Cronograma, hoje: Optional[date] = None):
+    """Define o status do cronograma pelo percentual concluído e pelas datas"""
+    hoje = hoje or date.today()
+    percentual = cronograma.percentual_conclusao or 0
+
+    if percentual >= 100:
+        cronograma.status = "Concluído"
+    elif cronograma.data_termino and cronograma.data_termino < hoje:
+        cronograma.status = "Atrasado"
+    elif cronograma.data_inicio and cronograma.data_inicio <= hoje:
+        cronograma.status = "Em andamento"
+    else:
+        cronograma.status = "Não iniciado"
+
+
+def aplicar_contagem(cronograma: Cronograma, total: int, concluidas: int, hoje: Optional[date] = None):
+    """Grava os contadores e, havendo tarefas, o percentual; o status é sempre recalculado"""
+    cronograma.total_tarefas = total
+    cronograma.tarefas_concluidas = concluidas
+    if total > 0:
+        percentual = (Decimal(concluidas) * 100 / Decimal(total)).quantize(Decimal("0.01"))
+        if cronograma.percentual_conclusao is None or Decimal(cronograma.percentual_conclusao) != percentual:
+            cronograma.percentual_conclusao = percentual
+    atualizar_status(cronograma, hoje)
+
+
+def _contribuicao(cronograma_id, concluida) -> tuple:
+    return cronograma_id, 1, 1 if concluida else 0
+
+
+def _valores_antigos(obj: Tarefa) -> dict:
+    estado = inspect(obj)
+    valores = {}
+    for campo in CAMPOS_TAREFA:
+        historico = estado.attrs[campo].history
+        if historico.deleted:
+            valores[campo] = historico.deleted[0]
+        elif historico.unchanged:
+            valores[campo] = historico.unchanged[0]
+        else:
+            valores[campo] = getattr(obj, campo)
+    return valores
+
+
+def _cronograma_id(obj: Tarefa):
+    if obj.cronograma_id is not None:
+        return obj.cronograma_id
+    # Tarefa adicionada pelo relacionamento: o id só é copiado durante o flush
+    cronograma = inspect(obj).attrs.cronograma.loaded_value
+    return cronograma if isinstance(cronograma, Cronograma) else None
+
+
+@event.listens_for(SessionLocal, "before_flush")
+def _atualizar_contadores(session: Session, flush_context, instancias):
+    deltas = defaultdict(lambda: [0, 0])
+
+    def aplicar(contribuicao, sinal):
+        chave, total, concluidas = contribuicao
+        if chave is None:
+            return
+        deltas[chave][0] += sinal * total
+        deltas[chave][1] += sinal * concluidas
+
+    for obj in session.new:
+        if isinstance(obj, Tarefa):
+            aplicar(_contribuicao(_cronograma_id(obj), obj.concluida), 1)
+    for obj in session.deleted:
+        if isinstance(obj, Tarefa):
+            antigo = _valores_antigos(obj)
+            aplicar(_contribuicao(antigo["cronograma_id"], antigo["concluida"]), -1)
+    for obj in session.dirty:
+        if not isinstance(obj, Tarefa) or obj in session.deleted:
+            continue
+        estado = inspect(obj)
+        if not any(estado.attrs[campo].history.has_changes() for campo in CAMPOS_TAREFA):
+            continue
+        antigo = _valores_antigos(obj)
+        aplicar(_contribuicao(antigo["cronograma_id"], antigo["concluida"]), -1)
+        aplicar(_contribuicao(_cronograma_id(obj), obj.concluida), 1)
+
+    deltas = {chave: d for chave, d in deltas.items() if d != [0, 0]}
+    if not deltas:
+        return
+
+    hoje = date.today()
+    ids = [chave for chave in deltas if not isinstance(chave, Cronograma)]
+    atuais = {}
+    if ids:
+        # Valores atuais do banco com as linhas travadas até o commit
+        with session.no_autoflush:
+            linhas = session.execute(
+                select(Cronograma.id, Cronograma.total_tarefas, Cronograma.tarefas_concluidas)
+                .where(Cronograma.id.in_(ids))
+                .with_for_update()
+            ).all()
+        atuais = {cid: (total or 0, concluidas or 0) for cid, total, concluidas in linhas}
+
+    for chave, (delta_total, delta_concluidas) in deltas.items():
+        if isinstance(chave, Cronograma):
+            cronograma = chave
+            total, concluidas = cronograma.total_tarefas or 0, cronograma.tarefas_concluidas or 0
+        else:
+            if chave not in atuais:
+                continue
+            with session.no_autoflush:
+                cronograma = session.get(Cronograma, chave)
+            total, concluidas = atuais[chave]
+        aplicar_contagem(cronograma, max(total + delta_total, 0), max(concluidas + delta_concluidas, 0), hoje)
+
+
+def _registrar_historico_ativo():
+    """Garante que o valor antigo dos campos acompanhados seja carregado ao alterá-los"""
+    for campo in CAMPOS_TAREFA:
+        event.listen(getattr(Tarefa, campo), "set", lambda *args: None, active_history=True)
+
+
+_registrar_historico_ativo()
+
+
+def recalcular_progresso(db: Session, cronograma_ids: Optional[Iterable[int]] = None) -> dict:
+    """Reconstrói contadores, percentual e status a partir das tarefas (todos os cronogramas ou os informados)"""
+    consulta = select(
+        Tarefa.cronograma_id,
+        func.count(Tarefa.id),
+        func.sum(case((Tarefa.concluida.is_(True), 1), else_=0)),
+    ).group_by(Tarefa.cronograma_id)
+    cronogramas = db.query(Cronograma)
+    if cronograma_ids is not None:
+        cronograma_ids = list(cronograma_ids)
+        consulta = consulta.where(Tarefa.cronograma_id.in_(cronograma_ids))
+        cronogramas = cronogramas.filter(Cronograma.id.in_(cronograma_ids))
+
+    contagens = {cid: (total, int(concluidas or 0)) for cid, total, concluidas in db.execute(consulta)}
+
+    hoje = date.today()
+    total_cronogramas = 0
+    for cronograma in cronogramas.all():
+        total_cronogramas += 1
+        total, concluidas = contagens.get(cronograma.id, (0, 0))
+        aplicar_contagem(cronograma, total, concluidas, hoje)
+
+    # Só os cronogramas que mudaram viram UPDATE (agrupados num executemany)
+    atualizados = sum(1 for obj in db.dirty if isinstance(obj, Cronograma) and db.is_modified(obj))
+    db.commit()
+    return {"cronogramas": total_cronogramas, "atualizados": atualizados}
+
+
+def garantir_progresso():
+    """Preenche os contadores na inicialização (colunas novas começam zeradas)"""
+    db = SessionLocal()
+    try:
+        resultado = recalcular_progresso(db)
+        print(f"✓ Progresso de {resultado['cronogramas']} cronogramas verificado "
+              f"({resultado['atualizados']} atualizados)")
+    finally:
+        db.close()
@@ -0,0 +1,358 @@
+"""Resumo mensal (mês × consultor × status) que alimenta os endpoints de BI.
+
+Cada proposta, contrato e cronograma contribui com valores para uma ou mais
+chaves do resumo. Nas escritas feitas pelo ORM, as contribuições antigas são
+subtraídas e as novas somadas na mesma transação; `ajustar_status` faz o
+mesmo para as trocas de status em massa da varredura diária, e
+`reconstruir_resumo` recalcula tudo a partir das tabelas com as mesmas regras.
+"""
+from collections import defaultdict
+from decimal import Decimal
+import logging
+
+from sqlalchemy import event, func, extract, select, inspect, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.versoes import marcar_alterada
+from app.models.models import Proposta, Contrato, Cronograma, ResumoMensal
+
+logger = logging.getLogger(__name__)
+
+METRICAS = (
+    "receita",
+    "contratos",
+    "propostas_abertas",
+    "propostas_fechadas",
+    "propostas_perdidas",
+    "horas_executadas",
+    "cronogramas",
+)
+
+METRICAS_CONTAGEM = {"contratos", "propostas_abertas", "propostas_fechadas", "propostas_perdidas", "cronogramas"}
+
+CAMPOS_PROPOSTA = ("consultor_id", "status", "data_proposta", "data_fechamento")
+CAMPOS_CONTRATO = ("proposta_id", "status_pagamento", "data_assinatura", "valor")
+CAMPOS_CRONOGRAMA = ("proposta_id", "status", "data_inicio", "horas_executadas")
+
+
+def _mes(data):
+    return (data.year, data.month) if data else (0, 0)
+
+
+def _chave(data, consultor_id, status):
+    ano, mes = _mes(data)
+    return (ano, mes, consultor_id or 0, status or "")
+
+
+def contribuicoes_proposta(v: dict) -> list:
+    """Contribuições de uma proposta a partir de seus valores"""
+    resultado = [(_chave(v["data_proposta"], v["consultor_id"], v["status"]), {"propostas_abertas": 1})]
+    if v["status"] == "Fechado":
+        resultado.append((_chave(v["data_fechamento"], v["consultor_id"], "Fechado"), {"propostas_fechadas": 1}))
+    elif v["status"] == "Perdido":
+        resultado.append((_chave(v["data_fechamento"], v["consultor_id"], "Perdido"), {"propostas_perdidas": 1}))
+    return resultado
+
+
+def contribuicoes_contrato(v: dict, consultor_id) -> list:
+    """Contribuições de um contrato; o consultor vem da proposta"""
+    return [(
+        _chave(v["data_assinatura"], consultor_id, v["status_pagamento"]),
+        {"receita": v["valor"] or Decimal(0), "contratos": 1}
+    )]
+
+
+def contribuicoes_cronograma(v: dict, consultor_id) -> list:
+    """Contribuições de um cronograma; o consultor vem da proposta"""
+    return [(
+        _chave(v["data_inicio"], consultor_id, v["status"]),
+        {"horas_executadas": v["horas_executadas"] or Decimal(0), "cronogramas": 1}
+    )]
+
+
+def _valores_atuais(obj, campos):
+    return {campo: getattr(obj, campo) for campo in campos}
+
+
+def _valores_antigos(obj, campos):
+    valores = {}
+    estado = inspect(obj)
+    for campo in campos:
+        historico = estado.attrs[campo].history
+        if historico.deleted:
+            valores[campo] = historico.deleted[0]
+        elif historico.unchanged:
+            valores[campo] = historico.unchanged[0]
+        elif historico.added:
+            valores[campo] = None
+        else:
+            valores[campo] = getattr(obj, campo)
+    return valores
+
+
+def _alterado(obj, campos):
+    estado = inspect(obj)
+    return any(estado.attrs[campo].history.has_changes() for campo in campos)
+
+
+class _Deltas:
+    def __init__(self):
+        self.valores = defaultdict(lambda: defaultdict(Decimal))
+
+    def aplicar(self, contribuicoes, sinal):
+        for chave, metricas in contribuicoes:
+            for metrica, valor in metricas.items():
+                self.valores[chave][metrica] += sinal * Decimal(str(valor))
+
+    def linhas(self):
+        for (ano, mes, consultor_id, status), metricas in self.valores.items():
+            metricas = {m: int(v) if m in METRICAS_CONTAGEM else v for m, v in metricas.items() if v != 0}
+            if metricas:
+                yield {"ano": ano, "mes": mes, "consultor_id": consultor_id, "status": status}, metricas
+
+
+def _consultores_das_propostas(conexao, proposta_ids):
+    ids = {pid for pid in proposta_ids if pid is not None}
+    if not ids:
+        return {}
+    linhas = conexao.execute(
+        select(Proposta.id, Proposta.consultor_id).where(Proposta.id.in_(ids))
+    ).all()
+    return {pid: cid for pid, cid in linhas}
+
+
+def _gravar_deltas(conexao, deltas: _Deltas):
+    for chave, metricas in deltas.linhas():
+        valores = {m: 0 for m in METRICAS}
+        valores.update({m: v for m, v in metricas.items()})
+        stmt = insert(ResumoMensal).values(**chave, **valores)
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_resumo_mensal_chave",
+            set_={m: getattr(ResumoMensal, m) + stmt.excluded[m] for m in metricas}
+        )
+        conexao.execute(stmt)
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _atualizar_resumo(session: Session, flush_context):
+    alterados = [
+        (obj, "novo") for obj in session.new
+    ] + [
+        (obj, "alterado") for obj in session.dirty if session.is_modified(obj, include_collections=False)
+    ] + [
+        (obj, "removido") for obj in session.deleted
+    ]
+    alterados = [(obj, tipo) for obj, tipo in alterados if isinstance(obj, (Proposta, Contrato, Cronograma))]
+    if not alterados:
+        return
+
+    conexao = session.connection()
+    deltas = _Deltas()
+
+    # Consultor antes/depois das propostas alteradas neste flush
+    consultor_antigo = {}
+    consultor_novo = {}
+    propostas_trocaram_consultor = set()
+    for obj, tipo in alterados:
+        if not isinstance(obj, Proposta):
+            continue
+        if tipo != "novo":
+            consultor_antigo[obj.id] = _valores_antigos(obj, ("consultor_id",))["consultor_id"]
+        if tipo != "removido":
+            consultor_novo[obj.id] = obj.consultor_id
+        if tipo == "alterado" and consultor_antigo[obj.id] != consultor_novo[obj.id]:
+            propostas_trocaram_consultor.add(obj.id)
+
+    filhos_ids = set()
+    for obj, tipo in alterados:
+        if not isinstance(obj, Proposta):
+            filhos_ids.add(obj.proposta_id)
+            filhos_ids.add(_valores_antigos(obj, ("proposta_id",))["proposta_id"])
+    consultores_bd = _consultores_das_propostas(conexao, filhos_ids)
+
+    def consultor(proposta_id, antigo):
+        origem = consultor_antigo if antigo else consultor_novo
+        if proposta_id in origem:
+            return origem[proposta_id]
+        return consultores_bd.get(proposta_id)
+
+    tratados = {Contrato: set(), Cronograma: set()}
+    for obj, tipo in alterados:
+        if isinstance(obj, Proposta):
+            campos, contribuir = CAMPOS_PROPOSTA, lambda v, antigo: contribuicoes_proposta(v)
+        elif isinstance(obj, Contrato):
+            campos = CAMPOS_CONTRATO
+            contribuir = lambda v, antigo: contribuicoes_contrato(v, consultor(v["proposta_id"], antigo))
+        else:
+            campos = CAMPOS_CRONOGRAMA
+            contribuir = lambda v, antigo: contribuicoes_cronograma(v, consultor(v["proposta_id"], antigo))
+
+        if tipo == "alterado" and not _alterado(obj, campos) and not (
+            not isinstance(obj, Proposta) and obj.proposta_id in propostas_trocaram_consultor
+        ):
+            continue
+        if tipo != "novo":
+            deltas.aplicar(contribuir(_valores_antigos(obj, campos), True), -1)
+        if tipo != "removido":
+            deltas.aplicar(contribuir(_valores_atuais(obj, campos), False), 1)
+        if not isinstance(obj, Proposta):
+            tratados[type(obj)].add(obj.id)
+
+    # Contratos e cronogramas não carregados cujas propostas trocaram de consultor
+    if propostas_trocaram_consultor:
+        for modelo, campos, contribuir in (
+            (Contrato, CAMPOS_CONTRATO, contribuicoes_contrato),
+            (Cronograma, CAMPOS_CRONOGRAMA, contribuicoes_cronograma),
+        ):
+            colunas = [modelo.id] + [getattr(modelo, c) for c in campos]
+            linhas = conexao.execute(
+                select(*colunas).where(modelo.proposta_id.in_(propostas_trocaram_consultor))
+            ).all()
+            for linha in linhas:
+                if linha[0] in tratados[modelo]:
+                    continue
+                v = dict(zip(campos, linha[1:]))
+                pid = v["proposta_id"]
+                deltas.aplicar(contribuir(v, consultor_antigo[pid]), -1)
+                deltas.aplicar(contribuir(v, consultor_novo[pid]), 1)
+
+    _gravar_deltas(conexao, deltas)
+    marcar_alterada(session, ResumoMensal.__tablename__)
+
+
+def ajustar_status(session: Session, mudancas: list):
+    """Move as contribuições de contratos e cronogramas cujo status foi trocado por UPDATE em massa.
+
+    `mudancas` traz tuplas (modelo, valores antes da troca, consultor da proposta, novo status),
+    com os valores de CAMPOS_CONTRATO ou CAMPOS_CRONOGRAMA.
+    """
+    deltas = _Deltas()
+    for modelo, valores, consultor_id, novo_status in mudancas:
+        if modelo is Contrato:
+            coluna, contribuir = "status_pagamento", contribuicoes_contrato
+        else:
+            coluna, contribuir = "status", contribuicoes_cronograma
+        deltas.aplicar(contribuir(valores, consultor_id), -1)
+        deltas.aplicar(contribuir({**valores, coluna: novo_status}, consultor_id), 1)
+    _gravar_deltas(session.connection(), deltas)
+    marcar_alterada(session, ResumoMensal.__tablename__)
+
+
+def _registrar_historico_ativo():
+    """Garante que o valor antigo dos campos acompanhados seja carregado ao alterá-los"""
+    for modelo, campos in (
+        (Proposta, CAMPOS_PROPOSTA),
+        (Contrato, CAMPOS_CONTRATO),
+        (Cronograma, CAMPOS_CRONOGRAMA),
+    ):
+        for campo in campos:
+            event.listen(getattr(modelo, campo), "set", lambda *args: None, active_history=True)
+
+
+_registrar_historico_ativo()
+
+
+def calcular_resumo_completo(db: Session) -> dict:
+    """Recalcula o resumo inteiro com consultas agrupadas, seguindo as mesmas regras das contribuições"""
+    deltas = _Deltas()
+
+    def ano_mes(coluna):
+        return (
+            func.coalesce(extract("year", coluna), 0).label("ano"),
+            func.coalesce(extract("month", coluna), 0).label("mes"),
+        )
+
+    def acumular(linhas, metrica, valor_indice=4):
+        for linha in linhas:
+            chave = (int(linha[0]), int(linha[1]), linha[2] or 0, linha[3] or "")
+            deltas.valores[chave][metrica] += Decimal(str(linha[valor_indice] or 0))
+
+    consultor_proposta = func.coalesce(Proposta.consultor_id, 0)
+    status_proposta = func.coalesce(Proposta.status, "")
+
+    linhas = db.query(*ano_mes(Proposta.data_proposta), consultor_proposta, status_proposta, func.count(Proposta.id))\
+        .group_by(*ano_mes(Proposta.data_proposta), consultor_proposta, status_proposta).all()
+    acumular(linhas, "propostas_abertas")
+
+    for status, metrica in (("Fechado", "propostas_fechadas"), ("Perdido", "propostas_perdidas")):
+        linhas = db.query(*ano_mes(Proposta.data_fechamento), consultor_proposta, Proposta.status, func.count(Proposta.id))\
+            .filter(Proposta.status == status)\
+            .group_by(*ano_mes(Proposta.data_fechamento), consultor_proposta, Proposta.status).all()
+        acumular(linhas, metrica)
+
+    status_contrato = func.coalesce(Contrato.status_pagamento, "")
+    linhas = db.query(
+        *ano_mes(Contrato.data_assinatura), consultor_proposta, status_contrato,
+        func.coalesce(func.sum(Contrato.valor), 0), func.count(Contrato.id)
+    ).join(Proposta, Contrato.proposta_id == Proposta.id)\
+     .group_by(*ano_mes(Contrato.data_assinatura), consultor_proposta, status_contrato).all()
+    acumular(linhas, "receita")
+    acumular(linhas, "contratos", valor_indice=5)
+
+    status_cronograma = func.coalesce(Cronograma.status, "")
+    linhas = db.query(
+        *ano_mes(Cronograma.data_inicio), consultor_proposta, status_cronograma,
+        func.coalesce(func.sum(Cronograma.horas_executadas), 0), func.count(Cronograma.id)
+    ).join(Proposta, Cronograma.proposta_id == Proposta.id)\
+     .group_by(*ano_mes(Cronograma.data_inicio), consultor_proposta, status_cronograma).all()
+    acumular(linhas, "horas_executadas")
+    acumular(linhas, "cronogramas", valor_indice=5)
+
+    return {
+        (chave["ano"], chave["mes"], chave["consultor_id"], chave["status"]): metricas
+        for chave, metricas in deltas.linhas()
+    }
+
+
+def reconstruir_resumo(db: Session) -> int:
+    """Apaga e recria todas as linhas do resumo mensal"""
+    if db.get_bind().dialect.name == "postgresql":
+        # Segura as atualizações incrementais até o commit: um delta gravado entre o
+        # cálculo e a regravação seria apagado sem entrar no recálculo
+        db.execute(text("LOCK TABLE resumo_mensal IN EXCLUSIVE MODE"))
+    resumo = calcular_resumo_completo(db)
+    db.query(ResumoMensal).delete(synchronize_session=False)
+    linhas = []
+    for (ano, mes, consultor_id, status), metricas in resumo.items():
+        valores = {m: 0 for m in METRICAS}
+        valores.update(metricas)
+        linhas.append({"ano": ano, "mes": mes, "consultor_id": consultor_id, "status": status, **valores})
+    if linhas:
+        db.execute(insert(ResumoMensal), linhas)
+    db.commit()
+    return len(linhas)
+
+
+def verificar_resumo(db: Session) -> list:
+    """Compara o resumo incremental com um recálculo completo e retorna as chaves divergentes"""
+    esperado = calcular_resumo_completo(db)
+    atual = {}
+    for linha in db.query(ResumoMensal).all():
+        metricas = {m: Decimal(getattr(linha, m)) for m in METRICAS if getattr(linha, m)}
+        if metricas:
+            atual[(linha.ano, linha.mes, linha.consultor_id, linha.status)] = metricas
+    divergencias = []
+    for chave in set(esperado) | set(atual):
+        if esperado.get(chave, {}) != atual.get(chave, {}):
+            divergencias.append({
+                "ano": chave[0],
+                "mes": chave[1],
+                "consultor_id": chave[2],
+                "status": chave[3],
+                "esperado": {m: float(v) for m, v in esperado.get(chave, {}).items()},
+                "atual": {m: float(v) for m, v in atual.get(chave, {}).items()},
+            })
+    return divergencias
+
+
+def garantir_resumo():
+    """Reconstrói o resumo na inicialização quando a tabela ainda está vazia"""
+    db = SessionLocal()
+    try:
+        if db.query(ResumoMensal.id).first() is None and db.query(Proposta.id).first() is not None:
+            total = reconstruir_resumo(db)
+            logger.info(f"Resumo mensal reconstruído com {total} linhas")
+    finally:
+        db.close()
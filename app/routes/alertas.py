@@ -3,19 +3,29 @@ from sqlalchemy.orm import Session
 from datetime import date, timedelta, datetime
 from typing import List, Dict, Any
 
-from app.database import get_db
+from app.database import get_db_leitura
 from app.models.models import Contrato, Cronograma, Proposta, Usuario
 from app.auth import get_current_user
+from app.calendario import dias_uteis_entre, limite_alerta, texto_dias_uteis
+from app.coalescencia import coalescer
 
 router = APIRouter()
 
+def _dias_uteis(inicio: date, fim: date) -> int:
+    try:
+        return dias_uteis_entre(inicio, fim)
+    except ValueError:
+        # Data digitada fora do calendário (ex.: ano errado): contar dias corridos
+        return (fim - inicio).days
+
 @router.get("/todos")
+@coalescer
 async def obter_todos_alertas(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_leitura),
     current_user: Usuario = Depends(get_current_user)
 ) -> Dict[str, Any]:
     hoje = date.today()
-    sete_dias = hoje + timedelta(days=7)
+    limite = limite_alerta(hoje)
     trinta_dias_atras = hoje - timedelta(days=30)
     
     contratos_vencidos = db.query(Contrato).filter(
@@ -24,7 +34,7 @@ async def obter_todos_alertas(
     ).all()
     
     contratos_vencendo = db.query(Contrato).filter(
-        Contrato.data_vencimento <= sete_dias,
+        Contrato.data_vencimento <= limite,
         Contrato.data_vencimento >= hoje,
         Contrato.status_pagamento == "Pendente"
     ).all()
@@ -35,7 +45,7 @@ async def obter_todos_alertas(
     ).all()
     
     cronogramas_vencendo = db.query(Cronograma).filter(
-        Cronograma.data_termino <= sete_dias,
+        Cronograma.data_termino <= limite,
         Cronograma.data_termino >= hoje,
         Cronograma.status != "Concluído"
     ).all()
@@ -47,7 +57,7 @@ async def obter_todos_alertas(
     
     tarefas_criticas = db.query(Cronograma).filter(
         Cronograma.percentual_conclusao < 30,
-        Cronograma.data_termino <= sete_dias,
+        Cronograma.data_termino <= limite,
         Cronograma.status != "Concluído"
     ).all()
     
@@ -72,7 +82,8 @@ async def obter_todos_alertas(
                     "valor": float(c.valor) if c.valor else 0,
                     "status": c.status_pagamento,
                     "tipo_alerta": "CRÍTICO",
-                    "mensagem": f"Contrato {c.numero_contrato} vencido há {(hoje - c.data_vencimento).days} dias"
+                    "dias_uteis": _dias_uteis(c.data_vencimento, hoje),
+                    "mensagem": f"Contrato {c.numero_contrato} vencido há {texto_dias_uteis(_dias_uteis(c.data_vencimento, hoje))}"
                 } for c in contratos_vencidos
             ],
             "vencendo": [
@@ -83,7 +94,8 @@ async def obter_todos_alertas(
                     "valor": float(c.valor) if c.valor else 0,
                     "status": c.status_pagamento,
                     "tipo_alerta": "ATENÇÃO",
-                    "mensagem": f"Contrato {c.numero_contrato} vence em {(c.data_vencimento - hoje).days} dias"
+                    "dias_uteis": _dias_uteis(hoje, c.data_vencimento),
+                    "mensagem": f"Contrato {c.numero_contrato} vence em {texto_dias_uteis(_dias_uteis(hoje, c.data_vencimento))}"
                 } for c in contratos_vencendo
             ]
         },
@@ -96,7 +108,8 @@ async def obter_todos_alertas(
                     "percentual_conclusao": float(cr.percentual_conclusao),
                     "status": cr.status,
                     "tipo_alerta": "CRÍTICO",
-                    "mensagem": f"Projeto atrasado há {(hoje - cr.data_termino).days} dias - {cr.percentual_conclusao}% concluído"
+                    "dias_uteis": _dias_uteis(cr.data_termino, hoje),
+                    "mensagem": f"Projeto atrasado há {texto_dias_uteis(_dias_uteis(cr.data_termino, hoje))} - {cr.percentual_conclusao}% concluído"
                 } for cr in cronogramas_atrasados
             ],
             "vencendo": [
@@ -107,7 +120,8 @@ async def obter_todos_alertas(
                     "percentual_conclusao": float(cr.percentual_conclusao),
                     "status": cr.status,
                     "tipo_alerta": "ATENÇÃO",
-                    "mensagem": f"Projeto vence em {(cr.data_termino - hoje).days} dias - {cr.percentual_conclusao}% concluído"
+                    "dias_uteis": _dias_uteis(hoje, cr.data_termino),
+                    "mensagem": f"Projeto vence em {texto_dias_uteis(_dias_uteis(hoje, cr.data_termino))} - {cr.percentual_conclusao}% concluído"
                 } for cr in cronogramas_vencendo
             ]
         },
@@ -138,13 +152,8 @@ async def obter_todos_alertas(
     
     return alertas
 
-@router.get("/resumo")
-async def obter_resumo_alertas(
-    db: Session = Depends(get_db),
-    current_user: Usuario = Depends(get_current_user)
-):
+def calcular_resumo_alertas(db: Session) -> Dict[str, Any]:
     hoje = date.today()
-    sete_dias = hoje + timedelta(days=7)
     trinta_dias_atras = hoje - timedelta(days=30)
     
     total_contratos_vencidos = db.query(Contrato).filter(
@@ -169,3 +178,11 @@ async def obter_resumo_alertas(
         "propostas_paradas": total_propostas_paradas,
         "requer_atencao": total_contratos_vencidos + total_cronogramas_atrasados + total_propostas_paradas > 0
     }
+
+@router.get("/resumo")
+@coalescer
+async def obter_resumo_alertas(
+    db: Session = Depends(get_db_leitura),
+    current_user: Usuario = Depends(get_current_user)
+):
+    return calcular_resumo_alertas(db)
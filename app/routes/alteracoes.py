@@ -0,0 +1,41 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import Optional
+from datetime import datetime
+
+from app.database import get_db
+from app.models.models import Usuario
+from app.auth import require_role
+from app.alteracoes import ENTIDADES, chave_inicial, decodificar_cursor, listar_alteracoes
+from app.serializacao import RespostaJSON
+
+router = APIRouter()
+
+@router.get("/")
+async def listar_entidades(current_user: Usuario = Depends(require_role("Admin", "Financeiro"))):
+    return {"entidades": list(ENTIDADES)}
+
+@router.get("/{entidade}")
+async def obter_alteracoes(
+    entidade: str,
+    desde: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limite: int = Query(500, ge=1, le=5000),
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(require_role("Admin", "Financeiro"))
+):
+    """Registros alterados ou removidos depois do cursor (ou a partir de `desde`), em ordem.
+
+    Guarde o `cursor` da resposta e repita enquanto `tem_mais` for verdadeiro;
+    a próxima sincronização começa com o último cursor recebido.
+    """
+    if entidade not in ENTIDADES:
+        raise HTTPException(status_code=404, detail="Entidade não encontrada")
+    if cursor:
+        try:
+            chave = decodificar_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    else:
+        chave = chave_inicial(desde) if desde else None
+    return RespostaJSON(listar_alteracoes(db, entidade, chave, limite))
@@ -0,0 +1,77 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import Optional
+import asyncio
+
+from app.database import get_db
+from app.models.models import Auditoria, Usuario
+from app.auth import require_role
+from app.auditoria import ENTIDADES, escritor_auditoria
+
+router = APIRouter()
+
+def _listar(db: Session, entidade: str, registro_id: Optional[int], usuario_id: Optional[int],
+            antes_de: Optional[int], limite: int) -> dict:
+    query = db.query(Auditoria, Usuario.nome, Usuario.email).outerjoin(
+        Usuario, Usuario.id == Auditoria.usuario_id
+    ).filter(Auditoria.tabela == ENTIDADES[entidade].__tablename__)
+    if registro_id is not None:
+        query = query.filter(Auditoria.registro_id == registro_id)
+    if usuario_id is not None:
+        query = query.filter(Auditoria.usuario_id == usuario_id)
+    if antes_de is not None:
+        query = query.filter(Auditoria.id < antes_de)
+    linhas = query.order_by(Auditoria.id.desc()).limit(limite + 1).all()
+
+    itens = [
+        {
+            "id": entrada.id,
+            "registro_id": entrada.registro_id,
+            "operacao": entrada.operacao,
+            "usuario_id": entrada.usuario_id,
+            "usuario_nome": nome,
+            "usuario_email": email,
+            "alteracoes": entrada.alteracoes,
+            "criado_em": entrada.criado_em,
+        }
+        for entrada, nome, email in linhas[:limite]
+    ]
+    return {
+        "entidade": entidade,
+        "itens": itens,
+        # Próxima página: antes_de=<proximo>
+        "proximo": itens[-1]["id"] if len(linhas) > limite else None,
+    }
+
+async def _consultar(db: Session, entidade: str, registro_id: Optional[int], usuario_id: Optional[int],
+                     antes_de: Optional[int], limite: int) -> dict:
+    if entidade not in ENTIDADES:
+        raise HTTPException(status_code=404, detail="Entidade não auditada")
+    # Incluir o que este worker ainda tem no buffer
+    if escritor_auditoria.pendentes():
+        await asyncio.get_running_loop().run_in_executor(None, escritor_auditoria.descarregar)
+    return _listar(db, entidade, registro_id, usuario_id, antes_de, limite)
+
+@router.get("/{entidade}")
+async def listar_auditoria(
+    entidade: str,
+    usuario_id: Optional[int] = None,
+    antes_de: Optional[int] = None,
+    limite: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(require_role("Admin"))
+):
+    """Alterações mais recentes primeiro em propostas, contratos ou alocações"""
+    return await _consultar(db, entidade, None, usuario_id, antes_de, limite)
+
+@router.get("/{entidade}/{registro_id}")
+async def historico_registro(
+    entidade: str,
+    registro_id: int,
+    antes_de: Optional[int] = None,
+    limite: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(require_role("Admin"))
+):
+    """Histórico de um registro: quem alterou quais campos e quando"""
+    return await _consultar(db, entidade, registro_id, None, antes_de, limite)
@@ -7,8 +7,9 @@ from app.database import get_db
 from app.models.models import Usuario
 from app.schemas import UsuarioCreate, UsuarioUpdate, UsuarioResponse, LoginRequest, Token
 from app.auth import (
-    verify_password, 
-    get_password_hash, 
+    verificar_senha,
+    gerar_hash_senha,
+    precisa_rehash,
     create_access_token, 
     get_current_user,
     require_role,
@@ -20,7 +21,7 @@ router = APIRouter()
 @router.post("/login", response_model=Token)
 async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     user = db.query(Usuario).filter(Usuario.email == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.senha_hash):
+    if not user or not await verificar_senha(form_data.password, user.senha_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Email ou senha incorretos",
@@ -33,6 +34,11 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
             detail="Usuário inativo"
         )
     
+    # Atualizar o custo do hash de forma transparente, já que a senha é conhecida
+    if precisa_rehash(user.senha_hash):
+        user.senha_hash = await gerar_hash_senha(form_data.password)
+        db.commit()
+    
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={"sub": user.email, "funcao": user.funcao}, 
@@ -62,7 +68,7 @@ async def criar_usuario(
     new_usuario = Usuario(
         nome=usuario.nome,
         email=usuario.email,
-        senha_hash=get_password_hash(usuario.senha),
+        senha_hash=await gerar_hash_senha(usuario.senha),
         funcao=usuario.funcao
     )
     db.add(new_usuario)
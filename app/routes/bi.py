@@ -3,33 +3,50 @@ from sqlalchemy.orm import Session
 from sqlalchemy import func, extract
 from datetime import date, timedelta
 from decimal import Decimal
+from typing import Optional
 
-from app.database import get_db
-from app.models.models import Proposta, Cronograma, Contrato, Consultor, Usuario
-from app.auth import get_current_user
+from app.database import get_db, get_db_leitura
+from app.models.models import Cronograma, Contrato, Consultor, Usuario, ResumoMensal
+from app.auth import get_current_user, require_role
+from app.resumo_mensal import reconstruir_resumo, verificar_resumo
+from app.coalescencia import coalescer
 
 router = APIRouter()
 
+MESES = {1: "Jan", 2: "Fev", 3: "Mar", 4: "Abr", 5: "Mai", 6: "Jun",
+         7: "Jul", 8: "Ago", 9: "Set", 10: "Out", 11: "Nov", 12: "Dez"}
+
+def _filtrar_periodo(query, data_inicio: Optional[date], data_fim: Optional[date]):
+    """Restringe o resumo aos meses do intervalo; sem intervalo inclui também as linhas sem data"""
+    periodo = ResumoMensal.ano * 100 + ResumoMensal.mes
+    if data_inicio:
+        query = query.filter(periodo >= data_inicio.year * 100 + data_inicio.month)
+    if data_fim:
+        query = query.filter(periodo <= data_fim.year * 100 + data_fim.month)
+    if data_inicio or data_fim:
+        query = query.filter(ResumoMensal.ano > 0)
+    return query
+
 @router.get("/dashboard")
+@coalescer
 async def get_dashboard_data(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_leitura),
     current_user: Usuario = Depends(get_current_user)
 ):
     hoje = date.today()
     mes_atual = hoje.month
     ano_atual = hoje.year
     
-    total_propostas = db.query(func.count(Proposta.id)).scalar()
+    total_propostas = int(db.query(func.coalesce(func.sum(ResumoMensal.propostas_abertas), 0)).scalar())
     
-    propostas_ativas = db.query(func.count(Proposta.id)).filter(
-        Proposta.status == "Em andamento"
-    ).scalar()
+    propostas_ativas = int(db.query(func.coalesce(func.sum(ResumoMensal.propostas_abertas), 0)).filter(
+        ResumoMensal.status == "Em andamento"
+    ).scalar())
     
-    propostas_fechadas_mes = db.query(func.count(Proposta.id)).filter(
-        Proposta.status == "Fechado",
-        extract('month', Proposta.data_fechamento) == mes_atual,
-        extract('year', Proposta.data_fechamento) == ano_atual
-    ).scalar()
+    propostas_fechadas_mes = int(db.query(func.coalesce(func.sum(ResumoMensal.propostas_fechadas), 0)).filter(
+        ResumoMensal.mes == mes_atual,
+        ResumoMensal.ano == ano_atual
+    ).scalar())
     
     projetos_concluidos_mes = db.query(func.count(Cronograma.id)).filter(
         Cronograma.status == "Concluído",
@@ -37,21 +54,21 @@ async def get_dashboard_data(
         extract('year', Cronograma.atualizado_em) == ano_atual
     ).scalar()
     
-    total_horas_executadas = db.query(func.sum(Cronograma.horas_executadas)).scalar() or 0
+    total_horas_executadas = db.query(func.sum(ResumoMensal.horas_executadas)).scalar() or 0
     
-    receita_total = db.query(func.sum(Contrato.valor)).filter(
-        Contrato.status_pagamento == "Pago"
+    receita_total = db.query(func.sum(ResumoMensal.receita)).filter(
+        ResumoMensal.status == "Pago"
     ).scalar() or Decimal(0)
     
-    receita_mes = db.query(func.sum(Contrato.valor)).filter(
-        Contrato.status_pagamento == "Pago",
-        extract('month', Contrato.data_assinatura) == mes_atual,
-        extract('year', Contrato.data_assinatura) == ano_atual
+    receita_mes = db.query(func.sum(ResumoMensal.receita)).filter(
+        ResumoMensal.status == "Pago",
+        ResumoMensal.mes == mes_atual,
+        ResumoMensal.ano == ano_atual
     ).scalar() or Decimal(0)
     
-    total_propostas_fechadas = db.query(func.count(Proposta.id)).filter(
-        Proposta.status == "Fechado"
-    ).scalar()
+    total_propostas_fechadas = int(db.query(func.coalesce(func.sum(ResumoMensal.propostas_abertas), 0)).filter(
+        ResumoMensal.status == "Fechado"
+    ).scalar())
     
     taxa_conversao = 0
     if total_propostas > 0:
@@ -75,60 +92,103 @@ async def get_dashboard_data(
     }
 
 @router.get("/propostas-por-status")
+@coalescer
 async def propostas_por_status(
-    db: Session = Depends(get_db),
+    data_inicio: Optional[date] = None,
+    data_fim: Optional[date] = None,
+    db: Session = Depends(get_db_leitura),
     current_user: Usuario = Depends(get_current_user)
 ):
-    resultados = db.query(
-        Proposta.status, 
-        func.count(Proposta.id).label('total')
-    ).group_by(Proposta.status).all()
-    
-    return [{"status": r.status, "total": r.total} for r in resultados]
+    query = db.query(
+        ResumoMensal.status,
+        func.sum(ResumoMensal.propostas_abertas).label('total')
+    )
+    query = _filtrar_periodo(query, data_inicio, data_fim)
+    resultados = query.group_by(ResumoMensal.status)\
+        .having(func.sum(ResumoMensal.propostas_abertas) > 0).all()
+    
+    return [{"status": r.status or None, "total": int(r.total)} for r in resultados]
 
 @router.get("/propostas-por-consultor")
+@coalescer
 async def propostas_por_consultor(
-    db: Session = Depends(get_db),
+    data_inicio: Optional[date] = None,
+    data_fim: Optional[date] = None,
+    db: Session = Depends(get_db_leitura),
     current_user: Usuario = Depends(get_current_user)
 ):
-    resultados = db.query(
+    query = db.query(
         Consultor.nome,
-        func.count(Proposta.id).label('total')
-    ).join(Proposta, Proposta.consultor_id == Consultor.id).group_by(Consultor.nome).all()
+        func.sum(ResumoMensal.propostas_abertas).label('total')
+    ).join(ResumoMensal, ResumoMensal.consultor_id == Consultor.id)
+    query = _filtrar_periodo(query, data_inicio, data_fim)
+    resultados = query.group_by(Consultor.nome)\
+        .having(func.sum(ResumoMensal.propostas_abertas) > 0).all()
     
-    return [{"consultor": r.nome, "total": r.total} for r in resultados]
+    return [{"consultor": r.nome, "total": int(r.total)} for r in resultados]
 
 @router.get("/receita-mensal")
+@coalescer
 async def receita_mensal(
-    db: Session = Depends(get_db),
+    data_inicio: Optional[date] = None,
+    data_fim: Optional[date] = None,
+    db: Session = Depends(get_db_leitura),
     current_user: Usuario = Depends(get_current_user)
 ):
-    resultados = db.query(
-        extract('month', Contrato.data_assinatura).label('mes'),
-        extract('year', Contrato.data_assinatura).label('ano'),
-        func.sum(Contrato.valor).label('receita')
+    query = db.query(
+        ResumoMensal.mes,
+        ResumoMensal.ano,
+        func.sum(ResumoMensal.receita).label('receita')
     ).filter(
-        Contrato.status_pagamento == "Pago"
-    ).group_by('mes', 'ano').order_by('ano', 'mes').limit(12).all()
+        ResumoMensal.status == "Pago",
+        ResumoMensal.ano > 0
+    )
+    query = _filtrar_periodo(query, data_inicio, data_fim)
+    query = query.group_by(ResumoMensal.ano, ResumoMensal.mes)\
+        .having(func.sum(ResumoMensal.contratos) > 0)\
+        .order_by(ResumoMensal.ano.desc(), ResumoMensal.mes.desc())
+    
+    # Sem intervalo informado, retorna os 12 meses mais recentes
+    if not data_inicio and not data_fim:
+        query = query.limit(12)
     
-    meses = {1: "Jan", 2: "Fev", 3: "Mar", 4: "Abr", 5: "Mai", 6: "Jun",
-             7: "Jul", 8: "Ago", 9: "Set", 10: "Out", 11: "Nov", 12: "Dez"}
+    resultados = list(reversed(query.all()))
     
     return [{
-        "mes": f"{meses[int(r.mes)]}/{int(r.ano)}", 
+        "mes": f"{MESES[r.mes]}/{r.ano}", 
         "receita": float(r.receita or 0)
     } for r in resultados]
 
 @router.get("/produtividade-consultores")
+@coalescer
 async def produtividade_consultores(
-    db: Session = Depends(get_db),
+    data_inicio: Optional[date] = None,
+    data_fim: Optional[date] = None,
+    db: Session = Depends(get_db_leitura),
     current_user: Usuario = Depends(get_current_user)
 ):
-    resultados = db.query(
+    query = db.query(
         Consultor.nome,
-        func.sum(Cronograma.horas_executadas).label('horas')
-    ).join(Proposta, Proposta.consultor_id == Consultor.id)\
-     .join(Cronograma, Cronograma.proposta_id == Proposta.id)\
-     .group_by(Consultor.nome).all()
+        func.sum(ResumoMensal.horas_executadas).label('horas')
+    ).join(ResumoMensal, ResumoMensal.consultor_id == Consultor.id)
+    query = _filtrar_periodo(query, data_inicio, data_fim)
+    resultados = query.group_by(Consultor.nome)\
+        .having(func.sum(ResumoMensal.cronogramas) > 0).all()
     
     return [{"consultor": r.nome, "horas": float(r.horas or 0)} for r in resultados]
+
+@router.post("/resumo/reconstruir")
+async def reconstruir_resumo_mensal(
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(require_role("Admin"))
+):
+    total = reconstruir_resumo(db)
+    return {"message": "Resumo mensal reconstruído com sucesso", "linhas": total}
+
+@router.get("/resumo/verificar")
+async def verificar_resumo_mensal(
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(require_role("Admin"))
+):
+    divergencias = verificar_resumo(db)
+    return {"consistente": not divergencias, "divergencias": divergencias}
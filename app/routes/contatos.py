@@ -4,18 +4,17 @@ from sqlalchemy import or_, and_
 from typing import List, Optional
 from datetime import datetime, date
 from pydantic import BaseModel
-from app.database import get_db
+from app.database import get_db, get_db_leitura
 from app.models.models import Contato
 from app.auth import get_current_user
+from app.backends import obter_backend
+from app.exportacao import PADRAO_FORMATO, exportar_tabela
+from app.cnpj import normalizar_cnpj
+from app.lote import atualizar_lote, excluir_lote, alteracoes_por_id
+from app.schemas import LoteExclusao
+from app.serializacao import RespostaJSON, listar_colunas, obter_colunas
 from fastapi.responses import StreamingResponse
 import io
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib import colors
-from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.enums import TA_CENTER
-import pandas as pd
 
 router = APIRouter()
 
@@ -80,6 +79,22 @@ class ContatoResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class ContatoLoteItem(ContatoUpdate):
+    id: int
+
+class ContatoLoteAtualizacao(BaseModel):
+    ids: List[int]
+    dados: ContatoUpdate
+
+def _dados_iniciais(registros, detalhe):
+    return {registro_id: (403, detalhe) for registro_id, contato in registros.items() if contato.dados_iniciais}
+
+def _validar_alteracao_lote(db, registros, alteracoes):
+    return _dados_iniciais(registros, "Dados iniciais não podem ser modificados")
+
+def _validar_exclusao_lote(db, registros):
+    return _dados_iniciais(registros, "Dados iniciais não podem ser deletados")
+
 @router.get("/", response_model=List[ContatoResponse])
 async def listar_contatos(
     skip: int = 0,
@@ -89,12 +104,20 @@ async def listar_contatos(
     porte: Optional[str] = None,
     er: Optional[str] = None,
     carteira: Optional[str] = None,
+    cnpj: Optional[str] = None,
+    fields: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
     query = db.query(Contato)
     
     # Aplicar filtros
+    if cnpj:
+        chave = normalizar_cnpj(cnpj)
+        if chave is None:
+            raise HTTPException(status_code=400, detail="CNPJ inválido")
+        query = query.filter(Contato.cnpj_normalizado == chave)
+    
     if search:
         query = query.filter(
             or_(
@@ -117,12 +140,11 @@ async def listar_contatos(
     if carteira:
         query = query.filter(Contato.carteira == carteira)
     
-    contatos = query.order_by(Contato.empresa).offset(skip).limit(limit).all()
-    return contatos
+    return listar_colunas(query.order_by(Contato.empresa).offset(skip).limit(limit), Contato, ContatoResponse, fields)
 
 @router.get("/filtros")
 async def obter_filtros(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_leitura),
     current_user = Depends(get_current_user)
 ):
     """Retorna valores únicos para os filtros"""
@@ -136,16 +158,55 @@ async def obter_filtros(
         "carteiras": sorted([c[0] for c in carteiras if c[0]])
     }
 
+@router.patch("/lote")
+async def atualizar_contatos_lote(
+    lote: ContatoLoteAtualizacao,
+    tudo_ou_nada: bool = False,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """Aplica as mesmas alterações a vários contatos (ex.: trocar carteira ou ER)"""
+    dados = lote.dados.dict(exclude_unset=True)
+    if not dados:
+        raise HTTPException(status_code=400, detail="Nenhum campo para atualizar")
+    alteracoes = {contato_id: dados for contato_id in dict.fromkeys(lote.ids)}
+    return atualizar_lote(db, Contato, alteracoes, ContatoResponse, "Contato não encontrado",
+                          validar=_validar_alteracao_lote, tudo_ou_nada=tudo_ou_nada)
+
+@router.put("/lote")
+async def substituir_contatos_lote(
+    itens: List[ContatoLoteItem],
+    tudo_ou_nada: bool = False,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """Atualiza vários contatos, cada um com os seus próprios dados"""
+    alteracoes, repetidos = alteracoes_por_id(item.dict(exclude_unset=True) for item in itens)
+    return atualizar_lote(db, Contato, alteracoes, ContatoResponse, "Contato não encontrado",
+                          validar=_validar_alteracao_lote, erros_previos=repetidos, tudo_ou_nada=tudo_ou_nada)
+
+@router.post("/lote/excluir")
+async def deletar_contatos_lote(
+    lote: LoteExclusao,
+    tudo_ou_nada: bool = False,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    return excluir_lote(db, Contato, lote.ids, "Contato não encontrado",
+                        validar=_validar_exclusao_lote, tudo_ou_nada=tudo_ou_nada)
+
 @router.get("/{contato_id}", response_model=ContatoResponse)
 async def obter_contato(
     contato_id: int,
+    fields: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
-    contato = db.query(Contato).filter(Contato.id == contato_id).first()
+    query = db.query(Contato).filter(Contato.id == contato_id)
+    contato = obter_colunas(query, Contato, ContatoResponse, fields)
     if not contato:
         raise HTTPException(status_code=404, detail="Contato não encontrado")
-    return contato
+    return RespostaJSON(contato)
 
 @router.post("/", response_model=ContatoResponse)
 async def criar_contato(
@@ -197,21 +258,11 @@ async def deletar_contato(
     db.commit()
     return {"message": "Contato deletado com sucesso"}
 
-@router.get("/exportar/excel")
-async def exportar_excel(
-    search: Optional[str] = None,
-    empresa: Optional[str] = None,
-    porte: Optional[str] = None,
-    er: Optional[str] = None,
-    carteira: Optional[str] = None,
-    db: Session = Depends(get_db),
-    current_user = Depends(get_current_user)
-):
-    query = db.query(Contato)
-    
-    # Aplicar mesmos filtros
+def _condicoes_exportacao(search, empresa, porte, er, carteira) -> list:
+    """Filtros comuns às exportações"""
+    condicoes = []
     if search:
-        query = query.filter(
+        condicoes.append(
             or_(
                 Contato.empresa.ilike(f"%{search}%"),
                 Contato.cnpj.ilike(f"%{search}%"),
@@ -221,16 +272,44 @@ async def exportar_excel(
         )
     
     if empresa:
-        query = query.filter(Contato.empresa.ilike(f"%{empresa}%"))
+        condicoes.append(Contato.empresa.ilike(f"%{empresa}%"))
     
     if porte:
-        query = query.filter(Contato.porte == porte)
+        condicoes.append(Contato.porte == porte)
     
     if er:
-        query = query.filter(Contato.er == er)
+        condicoes.append(Contato.er == er)
     
     if carteira:
-        query = query.filter(Contato.carteira == carteira)
+        condicoes.append(Contato.carteira == carteira)
+    return condicoes
+
+@router.get("/exportar/dados")
+async def exportar_dados(
+    formato: str = Query("csv", alias="format", pattern=PADRAO_FORMATO),
+    search: Optional[str] = None,
+    empresa: Optional[str] = None,
+    porte: Optional[str] = None,
+    er: Optional[str] = None,
+    carteira: Optional[str] = None,
+    current_user = Depends(get_current_user)
+):
+    """Todos os contatos filtrados, em CSV ou Parquet, transmitidos em lotes"""
+    condicoes = _condicoes_exportacao(search, empresa, porte, er, carteira)
+    return exportar_tabela(Contato, condicoes, formato, "contatos")
+
+@router.get("/exportar/excel")
+async def exportar_excel(
+    search: Optional[str] = None,
+    empresa: Optional[str] = None,
+    porte: Optional[str] = None,
+    er: Optional[str] = None,
+    carteira: Optional[str] = None,
+    db: Session = Depends(get_db_leitura),
+    current_user = Depends(get_current_user)
+):
+    pd = obter_backend("pandas")
+    query = db.query(Contato).filter(*_condicoes_exportacao(search, empresa, porte, er, carteira))
     
     contatos = query.all()
     
@@ -278,9 +357,10 @@ async def exportar_pdf(
     porte: Optional[str] = None,
     er: Optional[str] = None,
     carteira: Optional[str] = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_leitura),
     current_user = Depends(get_current_user)
 ):
+    pdf = obter_backend("pdf")
     query = db.query(Contato)
     
     # Aplicar mesmos filtros
@@ -310,24 +390,24 @@ async def exportar_pdf(
     
     # Criar PDF em memória
     buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
+    doc = pdf.SimpleDocTemplate(buffer, pagesize=pdf.A4)
     elements = []
     
     # Estilos
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
+    styles = pdf.getSampleStyleSheet()
+    title_style = pdf.ParagraphStyle(
         'CustomTitle',
         parent=styles['Heading1'],
         fontSize=16,
-        textColor=colors.HexColor('#1e40af'),
+        textColor=pdf.colors.HexColor('#1e40af'),
         spaceAfter=30,
-        alignment=TA_CENTER
+        alignment=pdf.TA_CENTER
     )
     
     # Título
-    title = Paragraph("Relatório de Contatos", title_style)
+    title = pdf.Paragraph("Relatório de Contatos", title_style)
     elements.append(title)
-    elements.append(Spacer(1, 12))
+    elements.append(pdf.Spacer(1, 12))
     
     # Dados da tabela
     data = [["Empresa", "CNPJ", "Contato", "Cargo", "Telefone", "Email"]]
@@ -342,16 +422,16 @@ async def exportar_pdf(
         ])
     
     # Criar tabela
-    table = Table(data, colWidths=[2*inch, 1.2*inch, 1.5*inch, 1.2*inch, 1*inch, 1.5*inch])
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1e40af')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    table = pdf.Table(data, colWidths=[2*pdf.inch, 1.2*pdf.inch, 1.5*pdf.inch, 1.2*pdf.inch, 1*pdf.inch, 1.5*pdf.inch])
+    table.setStyle(pdf.TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), pdf.colors.HexColor('#1e40af')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), pdf.colors.whitesmoke),
         ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
         ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
         ('FONTSIZE', (0, 0), (-1, 0), 10),
         ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('BACKGROUND', (0, 1), (-1, -1), pdf.colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, pdf.colors.black),
         ('FONTSIZE', (0, 1), (-1, -1), 8),
     ]))
     
@@ -1,13 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from typing import List, Optional
-from datetime import date, timedelta
+from datetime import date
 
-from app.database import get_db
+from app.database import get_db, get_db_leitura
 from app.models.models import Contrato, Usuario
 from app.schemas import ContratoCreate, ContratoUpdate, ContratoResponse
 from app.auth import get_current_user
+from app.calendario import limite_alerta
+from app.exportacao import PADRAO_FORMATO, exportar_tabela
 
 router = APIRouter()
 
@@ -51,6 +53,24 @@ async def listar_contratos(
     contratos = query.offset(skip).limit(limit).all()
     return contratos
 
+@router.get("/exportar/dados")
+async def exportar_dados(
+    formato: str = Query("csv", alias="format", pattern=PADRAO_FORMATO),
+    status_pagamento: Optional[str] = None,
+    data_inicio: Optional[date] = None,
+    data_fim: Optional[date] = None,
+    current_user: Usuario = Depends(get_current_user)
+):
+    """Todos os contratos filtrados, em CSV ou Parquet, transmitidos em lotes"""
+    condicoes = []
+    if status_pagamento:
+        condicoes.append(Contrato.status_pagamento == status_pagamento)
+    if data_inicio:
+        condicoes.append(Contrato.data_vencimento >= data_inicio)
+    if data_fim:
+        condicoes.append(Contrato.data_vencimento <= data_fim)
+    return exportar_tabela(Contrato, condicoes, formato, "contratos")
+
 @router.get("/faturamento")
 async def obter_faturamento(
     ano: Optional[int] = None,
@@ -101,28 +121,24 @@ async def obter_faturamento(
 
 @router.get("/alertas", response_model=List[ContratoResponse])
 async def contratos_vencendo(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_leitura),
     current_user: Usuario = Depends(get_current_user)
 ):
+    # A troca de "Pendente" para "Vencido" é feita pela varredura diária (app/varredura.py)
     hoje = date.today()
-    sete_dias = hoje + timedelta(days=7)
+    limite = limite_alerta(hoje)
     
     contratos = db.query(Contrato).filter(
-        Contrato.data_vencimento <= sete_dias,
+        Contrato.data_vencimento <= limite,
         Contrato.data_vencimento >= hoje,
         Contrato.status_pagamento.in_(["Pendente", "Vencido"])
     ).all()
     
     vencidos = db.query(Contrato).filter(
         Contrato.data_vencimento < hoje,
-        Contrato.status_pagamento == "Pendente"
+        Contrato.status_pagamento.in_(["Pendente", "Vencido"])
     ).all()
     
-    for vencido in vencidos:
-        vencido.status_pagamento = "Vencido"
-    
-    db.commit()
-    
     return contratos + vencidos
 
 @router.get("/{contrato_id}", response_model=ContratoResponse)
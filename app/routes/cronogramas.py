@@ -1,21 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.responses import StreamingResponse, FileResponse
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Path, status
+from fastapi.responses import StreamingResponse, FileResponse, Response
+from sqlalchemy.orm import Session, contains_eager
 from typing import List, Optional
 from datetime import date, timedelta, datetime
 from pydantic import BaseModel
-import pandas as pd
 from io import BytesIO
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter, landscape
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
-from reportlab.lib.styles import getSampleStyleSheet
 import tempfile
 
-from app.database import get_db
+from app.database import get_db, get_db_leitura
 from app.models.models import Cronograma, Tarefa, Usuario, AlocacaoCronograma, Consultor
-from app.schemas import CronogramaCreate, CronogramaUpdate, CronogramaResponse, TarefaCreate, TarefaResponse
-from app.auth import get_current_user
+from app.schemas import (
+    CronogramaCreate, CronogramaUpdate, CronogramaResponse, TarefaCreate, TarefaUpdate, TarefaResponse
+)
+from app.auth import get_current_user, require_role
+from app.progresso import atualizar_status, recalcular_progresso
+from app.calendario import dias_uteis_no_periodo, limite_alerta, motivo_nao_util, obter_calendario
+from app.eventos import dados_alocacao
+from app.backends import obter_backend
+from app.cache import CacheVersionado
+from app.serializacao import dumps
+from app.versoes import versao
 from sqlalchemy import func
 
 class AlocacaoCreate(BaseModel):
@@ -31,6 +35,11 @@ class AlocacaoUpdate(BaseModel):
 
 router = APIRouter()
 
+# Grade mensal do calendário já codificada em JSON, por (ano, mês, consultor);
+# as versões sobem também com escritas de outros workers (app/eventos.py)
+TABELAS_GRADE = ("alocacoes_cronograma", "consultores", "feriados")
+cache_grade = CacheVersionado(max_itens=256)
+
 @router.post("/", response_model=CronogramaResponse, status_code=status.HTTP_201_CREATED)
 async def criar_cronograma(
     cronograma: CronogramaCreate, 
@@ -59,10 +68,10 @@ async def cronogramas_alertas(
     current_user: Usuario = Depends(get_current_user)
 ):
     hoje = date.today()
-    sete_dias = hoje + timedelta(days=7)
+    limite = limite_alerta(hoje)
     
     cronogramas = db.query(Cronograma).filter(
-        Cronograma.data_termino <= sete_dias,
+        Cronograma.data_termino <= limite,
         Cronograma.data_termino >= hoje,
         Cronograma.status != "Concluído"
     ).all()
@@ -74,6 +83,14 @@ async def cronogramas_alertas(
     
     return cronogramas + atrasados
 
+@router.post("/progresso/recalcular")
+async def recalcular_progresso_cronogramas(
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(require_role("Admin"))
+):
+    """Reconstrói contadores de tarefas, percentual e status de todos os cronogramas"""
+    return recalcular_progresso(db)
+
 @router.get("/{cronograma_id}", response_model=CronogramaResponse)
 async def obter_cronograma(
     cronograma_id: int,
@@ -99,7 +116,7 @@ async def atualizar_cronograma(
     for key, value in cronograma_data.model_dump(exclude_unset=True).items():
         setattr(cronograma, key, value)
     
-    _atualizar_status_cronograma(cronograma, db)
+    atualizar_status(cronograma)
     
     db.commit()
     db.refresh(cronograma)
@@ -111,43 +128,22 @@ async def calcular_progresso_cronograma(
     db: Session = Depends(get_db),
     current_user: Usuario = Depends(get_current_user)
 ):
+    """Os contadores já acompanham as tarefas; aqui o status é reavaliado pela data de hoje"""
     cronograma = db.query(Cronograma).filter(Cronograma.id == cronograma_id).first()
     if not cronograma:
         raise HTTPException(status_code=404, detail="Cronograma não encontrado")
     
-    tarefas = db.query(Tarefa).filter(Tarefa.cronograma_id == cronograma_id).all()
-    
-    if tarefas:
-        total_tarefas = len(tarefas)
-        tarefas_concluidas = sum(1 for t in tarefas if t.concluida)
-        percentual = (tarefas_concluidas / total_tarefas) * 100
-        cronograma.percentual_conclusao = round(percentual, 2)
-    
-    _atualizar_status_cronograma(cronograma, db)
-    
-    db.commit()
+    recalcular_progresso(db, [cronograma_id])
     db.refresh(cronograma)
     
     return {
         "cronograma_id": cronograma.id,
-        "percentual_conclusao": float(cronograma.percentual_conclusao),
+        "percentual_conclusao": float(cronograma.percentual_conclusao or 0),
         "status": cronograma.status,
-        "total_tarefas": len(tarefas) if tarefas else 0,
-        "tarefas_concluidas": sum(1 for t in tarefas if t.concluida) if tarefas else 0
+        "total_tarefas": cronograma.total_tarefas or 0,
+        "tarefas_concluidas": cronograma.tarefas_concluidas or 0
     }
 
-def _atualizar_status_cronograma(cronograma: Cronograma, db: Session):
-    hoje = date.today()
-    
-    if cronograma.percentual_conclusao >= 100:
-        cronograma.status = "Concluído"
-    elif cronograma.data_termino and cronograma.data_termino < hoje and cronograma.percentual_conclusao < 100:
-        cronograma.status = "Atrasado"
-    elif cronograma.data_inicio and cronograma.data_inicio <= hoje:
-        cronograma.status = "Em andamento"
-    else:
-        cronograma.status = "Não iniciado"
-
 @router.delete("/{cronograma_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def deletar_cronograma(
     cronograma_id: int,
@@ -173,7 +169,7 @@ async def adicionar_tarefa(
     if not cronograma:
         raise HTTPException(status_code=404, detail="Cronograma não encontrado")
     
-    new_tarefa = Tarefa(**tarefa.model_dump())
+    new_tarefa = Tarefa(**{**tarefa.model_dump(), "cronograma_id": cronograma_id})
     db.add(new_tarefa)
     db.commit()
     db.refresh(new_tarefa)
@@ -188,6 +184,42 @@ async def listar_tarefas(
     tarefas = db.query(Tarefa).filter(Tarefa.cronograma_id == cronograma_id).order_by(Tarefa.ordem).all()
     return tarefas
 
+def _obter_tarefa(db: Session, cronograma_id: int, tarefa_id: int) -> Tarefa:
+    tarefa = db.query(Tarefa).filter(Tarefa.id == tarefa_id, Tarefa.cronograma_id == cronograma_id).first()
+    if not tarefa:
+        raise HTTPException(status_code=404, detail="Tarefa não encontrada")
+    return tarefa
+
+@router.patch("/{cronograma_id}/tarefas/{tarefa_id}", response_model=TarefaResponse)
+async def atualizar_tarefa(
+    cronograma_id: int,
+    tarefa_id: int,
+    tarefa_data: TarefaUpdate,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_user)
+):
+    """Edita a tarefa; marcar ou desmarcar `concluida` atualiza o progresso do cronograma"""
+    tarefa = _obter_tarefa(db, cronograma_id, tarefa_id)
+    
+    for key, value in tarefa_data.model_dump(exclude_unset=True).items():
+        setattr(tarefa, key, value)
+    
+    db.commit()
+    db.refresh(tarefa)
+    return tarefa
+
+@router.delete("/{cronograma_id}/tarefas/{tarefa_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def deletar_tarefa(
+    cronograma_id: int,
+    tarefa_id: int,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_user)
+):
+    tarefa = _obter_tarefa(db, cronograma_id, tarefa_id)
+    db.delete(tarefa)
+    db.commit()
+    return None
+
 @router.get("/alocacoes/listar")
 async def listar_alocacoes(
     data_inicio: str = None,
@@ -196,7 +228,7 @@ async def listar_alocacoes(
     db: Session = Depends(get_db),
     current_user: Usuario = Depends(get_current_user)
 ):
-    query = db.query(AlocacaoCronograma).join(Consultor)
+    query = db.query(AlocacaoCronograma).join(Consultor).options(contains_eager(AlocacaoCronograma.consultor))
     
     if data_inicio:
         data_inicio_obj = datetime.strptime(data_inicio, '%Y-%m-%d').date()
@@ -209,20 +241,74 @@ async def listar_alocacoes(
     
     alocacoes = query.order_by(AlocacaoCronograma.data, AlocacaoCronograma.periodo).all()
     
-    resultado = []
-    for alocacao in alocacoes:
-        resultado.append({
-            "id": alocacao.id,
-            "consultor_id": alocacao.consultor_id,
-            "consultor_nome": alocacao.consultor.nome,
-            "nif": alocacao.nif,
-            "data": str(alocacao.data),
-            "periodo": alocacao.periodo,
-            "codigo_projeto": alocacao.codigo_projeto,
-            "observacao": alocacao.observacao
-        })
+    return [dados_alocacao(alocacao, alocacao.consultor.nome) for alocacao in alocacoes]
+
+def _montar_grade_mes(db: Session, ano: int, mes: int, consultor_id: Optional[int]) -> bytes:
+    primeiro = date(ano, mes, 1)
+    ultimo = (primeiro.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+    # 6 semanas começando no domingo, como o calendário da tela
+    inicio_grade = primeiro - timedelta(days=(primeiro.weekday() + 1) % 7)
+    calendario = obter_calendario(inicio_grade, inicio_grade + timedelta(days=41))
+    
+    query = db.query(AlocacaoCronograma, Consultor.nome).join(Consultor).filter(
+        AlocacaoCronograma.data >= primeiro,
+        AlocacaoCronograma.data <= ultimo
+    )
+    if consultor_id:
+        query = query.filter(AlocacaoCronograma.consultor_id == consultor_id)
     
-    return resultado
+    por_dia = {}
+    consultores = set()
+    for alocacao, consultor_nome in query.order_by(AlocacaoCronograma.data, AlocacaoCronograma.periodo, Consultor.nome):
+        periodos = por_dia.setdefault(alocacao.data, {"M": [], "T": []})
+        periodos.setdefault(alocacao.periodo, []).append(dados_alocacao(alocacao, consultor_nome))
+        consultores.add(alocacao.consultor_id)
+    
+    semanas = []
+    for semana in range(6):
+        dias = []
+        for dia_semana in range(7):
+            dia = inicio_grade + timedelta(days=semana * 7 + dia_semana)
+            outro_mes = dia.month != mes
+            dias.append({
+                "data": str(dia),
+                "dia": dia.day,
+                "outro_mes": outro_mes,
+                "dia_util": calendario.eh_dia_util(dia),
+                "periodos": {"M": [], "T": []} if outro_mes else por_dia.get(dia, {"M": [], "T": []})
+            })
+        semanas.append(dias)
+    
+    return dumps({
+        "ano": ano,
+        "mes": mes,
+        "consultor_id": consultor_id,
+        "total_alocacoes": sum(len(lista) for periodos in por_dia.values() for lista in periodos.values()),
+        "total_consultores": len(consultores),
+        "dias_alocados": len(por_dia),
+        "semanas": semanas
+    })
+
+@router.get("/alocacoes/mes/{ano}/{mes}")
+async def obter_grade_mes(
+    ano: int = Path(..., ge=1900, le=2200),
+    mes: int = Path(..., ge=1, le=12),
+    consultor_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_user)
+):
+    """Grade do mês (6 semanas × 7 dias) com as alocações agrupadas por dia e período"""
+    chave = (ano, mes, consultor_id)
+    # Versão lida antes da consulta: uma escrita concorrente invalida o que for gerado agora
+    versao_dados = versao(*TABELAS_GRADE)
+    corpo = cache_grade.obter(chave, versao_dados)
+    if corpo is None:
+        try:
+            corpo = _montar_grade_mes(db, ano, mes, consultor_id)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        cache_grade.guardar(chave, versao_dados, corpo)
+    return Response(content=corpo, media_type="application/json")
 
 @router.get("/alocacoes/gantt")
 async def obter_dados_gantt(
@@ -231,7 +317,7 @@ async def obter_dados_gantt(
     db: Session = Depends(get_db),
     current_user: Usuario = Depends(get_current_user)
 ):
-    query = db.query(AlocacaoCronograma).join(Consultor)
+    query = db.query(AlocacaoCronograma).join(Consultor).options(contains_eager(AlocacaoCronograma.consultor))
     
     if data_inicio:
         data_inicio_obj = datetime.strptime(data_inicio, '%Y-%m-%d').date()
@@ -259,7 +345,7 @@ async def obter_dados_gantt(
 async def obter_estatisticas(
     data_inicio: str = None,
     data_fim: str = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_leitura),
     current_user: Usuario = Depends(get_current_user)
 ):
     query = db.query(AlocacaoCronograma)
@@ -308,6 +394,72 @@ async def obter_estatisticas(
         "top_projetos": [{"projeto": p[0], "total": p[1]} for p in alocacoes_por_projeto]
     }
 
+@router.get("/alocacoes/capacidade")
+async def obter_capacidade(
+    data_inicio: Optional[str] = None,
+    data_fim: Optional[str] = None,
+    consultor_id: Optional[int] = None,
+    db: Session = Depends(get_db_leitura),
+    current_user: Usuario = Depends(get_current_user)
+):
+    """Capacidade (2 períodos por dia útil) e ocupação de cada consultor ativo; padrão: mês atual"""
+    hoje = date.today()
+    inicio = datetime.strptime(data_inicio, '%Y-%m-%d').date() if data_inicio else hoje.replace(day=1)
+    if data_fim:
+        fim = datetime.strptime(data_fim, '%Y-%m-%d').date()
+    else:
+        fim = (inicio.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+    if fim < inicio:
+        raise HTTPException(status_code=400, detail="data_fim deve ser igual ou posterior a data_inicio")
+    
+    try:
+        dias_uteis = dias_uteis_no_periodo(inicio, fim)
+        calendario = obter_calendario(inicio, fim)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    consultores = db.query(Consultor.id, Consultor.nome).filter(Consultor.ativo == True)
+    if consultor_id:
+        consultores = consultores.filter(Consultor.id == consultor_id)
+    
+    contagens = db.query(
+        AlocacaoCronograma.consultor_id,
+        AlocacaoCronograma.data,
+        func.count(AlocacaoCronograma.id)
+    ).filter(
+        AlocacaoCronograma.data >= inicio,
+        AlocacaoCronograma.data <= fim
+    )
+    if consultor_id:
+        contagens = contagens.filter(AlocacaoCronograma.consultor_id == consultor_id)
+    
+    alocados = {}
+    fora_dias_uteis = {}
+    for cid, data, total in contagens.group_by(AlocacaoCronograma.consultor_id, AlocacaoCronograma.data):
+        destino = alocados if calendario.eh_dia_util(data) else fora_dias_uteis
+        destino[cid] = destino.get(cid, 0) + total
+    
+    capacidade = dias_uteis * 2
+    resultado = []
+    for cid, nome in consultores.order_by(Consultor.nome):
+        periodos = alocados.get(cid, 0)
+        resultado.append({
+            "consultor_id": cid,
+            "consultor_nome": nome,
+            "periodos_disponiveis": capacidade,
+            "periodos_alocados": periodos,
+            "periodos_livres": max(capacidade - periodos, 0),
+            "ocupacao_percentual": round(periodos / capacidade * 100, 2) if capacidade else 0,
+            "alocacoes_fora_dias_uteis": fora_dias_uteis.get(cid, 0)
+        })
+    
+    return {
+        "data_inicio": str(inicio),
+        "data_fim": str(fim),
+        "dias_uteis": dias_uteis,
+        "consultores": resultado
+    }
+
 @router.post("/alocacoes/criar")
 async def criar_alocacao(
     alocacao_data: AlocacaoCreate,
@@ -319,6 +471,15 @@ async def criar_alocacao(
         raise HTTPException(status_code=404, detail="Consultor não encontrado")
     
     data_obj = datetime.strptime(alocacao_data.data, '%Y-%m-%d').date()
+    try:
+        motivo = motivo_nao_util(data_obj)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if motivo:
+        raise HTTPException(
+            status_code=400,
+            detail=f"{data_obj.strftime('%d/%m/%Y')} não é dia útil: {motivo}"
+        )
     
     nova_alocacao = AlocacaoCronograma(
         consultor_id=alocacao_data.consultor_id,
@@ -382,9 +543,10 @@ async def exportar_alocacoes_excel(
     data_inicio: str = None,
     data_fim: str = None,
     consultor_id: int = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_leitura),
     current_user: Usuario = Depends(get_current_user)
 ):
+    pd = obter_backend("pandas")
     query = db.query(AlocacaoCronograma).join(Consultor)
     
     if data_inicio:
@@ -426,9 +588,10 @@ async def exportar_alocacoes_pdf(
     data_inicio: str = None,
     data_fim: str = None,
     consultor_id: int = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_leitura),
     current_user: Usuario = Depends(get_current_user)
 ):
+    pdf = obter_backend("pdf")
     query = db.query(AlocacaoCronograma).join(Consultor)
     
     if data_inicio:
@@ -443,11 +606,11 @@ async def exportar_alocacoes_pdf(
     alocacoes = query.order_by(AlocacaoCronograma.data, AlocacaoCronograma.periodo).all()
     
     with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-        doc = SimpleDocTemplate(tmp.name, pagesize=landscape(letter))
+        doc = pdf.SimpleDocTemplate(tmp.name, pagesize=pdf.landscape(pdf.letter))
         elements = []
         
-        styles = getSampleStyleSheet()
-        title = Paragraph("<b>Relatório de Cronograma de Alocações</b>", styles['Title'])
+        styles = pdf.getSampleStyleSheet()
+        title = pdf.Paragraph("<b>Relatório de Cronograma de Alocações</b>", styles['Title'])
         elements.append(title)
         
         data = [['Data', 'Consultor', 'NIF', 'Período', 'Código Projeto']]
@@ -461,16 +624,16 @@ async def exportar_alocacoes_pdf(
                 alocacao.codigo_projeto[:20] if alocacao.codigo_projeto else ''
             ])
         
-        table = Table(data)
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        table = pdf.Table(data)
+        table.setStyle(pdf.TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), pdf.colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), pdf.colors.whitesmoke),
             ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
             ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
             ('FONTSIZE', (0, 0), (-1, 0), 10),
             ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
+            ('BACKGROUND', (0, 1), (-1, -1), pdf.colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, pdf.colors.black)
         ]))
         
         elements.append(table)
@@ -1,29 +1,44 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from fastapi.responses import StreamingResponse, FileResponse
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 from typing import List, Optional
-import pandas as pd
 from io import BytesIO
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter, landscape
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
-from reportlab.lib.styles import getSampleStyleSheet
 import tempfile
 
-from app.database import get_db
-from app.models.models import Empresa, Usuario
-from app.schemas import EmpresaCreate, EmpresaResponse
+from app.database import get_db, get_db_leitura
+from app.models.models import Empresa, Usuario, Proposta, Contato, LinhaTecnologia, LinhaEducacional
+from app.schemas import (
+    EmpresaCreate, EmpresaResponse, EmpresaLoteItem, EmpresaLoteAtualizacao, LoteExclusao,
+    PropostaResponse, CronogramaResponse, ContratoResponse
+)
 from app.auth import get_current_user
+from app.backends import obter_backend
+from app.exportacao import PADRAO_FORMATO, exportar_tabela
+from app.cnpj import normalizar_cnpj
+from app.cache import CacheVersionado
+from app.serializacao import RespostaJSON, listar_colunas, obter_colunas
+from app.lote import atualizar_lote, excluir_lote, alteracoes_por_id, conflitos_unicos
+from app.versoes import versao
 
 router = APIRouter()
 
+TABELAS_360 = (
+    "empresas", "propostas", "cronogramas", "contratos",
+    "contatos", "linha_tecnologia", "linha_educacional",
+)
+cache_360 = CacheVersionado(max_itens=512)
+
 @router.post("/", response_model=EmpresaResponse, status_code=status.HTTP_201_CREATED)
 async def criar_empresa(
     empresa: EmpresaCreate, 
     db: Session = Depends(get_db),
     current_user: Usuario = Depends(get_current_user)
 ):
-    db_empresa = db.query(Empresa).filter(Empresa.cnpj == empresa.cnpj).first()
+    filtro = Empresa.cnpj == empresa.cnpj
+    chave = normalizar_cnpj(empresa.cnpj)
+    if chave:
+        filtro = filtro | (Empresa.cnpj_normalizado == chave)
+    db_empresa = db.query(Empresa).filter(filtro).first()
     if db_empresa:
         raise HTTPException(status_code=400, detail="CNPJ já cadastrado")
     
@@ -44,6 +59,7 @@ async def listar_empresas(
     municipio: Optional[str] = None,
     estado: Optional[str] = None,
     area: Optional[str] = None,
+    fields: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: Usuario = Depends(get_current_user)
 ):
@@ -69,19 +85,120 @@ async def listar_empresas(
     if area:
         query = query.filter(Empresa.area.ilike(f"%{area}%"))
     
-    empresas = query.offset(skip).limit(limit).all()
-    return empresas
+    return listar_colunas(query.offset(skip).limit(limit), Empresa, EmpresaResponse, fields)
+
+def _validar_alteracao_lote(db: Session, registros, alteracoes):
+    erros = conflitos_unicos(db, Empresa, Empresa.cnpj, "cnpj", alteracoes, "CNPJ já cadastrado")
+    erros.update(conflitos_unicos(db, Empresa, Empresa.cnpj_normalizado, "cnpj", alteracoes,
+                                  "CNPJ já cadastrado", normalizar=normalizar_cnpj))
+    return erros
+
+def _validar_exclusao_lote(db: Session, registros):
+    com_propostas = db.query(Proposta.empresa_id).filter(Proposta.empresa_id.in_(list(registros))).distinct().all()
+    return {empresa_id: (400, "Empresa possui propostas vinculadas") for (empresa_id,) in com_propostas}
+
+@router.patch("/lote")
+async def atualizar_empresas_lote(
+    lote: EmpresaLoteAtualizacao,
+    tudo_ou_nada: bool = False,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_user)
+):
+    """Aplica as mesmas alterações a várias empresas (ex.: trocar carteira ou ER)"""
+    dados = lote.dados.model_dump(exclude_unset=True)
+    if not dados:
+        raise HTTPException(status_code=400, detail="Nenhum campo para atualizar")
+    alteracoes = {empresa_id: dados for empresa_id in dict.fromkeys(lote.ids)}
+    return atualizar_lote(db, Empresa, alteracoes, EmpresaResponse, "Empresa não encontrada",
+                          validar=_validar_alteracao_lote, tudo_ou_nada=tudo_ou_nada)
+
+@router.put("/lote")
+async def substituir_empresas_lote(
+    itens: List[EmpresaLoteItem],
+    tudo_ou_nada: bool = False,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_user)
+):
+    """Atualiza várias empresas com registros completos, como o PUT individual"""
+    alteracoes, repetidos = alteracoes_por_id(item.model_dump() for item in itens)
+    return atualizar_lote(db, Empresa, alteracoes, EmpresaResponse, "Empresa não encontrada",
+                          validar=_validar_alteracao_lote, erros_previos=repetidos, tudo_ou_nada=tudo_ou_nada)
+
+@router.post("/lote/excluir")
+async def deletar_empresas_lote(
+    lote: LoteExclusao,
+    tudo_ou_nada: bool = False,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_user)
+):
+    return excluir_lote(db, Empresa, lote.ids, "Empresa não encontrada",
+                        validar=_validar_exclusao_lote, tudo_ou_nada=tudo_ou_nada)
 
 @router.get("/{empresa_id}", response_model=EmpresaResponse)
 async def obter_empresa(
     empresa_id: int,
+    fields: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: Usuario = Depends(get_current_user)
 ):
-    empresa = db.query(Empresa).filter(Empresa.id == empresa_id).first()
+    query = db.query(Empresa).filter(Empresa.id == empresa_id)
+    empresa = obter_colunas(query, Empresa, EmpresaResponse, fields)
     if not empresa:
         raise HTTPException(status_code=404, detail="Empresa não encontrada")
-    return empresa
+    return RespostaJSON(empresa)
+
+@router.get("/{empresa_id}/360")
+async def obter_empresa_360(
+    empresa_id: int,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_user)
+):
+    """Empresa com propostas, cronogramas, contratos, contatos e linhas em um número fixo de consultas"""
+    versao_dados = versao(*TABELAS_360)
+    resultado = cache_360.obter(empresa_id, versao_dados)
+    if resultado is None:
+        resultado = _montar_empresa_360(db, empresa_id)
+        cache_360.guardar(empresa_id, versao_dados, resultado)
+    return resultado
+
+def _montar_empresa_360(db: Session, empresa_id: int) -> dict:
+    from app.routes.contatos import ContatoResponse
+    from app.routes.linha_tecnologia import LinhaTecnologiaResponse
+    from app.routes.linha_educacional import LinhaEducacionalResponse
+    
+    empresa = db.query(Empresa).options(
+        selectinload(Empresa.propostas).selectinload(Proposta.cronogramas),
+        selectinload(Empresa.propostas).selectinload(Proposta.contratos)
+    ).filter(Empresa.id == empresa_id).first()
+    if not empresa:
+        raise HTTPException(status_code=404, detail="Empresa não encontrada")
+    
+    contatos, linha_tecnologia, linha_educacional = [], [], []
+    if empresa.cnpj_normalizado:
+        contatos = db.query(Contato).filter(
+            Contato.cnpj_normalizado == empresa.cnpj_normalizado
+        ).order_by(Contato.contato).all()
+        linha_tecnologia = db.query(LinhaTecnologia).filter(
+            LinhaTecnologia.cnpj_normalizado == empresa.cnpj_normalizado
+        ).order_by(LinhaTecnologia.ano, LinhaTecnologia.id).all()
+        linha_educacional = db.query(LinhaEducacional).filter(
+            LinhaEducacional.cnpj_normalizado == empresa.cnpj_normalizado
+        ).order_by(LinhaEducacional.ano, LinhaEducacional.id).all()
+    
+    propostas = sorted(empresa.propostas, key=lambda p: p.id)
+    
+    def serializar(schema, objetos):
+        return [schema.model_validate(o).model_dump(mode="json") for o in objetos]
+    
+    return {
+        "empresa": EmpresaResponse.model_validate(empresa).model_dump(mode="json"),
+        "propostas": serializar(PropostaResponse, propostas),
+        "cronogramas": serializar(CronogramaResponse, [c for p in propostas for c in p.cronogramas]),
+        "contratos": serializar(ContratoResponse, [c for p in propostas for c in p.contratos]),
+        "contatos": serializar(ContatoResponse, contatos),
+        "linha_tecnologia": serializar(LinhaTecnologiaResponse, linha_tecnologia),
+        "linha_educacional": serializar(LinhaEducacionalResponse, linha_educacional)
+    }
 
 @router.put("/{empresa_id}", response_model=EmpresaResponse)
 async def atualizar_empresa(
@@ -117,7 +234,7 @@ async def deletar_empresa(
 
 @router.get("/filtros/valores")
 async def obter_valores_filtros(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_leitura),
     current_user: Usuario = Depends(get_current_user)
 ):
     portes = db.query(Empresa.porte).distinct().filter(Empresa.porte.isnot(None)).all()
@@ -136,38 +253,59 @@ async def obter_valores_filtros(
         "areas": sorted([a[0] for a in areas if a[0]])
     }
 
-@router.get("/exportar/excel")
-async def exportar_excel(
-    busca: Optional[str] = None,
-    porte: Optional[str] = None,
-    er: Optional[str] = None,
-    zona: Optional[str] = None,
-    municipio: Optional[str] = None,
-    estado: Optional[str] = None,
-    area: Optional[str] = None,
-    db: Session = Depends(get_db),
-    current_user: Usuario = Depends(get_current_user)
-):
-    query = db.query(Empresa)
-    
+def _condicoes_exportacao(busca, porte, er, zona, municipio, estado, area) -> list:
+    """Filtros comuns às exportações"""
+    condicoes = []
     if busca:
-        query = query.filter(
+        condicoes.append(
             (Empresa.nome.ilike(f"%{busca}%")) |
             (Empresa.cnpj.ilike(f"%{busca}%")) |
             (Empresa.sigla.ilike(f"%{busca}%"))
         )
     if porte:
-        query = query.filter(Empresa.porte == porte)
+        condicoes.append(Empresa.porte == porte)
     if er:
-        query = query.filter(Empresa.er == er)
+        condicoes.append(Empresa.er == er)
     if zona:
-        query = query.filter(Empresa.zona == zona)
+        condicoes.append(Empresa.zona == zona)
     if municipio:
-        query = query.filter(Empresa.municipio == municipio)
+        condicoes.append(Empresa.municipio == municipio)
     if estado:
-        query = query.filter(Empresa.estado == estado)
+        condicoes.append(Empresa.estado == estado)
     if area:
-        query = query.filter(Empresa.area.ilike(f"%{area}%"))
+        condicoes.append(Empresa.area.ilike(f"%{area}%"))
+    return condicoes
+
+@router.get("/exportar/dados")
+async def exportar_dados(
+    formato: str = Query("csv", alias="format", pattern=PADRAO_FORMATO),
+    busca: Optional[str] = None,
+    porte: Optional[str] = None,
+    er: Optional[str] = None,
+    zona: Optional[str] = None,
+    municipio: Optional[str] = None,
+    estado: Optional[str] = None,
+    area: Optional[str] = None,
+    current_user: Usuario = Depends(get_current_user)
+):
+    """Todas as empresas filtradas, em CSV ou Parquet, transmitidas em lotes"""
+    condicoes = _condicoes_exportacao(busca, porte, er, zona, municipio, estado, area)
+    return exportar_tabela(Empresa, condicoes, formato, "empresas")
+
+@router.get("/exportar/excel")
+async def exportar_excel(
+    busca: Optional[str] = None,
+    porte: Optional[str] = None,
+    er: Optional[str] = None,
+    zona: Optional[str] = None,
+    municipio: Optional[str] = None,
+    estado: Optional[str] = None,
+    area: Optional[str] = None,
+    db: Session = Depends(get_db_leitura),
+    current_user: Usuario = Depends(get_current_user)
+):
+    pd = obter_backend("pandas")
+    query = db.query(Empresa).filter(*_condicoes_exportacao(busca, porte, er, zona, municipio, estado, area))
     
     empresas = query.all()
     
@@ -215,9 +353,10 @@ async def exportar_pdf(
     municipio: Optional[str] = None,
     estado: Optional[str] = None,
     area: Optional[str] = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_leitura),
     current_user: Usuario = Depends(get_current_user)
 ):
+    pdf = obter_backend("pdf")
     query = db.query(Empresa)
     
     if busca:
@@ -242,11 +381,11 @@ async def exportar_pdf(
     empresas = query.all()
     
     with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-        doc = SimpleDocTemplate(tmp.name, pagesize=landscape(letter))
+        doc = pdf.SimpleDocTemplate(tmp.name, pagesize=pdf.landscape(pdf.letter))
         elements = []
         
-        styles = getSampleStyleSheet()
-        title = Paragraph("<b>Relatório de Empresas</b>", styles['Title'])
+        styles = pdf.getSampleStyleSheet()
+        title = pdf.Paragraph("<b>Relatório de Empresas</b>", styles['Title'])
         elements.append(title)
         
         data = [['CNPJ', 'Empresa', 'Município', 'Estado', 'Zona', 'Área']]
@@ -261,16 +400,16 @@ async def exportar_pdf(
                 emp.area[:20] if emp.area else ''
             ])
         
-        table = Table(data)
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        table = pdf.Table(data)
+        table.setStyle(pdf.TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), pdf.colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), pdf.colors.whitesmoke),
             ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
             ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
             ('FONTSIZE', (0, 0), (-1, 0), 10),
             ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
+            ('BACKGROUND', (0, 1), (-1, -1), pdf.colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, pdf.colors.black)
         ]))
         
         elements.append(table)
@@ -0,0 +1,65 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+import asyncio
+import json
+
+from app.database import get_db
+from app.models.models import Usuario
+from app.auth import get_current_user
+from app.eventos import broker, monitor_alertas
+
+router = APIRouter()
+
+INTERVALO_PING = 15
+
+
+def _evento(tipo: str, dados: dict) -> str:
+    return f"event: {tipo}\ndata: {json.dumps(dados, ensure_ascii=False)}\n\n"
+
+
+@router.get("/stream")
+async def stream_eventos(
+    request: Request,
+    ano: int = None,
+    mes: int = None,
+    consultor_id: int = None,
+    alertas: bool = True,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_user)
+):
+    """Envia por SSE os contadores de alertas e as alterações de alocações do mês/consultor assinado"""
+    # A sessão da autenticação só fecharia quando o stream terminasse, prendendo
+    # uma conexão do pool enquanto a página estiver aberta
+    db.close()
+    if (ano is None) != (mes is None):
+        raise HTTPException(status_code=400, detail="Informe ano e mês juntos")
+    if mes is not None and not 1 <= mes <= 12:
+        raise HTTPException(status_code=400, detail="Mês inválido")
+
+    assinatura = broker.assinar(ano=ano, mes=mes, consultor_id=consultor_id, alertas=alertas)
+
+    async def eventos():
+        try:
+            if alertas:
+                yield _evento("alertas", await monitor_alertas.atual())
+            while True:
+                try:
+                    evento = await asyncio.wait_for(assinatura.fila.get(), timeout=INTERVALO_PING)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": ping\n\n"
+                    continue
+                if evento["tipo"] == "alertas":
+                    yield _evento("alertas", evento["resumo"])
+                else:
+                    yield _evento(evento["tipo"], {k: v for k, v in evento.items() if k != "tipo"})
+        finally:
+            broker.cancelar(assinatura)
+
+    return StreamingResponse(
+        eventos(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
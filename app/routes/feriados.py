@@ -0,0 +1,76 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import extract
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from datetime import date
+
+from app.database import get_db
+from app.models.models import Feriado, Usuario
+from app.schemas import FeriadoCreate, FeriadoResponse
+from app.auth import get_current_user, require_role
+from app.calendario import dias_uteis_no_periodo, eh_dia_util, motivo_nao_util, somar_dias_uteis
+
+router = APIRouter()
+
+@router.get("/", response_model=List[FeriadoResponse])
+async def listar_feriados(
+    ano: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_user)
+):
+    query = db.query(Feriado)
+    if ano:
+        query = query.filter(extract("year", Feriado.data) == ano)
+    return query.order_by(Feriado.data).all()
+
+@router.post("/", response_model=FeriadoResponse, status_code=status.HTTP_201_CREATED)
+async def criar_feriado(
+    feriado: FeriadoCreate,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(require_role("Admin"))
+):
+    if db.query(Feriado.id).filter(Feriado.data == feriado.data).first():
+        raise HTTPException(status_code=400, detail="Já existe um feriado cadastrado nesta data")
+
+    new_feriado = Feriado(**feriado.model_dump())
+    db.add(new_feriado)
+    db.commit()
+    db.refresh(new_feriado)
+    return new_feriado
+
+@router.delete("/{feriado_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def deletar_feriado(
+    feriado_id: int,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(require_role("Admin"))
+):
+    feriado = db.query(Feriado).filter(Feriado.id == feriado_id).first()
+    if not feriado:
+        raise HTTPException(status_code=404, detail="Feriado não encontrado")
+
+    db.delete(feriado)
+    db.commit()
+    return None
+
+@router.get("/dias-uteis")
+async def consultar_dias_uteis(
+    inicio: date,
+    fim: Optional[date] = None,
+    somar: Optional[int] = Query(None, ge=-1000, le=1000),
+    current_user: Usuario = Depends(get_current_user)
+):
+    """Dias úteis de `inicio` a `fim` (inclusive) e/ou a data `somar` dias úteis depois de `inicio`"""
+    try:
+        return _consultar_dias_uteis(inicio, fim, somar)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _consultar_dias_uteis(inicio: date, fim: Optional[date], somar: Optional[int]) -> dict:
+    resultado = {"inicio": inicio, "eh_dia_util": eh_dia_util(inicio), "motivo": motivo_nao_util(inicio)}
+    if fim is not None:
+        resultado["fim"] = fim
+        resultado["dias_uteis"] = dias_uteis_no_periodo(inicio, fim)
+    if somar is not None:
+        resultado["somar"] = somar
+        resultado["data_resultante"] = somar_dias_uteis(inicio, somar)
+    return resultado
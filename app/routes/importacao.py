@@ -1,6 +1,5 @@
 from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
 from sqlalchemy.orm import Session
-import pandas as pd
 import io
 from datetime import datetime
 
@@ -8,15 +7,31 @@ from app.database import get_db
 from app.models.models import Empresa, Consultor, Proposta, Cronograma, Contrato, Usuario
 from app.schemas import ImportacaoResponse
 from app.auth import get_current_user, require_role
+from app.backends import obter_backend
+from app.cnpj import normalizar_cnpj
 
 router = APIRouter()
 
+def _empresas_por_cnpj(db: Session, df) -> dict:
+    """Carrega em uma consulta as empresas já cadastradas com os CNPJs do arquivo"""
+    if 'CNPJ' not in df.columns:
+        return {}
+    chaves = {normalizar_cnpj(str(valor).strip()) for valor in df['CNPJ'].dropna()}
+    chaves.discard(None)
+    if not chaves:
+        return {}
+    linhas = db.query(Empresa.cnpj_normalizado, Empresa.id).filter(
+        Empresa.cnpj_normalizado.in_(chaves)
+    ).all()
+    return {chave: empresa_id for chave, empresa_id in linhas}
+
 @router.post("/empresas", response_model=ImportacaoResponse)
 async def importar_empresas(
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
     current_user: Usuario = Depends(require_role("Admin"))
 ):
+    pd = obter_backend("pandas")
     if not file.filename.endswith(('.xlsx', '.xls', '.csv')):
         raise HTTPException(status_code=400, detail="Formato de arquivo inválido. Use .xlsx, .xls ou .csv")
     
@@ -30,6 +45,7 @@ async def importar_empresas(
         
         registros_importados = 0
         erros = []
+        existentes = _empresas_por_cnpj(db, df)
         
         for index, row in df.iterrows():
             try:
@@ -37,9 +53,13 @@ async def importar_empresas(
                 if not cnpj or cnpj == 'nan':
                     continue
                 
-                empresa_existente = db.query(Empresa).filter(Empresa.cnpj == cnpj).first()
-                if empresa_existente:
+                chave = normalizar_cnpj(cnpj)
+                if not chave:
+                    erros.append(f"Linha {index + 2}: CNPJ inválido ({cnpj})")
+                    continue
+                if chave in existentes:
                     continue
+                existentes[chave] = None
                 
                 empresa = Empresa(
                     cnpj=cnpj,
@@ -69,6 +89,7 @@ async def importar_propostas(
     db: Session = Depends(get_db),
     current_user: Usuario = Depends(require_role("Admin"))
 ):
+    pd = obter_backend("pandas")
     if not file.filename.endswith(('.xlsx', '.xls', '.csv')):
         raise HTTPException(status_code=400, detail="Formato de arquivo inválido")
     
@@ -82,6 +103,7 @@ async def importar_propostas(
         
         registros_importados = 0
         erros = []
+        empresas = _empresas_por_cnpj(db, df)
         
         for index, row in df.iterrows():
             try:
@@ -96,14 +118,20 @@ async def importar_propostas(
                     continue
                 
                 cnpj = str(row.get('CNPJ', '')).strip()
-                empresa = db.query(Empresa).filter(Empresa.cnpj == cnpj).first()
-                if not empresa:
+                chave = normalizar_cnpj(cnpj)
+                if not chave:
+                    erros.append(f"Linha {index + 2}: CNPJ inválido ({cnpj})")
+                    continue
+                
+                empresa_id = empresas.get(chave)
+                if empresa_id is None:
                     empresa = Empresa(
                         cnpj=cnpj,
                         nome=str(row.get('EMPRESA', ''))
                     )
                     db.add(empresa)
                     db.flush()
+                    empresa_id = empresas[chave] = empresa.id
                 
                 consultor_nome = str(row.get('CONSULTOR', ''))
                 consultor = None
@@ -112,7 +140,7 @@ async def importar_propostas(
                 
                 proposta = Proposta(
                     numero_proposta=numero_proposta,
-                    empresa_id=empresa.id,
+                    empresa_id=empresa_id,
                     consultor_id=consultor.id if consultor else None,
                     solucao=str(row.get('SOLUÇÃO', row.get('SOLUCAO', ''))) if pd.notna(row.get('SOLUÇÃO', row.get('SOLUCAO'))) else None,
                     status=str(row.get('STATUS', 'Em andamento'))
@@ -144,6 +172,7 @@ async def importar_cronogramas(
     db: Session = Depends(get_db),
     current_user: Usuario = Depends(require_role("Admin"))
 ):
+    pd = obter_backend("pandas")
     if not file.filename.endswith(('.xlsx', '.xls', '.csv')):
         raise HTTPException(status_code=400, detail="Formato de arquivo inválido")
     
@@ -1,15 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from sqlalchemy import or_
 from typing import List, Optional
 from datetime import datetime, date
 from pydantic import BaseModel
-from app.database import get_db
+from app.database import get_db, get_db_leitura
 from app.models.models import LinhaTecnologia
 from app.auth import get_current_user
+from app.backends import obter_backend
+from app.exportacao import PADRAO_FORMATO, exportar_tabela
+from app.cnpj import normalizar_cnpj
+from app.analytics_linha import snapshot_tecnologia
+from app.serializacao import RespostaJSON, listar_colunas, obter_colunas
 from fastapi.responses import StreamingResponse
 import io
-import pandas as pd
 from decimal import Decimal
 
 router = APIRouter()
@@ -68,11 +72,19 @@ async def listar(
     search: Optional[str] = None,
     situacao: Optional[str] = None,
     ano: Optional[int] = None,
+    cnpj: Optional[str] = None,
+    fields: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
     query = db.query(LinhaTecnologia)
     
+    if cnpj:
+        chave = normalizar_cnpj(cnpj)
+        if chave is None:
+            raise HTTPException(status_code=400, detail="CNPJ inválido")
+        query = query.filter(LinhaTecnologia.cnpj_normalizado == chave)
+    
     if search:
         query = query.filter(
             or_(
@@ -88,12 +100,13 @@ async def listar(
     if ano:
         query = query.filter(LinhaTecnologia.ano == ano)
     
-    registros = query.order_by(LinhaTecnologia.empresa).offset(skip).limit(limit).all()
-    return registros
+    return listar_colunas(
+        query.order_by(LinhaTecnologia.empresa).offset(skip).limit(limit), LinhaTecnologia, LinhaTecnologiaResponse, fields
+    )
 
 @router.get("/filtros")
 async def obter_filtros(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_leitura),
     current_user = Depends(get_current_user)
 ):
     situacoes = db.query(LinhaTecnologia.situacao).distinct().filter(LinhaTecnologia.situacao.isnot(None)).all()
@@ -104,16 +117,27 @@ async def obter_filtros(
         "anos": sorted([a[0] for a in anos if a[0]], reverse=True)
     }
 
+@router.get("/analytics")
+async def analytics(
+    linhas: str = "situacao",
+    colunas: Optional[str] = None,
+    ano: Optional[int] = None,
+    current_user = Depends(get_current_user)
+):
+    """Tabela dinâmica (quantidade, total e conversão) a partir do snapshot em memória"""
+    return snapshot_tecnologia.pivot(linhas, colunas, ano)
+
 @router.get("/{id}", response_model=LinhaTecnologiaResponse)
 async def obter(
     id: int,
+    fields: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
-    registro = db.query(LinhaTecnologia).filter(LinhaTecnologia.id == id).first()
+    registro = obter_colunas(db.query(LinhaTecnologia).filter(LinhaTecnologia.id == id), LinhaTecnologia, LinhaTecnologiaResponse, fields)
     if not registro:
         raise HTTPException(status_code=404, detail="Registro não encontrado")
-    return registro
+    return RespostaJSON(registro)
 
 @router.post("/", response_model=LinhaTecnologiaResponse)
 async def criar(
@@ -165,18 +189,11 @@ async def deletar(
     db.commit()
     return {"message": "Registro deletado com sucesso"}
 
-@router.get("/exportar/excel")
-async def exportar_excel(
-    search: Optional[str] = None,
-    situacao: Optional[str] = None,
-    ano: Optional[int] = None,
-    db: Session = Depends(get_db),
-    current_user = Depends(get_current_user)
-):
-    query = db.query(LinhaTecnologia)
-    
+def _condicoes_exportacao(search, situacao, ano) -> list:
+    """Filtros comuns às exportações"""
+    condicoes = []
     if search:
-        query = query.filter(
+        condicoes.append(
             or_(
                 LinhaTecnologia.empresa.ilike(f"%{search}%"),
                 LinhaTecnologia.numero_proposta.ilike(f"%{search}%")
@@ -184,10 +201,33 @@ async def exportar_excel(
         )
     
     if situacao:
-        query = query.filter(LinhaTecnologia.situacao == situacao)
+        condicoes.append(LinhaTecnologia.situacao == situacao)
     
     if ano:
-        query = query.filter(LinhaTecnologia.ano == ano)
+        condicoes.append(LinhaTecnologia.ano == ano)
+    return condicoes
+
+@router.get("/exportar/dados")
+async def exportar_dados(
+    formato: str = Query("csv", alias="format", pattern=PADRAO_FORMATO),
+    search: Optional[str] = None,
+    situacao: Optional[str] = None,
+    ano: Optional[int] = None,
+    current_user = Depends(get_current_user)
+):
+    """Todos os registros filtrados, em CSV ou Parquet, transmitidos em lotes"""
+    return exportar_tabela(LinhaTecnologia, _condicoes_exportacao(search, situacao, ano), formato, "linha_tecnologia")
+
+@router.get("/exportar/excel")
+async def exportar_excel(
+    search: Optional[str] = None,
+    situacao: Optional[str] = None,
+    ano: Optional[int] = None,
+    db: Session = Depends(get_db_leitura),
+    current_user = Depends(get_current_user)
+):
+    pd = obter_backend("pandas")
+    query = db.query(LinhaTecnologia).filter(*_condicoes_exportacao(search, situacao, ano))
     
     registros = query.all()
     
@@ -4,10 +4,16 @@ from sqlalchemy import func
 from typing import List, Optional
 from datetime import date, timedelta, datetime
 
-from app.database import get_db
-from app.models.models import Proposta, Usuario
-from app.schemas import PropostaCreate, PropostaUpdate, PropostaResponse
+from app.database import get_db, get_db_leitura
+from app.models.models import Proposta, Usuario, Cronograma, Contrato
+from app.schemas import (
+    PropostaCreate, PropostaUpdate, PropostaResponse,
+    PropostaLoteItem, PropostaLoteAtualizacao, LoteExclusao
+)
 from app.auth import get_current_user
+from app.exportacao import PADRAO_FORMATO, exportar_tabela
+from app.serializacao import RespostaJSON, listar_colunas, obter_colunas
+from app.lote import atualizar_lote, excluir_lote, alteracoes_por_id, conflitos_unicos
 
 router = APIRouter()
 
@@ -35,6 +41,7 @@ async def listar_propostas(
     consultor_id: Optional[int] = None,
     data_inicio: Optional[date] = None,
     data_fim: Optional[date] = None,
+    fields: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: Usuario = Depends(get_current_user)
 ):
@@ -55,13 +62,35 @@ async def listar_propostas(
     if data_fim:
         query = query.filter(Proposta.data_proposta <= data_fim)
     
-    propostas = query.offset(skip).limit(limit).all()
-    return propostas
+    return listar_colunas(query.offset(skip).limit(limit), Proposta, PropostaResponse, fields)
+
+@router.get("/exportar/dados")
+async def exportar_dados(
+    formato: str = Query("csv", alias="format", pattern=PADRAO_FORMATO),
+    status_filter: Optional[str] = None,
+    consultor_id: Optional[int] = None,
+    data_inicio: Optional[date] = None,
+    data_fim: Optional[date] = None,
+    current_user: Usuario = Depends(get_current_user)
+):
+    """Todas as propostas filtradas, em CSV ou Parquet, transmitidas em lotes"""
+    condicoes = []
+    if current_user.funcao == "Consultor" and current_user.consultor_id:
+        condicoes.append(Proposta.consultor_id == current_user.consultor_id)
+    if status_filter:
+        condicoes.append(Proposta.status == status_filter)
+    if consultor_id:
+        condicoes.append(Proposta.consultor_id == consultor_id)
+    if data_inicio:
+        condicoes.append(Proposta.data_proposta >= data_inicio)
+    if data_fim:
+        condicoes.append(Proposta.data_proposta <= data_fim)
+    return exportar_tabela(Proposta, condicoes, formato, "propostas")
 
 @router.get("/estatisticas")
 async def obter_estatisticas_propostas(
     consultor_id: Optional[int] = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_leitura),
     current_user: Usuario = Depends(get_current_user)
 ):
     query = db.query(Proposta)
@@ -98,16 +127,68 @@ async def obter_estatisticas_propostas(
         "valor_total_fechado": float(valor_total)
     }
 
+def _validar_alteracao_lote(db: Session, registros, alteracoes):
+    return conflitos_unicos(db, Proposta, Proposta.numero_proposta, "numero_proposta", alteracoes,
+                            "Número de proposta já existe")
+
+def _validar_exclusao_lote(db: Session, registros):
+    ids = list(registros)
+    vinculadas = {
+        proposta_id
+        for modelo in (Cronograma, Contrato)
+        for (proposta_id,) in db.query(modelo.proposta_id).filter(modelo.proposta_id.in_(ids)).distinct()
+    }
+    return {proposta_id: (400, "Proposta possui cronogramas ou contratos vinculados") for proposta_id in vinculadas}
+
+@router.patch("/lote")
+async def atualizar_propostas_lote(
+    lote: PropostaLoteAtualizacao,
+    tudo_ou_nada: bool = False,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_user)
+):
+    """Aplica as mesmas alterações a várias propostas (ex.: fechar ou marcar como perdidas)"""
+    dados = lote.dados.model_dump(exclude_unset=True)
+    if not dados:
+        raise HTTPException(status_code=400, detail="Nenhum campo para atualizar")
+    alteracoes = {proposta_id: dados for proposta_id in dict.fromkeys(lote.ids)}
+    return atualizar_lote(db, Proposta, alteracoes, PropostaResponse, "Proposta não encontrada",
+                          validar=_validar_alteracao_lote, tudo_ou_nada=tudo_ou_nada)
+
+@router.put("/lote")
+async def substituir_propostas_lote(
+    itens: List[PropostaLoteItem],
+    tudo_ou_nada: bool = False,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_user)
+):
+    """Atualiza várias propostas, cada uma com os seus próprios dados"""
+    alteracoes, repetidos = alteracoes_por_id(item.model_dump(exclude_unset=True) for item in itens)
+    return atualizar_lote(db, Proposta, alteracoes, PropostaResponse, "Proposta não encontrada",
+                          validar=_validar_alteracao_lote, erros_previos=repetidos, tudo_ou_nada=tudo_ou_nada)
+
+@router.post("/lote/excluir")
+async def deletar_propostas_lote(
+    lote: LoteExclusao,
+    tudo_ou_nada: bool = False,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_user)
+):
+    return excluir_lote(db, Proposta, lote.ids, "Proposta não encontrada",
+                        validar=_validar_exclusao_lote, tudo_ou_nada=tudo_ou_nada)
+
 @router.get("/{proposta_id}", response_model=PropostaResponse)
 async def obter_proposta(
     proposta_id: int,
+    fields: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: Usuario = Depends(get_current_user)
 ):
-    proposta = db.query(Proposta).filter(Proposta.id == proposta_id).first()
+    query = db.query(Proposta).filter(Proposta.id == proposta_id)
+    proposta = obter_colunas(query, Proposta, PropostaResponse, fields)
     if not proposta:
         raise HTTPException(status_code=404, detail="Proposta não encontrada")
-    return proposta
+    return RespostaJSON(proposta)
 
 @router.put("/{proposta_id}", response_model=PropostaResponse)
 async def atualizar_proposta(
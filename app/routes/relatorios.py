@@ -3,48 +3,44 @@ from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from datetime import datetime, date
 from io import BytesIO
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
-from reportlab.pdfgen import canvas
-import openpyxl
-from openpyxl.styles import Font, Alignment, PatternFill
 
-from app.database import get_db
+from app.database import get_db_leitura
 from app.models.models import Usuario, Proposta, Contrato, Cronograma, Empresa, Consultor, AlocacaoCronograma
 from app.auth import get_current_user
+from app.backends import obter_backend
+from app.coalescencia import coalescer
 
 router = APIRouter()
 
 @router.get("/pdf/{tipo}")
+@coalescer
 async def gerar_relatorio_pdf(
     tipo: str,
     data_inicial: date = Query(None),
     data_final: date = Query(None),
     status: str = Query(None),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_leitura),
     current_user: Usuario = Depends(get_current_user)
 ):
+    pdf = obter_backend("pdf")
     buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
+    doc = pdf.SimpleDocTemplate(buffer, pagesize=pdf.A4)
     elements = []
     
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
+    styles = pdf.getSampleStyleSheet()
+    title_style = pdf.ParagraphStyle(
         'CustomTitle',
         parent=styles['Heading1'],
         fontSize=24,
-        textColor=colors.HexColor('#1a1f3a'),
+        textColor=pdf.colors.HexColor('#1a1f3a'),
         spaceAfter=30,
         alignment=1
     )
     
     if tipo == 'propostas':
-        title = Paragraph("Relatório de Propostas", title_style)
+        title = pdf.Paragraph("Relatório de Propostas", title_style)
         elements.append(title)
-        elements.append(Spacer(1, 0.3*inch))
+        elements.append(pdf.Spacer(1, 0.3*pdf.inch))
         
         query = db.query(Proposta).join(Empresa)
         if data_inicial:
@@ -66,23 +62,23 @@ async def gerar_relatorio_pdf(
                 p.data_proposta.strftime('%d/%m/%Y') if p.data_proposta else '-'
             ])
         
-        table = Table(data, repeatRows=1)
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3b82f6')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        table = pdf.Table(data, repeatRows=1)
+        table.setStyle(pdf.TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), pdf.colors.HexColor('#3b82f6')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), pdf.colors.whitesmoke),
             ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
             ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
             ('FONTSIZE', (0, 0), (-1, 0), 12),
             ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
+            ('BACKGROUND', (0, 1), (-1, -1), pdf.colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, pdf.colors.black)
         ]))
         elements.append(table)
     
     elif tipo == 'contratos':
-        title = Paragraph("Relatório de Contratos", title_style)
+        title = pdf.Paragraph("Relatório de Contratos", title_style)
         elements.append(title)
-        elements.append(Spacer(1, 0.3*inch))
+        elements.append(pdf.Spacer(1, 0.3*pdf.inch))
         
         query = db.query(Contrato).join(Proposta)
         if data_inicial:
@@ -102,23 +98,23 @@ async def gerar_relatorio_pdf(
                 c.status_pagamento or '-'
             ])
         
-        table = Table(data, repeatRows=1)
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#10b981')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        table = pdf.Table(data, repeatRows=1)
+        table.setStyle(pdf.TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), pdf.colors.HexColor('#10b981')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), pdf.colors.whitesmoke),
             ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
             ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
             ('FONTSIZE', (0, 0), (-1, 0), 12),
             ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
+            ('BACKGROUND', (0, 1), (-1, -1), pdf.colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, pdf.colors.black)
         ]))
         elements.append(table)
     
     elif tipo == 'cronogramas':
-        title = Paragraph("Relatório de Cronogramas", title_style)
+        title = pdf.Paragraph("Relatório de Cronogramas", title_style)
         elements.append(title)
-        elements.append(Spacer(1, 0.3*inch))
+        elements.append(pdf.Spacer(1, 0.3*pdf.inch))
         
         cronogramas = db.query(Cronograma).join(Proposta).all()
         
@@ -133,23 +129,23 @@ async def gerar_relatorio_pdf(
                 cr.status or '-'
             ])
         
-        table = Table(data, repeatRows=1)
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f59e0b')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        table = pdf.Table(data, repeatRows=1)
+        table.setStyle(pdf.TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), pdf.colors.HexColor('#f59e0b')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), pdf.colors.whitesmoke),
             ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
             ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
             ('FONTSIZE', (0, 0), (-1, 0), 12),
             ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
+            ('BACKGROUND', (0, 1), (-1, -1), pdf.colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, pdf.colors.black)
         ]))
         elements.append(table)
     
     else:
-        title = Paragraph("Relatório Geral do Sistema", title_style)
+        title = pdf.Paragraph("Relatório Geral do Sistema", title_style)
         elements.append(title)
-        elements.append(Spacer(1, 0.3*inch))
+        elements.append(pdf.Spacer(1, 0.3*pdf.inch))
         
         total_propostas = db.query(Proposta).count()
         total_contratos = db.query(Contrato).count()
@@ -161,7 +157,7 @@ async def gerar_relatorio_pdf(
         <b>Total de Contratos:</b> {total_contratos}<br/>
         <b>Data do Relatório:</b> {datetime.now().strftime('%d/%m/%Y %H:%M')}
         """
-        elements.append(Paragraph(info_text, styles['Normal']))
+        elements.append(pdf.Paragraph(info_text, styles['Normal']))
     
     doc.build(elements)
     buffer.seek(0)
@@ -173,20 +169,22 @@ async def gerar_relatorio_pdf(
     )
 
 @router.get("/excel/{tipo}")
+@coalescer
 async def exportar_excel(
     tipo: str,
     data_inicial: date = Query(None),
     data_final: date = Query(None),
     status: str = Query(None),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_leitura),
     current_user: Usuario = Depends(get_current_user)
 ):
-    wb = openpyxl.Workbook()
+    excel = obter_backend("excel")
+    wb = excel.Workbook()
     ws = wb.active
     
-    header_fill = PatternFill(start_color="3b82f6", end_color="3b82f6", fill_type="solid")
-    header_font = Font(bold=True, color="FFFFFF")
-    center_align = Alignment(horizontal="center", vertical="center")
+    header_fill = excel.PatternFill(start_color="3b82f6", end_color="3b82f6", fill_type="solid")
+    header_font = excel.Font(bold=True, color="FFFFFF")
+    center_align = excel.Alignment(horizontal="center", vertical="center")
     
     if tipo == 'propostas':
         ws.title = "Propostas"
@@ -303,32 +301,34 @@ async def exportar_excel(
     )
 
 @router.get("/cronograma-pdf")
+@coalescer
 async def exportar_cronograma_pdf(
     ano: int,
     mes: int,
     consultor_id: int = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_leitura),
     current_user: Usuario = Depends(get_current_user)
 ):
+    pdf = obter_backend("pdf")
     buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
+    doc = pdf.SimpleDocTemplate(buffer, pagesize=pdf.A4)
     elements = []
     
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
+    styles = pdf.getSampleStyleSheet()
+    title_style = pdf.ParagraphStyle(
         'CustomTitle',
         parent=styles['Heading1'],
         fontSize=24,
-        textColor=colors.HexColor('#1a1f3a'),
+        textColor=pdf.colors.HexColor('#1a1f3a'),
         spaceAfter=30,
         alignment=1
     )
     
     mes_nome = ['Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho', 
                 'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro'][mes-1]
-    title = Paragraph(f"Cronograma de Alocações - {mes_nome}/{ano}", title_style)
+    title = pdf.Paragraph(f"Cronograma de Alocações - {mes_nome}/{ano}", title_style)
     elements.append(title)
-    elements.append(Spacer(1, 0.3*inch))
+    elements.append(pdf.Spacer(1, 0.3*pdf.inch))
     
     data_inicio = date(ano, mes, 1)
     import calendar
@@ -354,16 +354,16 @@ async def exportar_cronograma_pdf(
             a.codigo_projeto or '-'
         ])
     
-    table = Table(data, repeatRows=1)
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#667eea')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    table = pdf.Table(data, repeatRows=1)
+    table.setStyle(pdf.TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), pdf.colors.HexColor('#667eea')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), pdf.colors.whitesmoke),
         ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
         ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
         ('FONTSIZE', (0, 0), (-1, 0), 12),
         ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+        ('BACKGROUND', (0, 1), (-1, -1), pdf.colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, pdf.colors.black)
     ]))
     elements.append(table)
     
@@ -377,27 +377,29 @@ async def exportar_cronograma_pdf(
     )
 
 @router.get("/cronograma-excel")
+@coalescer
 async def exportar_cronograma_excel(
     ano: int,
     mes: int,
     consultor_id: int = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_leitura),
     current_user: Usuario = Depends(get_current_user)
 ):
-    wb = openpyxl.Workbook()
+    excel = obter_backend("excel")
+    wb = excel.Workbook()
     ws = wb.active
     
     mes_nome = ['Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho', 
                 'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro'][mes-1]
     ws.title = f"Cronograma {mes_nome}"
     
-    header_fill = PatternFill(start_color="667eea", end_color="667eea", fill_type="solid")
-    header_font = Font(bold=True, color="FFFFFF", size=12)
-    center_align = Alignment(horizontal='center', vertical='center')
+    header_fill = excel.PatternFill(start_color="667eea", end_color="667eea", fill_type="solid")
+    header_font = excel.Font(bold=True, color="FFFFFF", size=12)
+    center_align = excel.Alignment(horizontal='center', vertical='center')
     
     ws.append([f'Cronograma de Alocações - {mes_nome}/{ano}'])
     ws.merge_cells('A1:D1')
-    ws['A1'].font = Font(bold=True, size=16)
+    ws['A1'].font = excel.Font(bold=True, size=16)
     ws['A1'].alignment = center_align
     
     ws.append([])
@@ -0,0 +1,59 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from app.auth import require_role
+from app.backends import estado as estado_backends
+from app.coalescencia import coalescedor
+from app.database import get_db, metricas_pools
+from app.models.models import ExecucaoVarredura, Usuario
+from app.varredura import executar_varredura
+
+router = APIRouter()
+
+@router.get("/banco")
+async def obter_metricas_banco(current_user: Usuario = Depends(require_role("Admin"))):
+    """Pools de conexão (primário e réplica), atraso da réplica e leituras roteadas neste worker"""
+    return metricas_pools()
+
+@router.get("/backends")
+async def obter_estado_backends(current_user: Usuario = Depends(require_role("Admin"))):
+    """Bibliotecas de importação/exportação já carregadas neste worker"""
+    return estado_backends()
+
+@router.get("/coalescencia")
+async def obter_coalescencia(current_user: Usuario = Depends(require_role("Admin"))):
+    """Execuções e requisições que aproveitaram uma execução em andamento, por rota, neste worker"""
+    return coalescedor.estatisticas()
+
+def _dados_execucao(execucao: ExecucaoVarredura) -> dict:
+    return {
+        "id": execucao.id,
+        "data_referencia": execucao.data_referencia,
+        "origem": execucao.origem,
+        "iniciado_em": execucao.iniciado_em,
+        "duracao_ms": execucao.duracao_ms,
+        "cronogramas_atrasados": execucao.cronogramas_atrasados,
+        "cronogramas_em_andamento": execucao.cronogramas_em_andamento,
+        "contratos_vencidos": execucao.contratos_vencidos,
+    }
+
+@router.post("/varredura")
+async def executar_varredura_status(
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(require_role("Admin"))
+):
+    """Aplica agora as transições de status por data (Atrasado, Em andamento, Vencido)"""
+    execucao = executar_varredura(db, origem="manual")
+    if execucao is None:
+        raise HTTPException(status_code=409, detail="Varredura já em execução em outro processo")
+    return _dados_execucao(execucao)
+
+@router.get("/varredura")
+async def listar_execucoes_varredura(
+    limit: int = 30,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(require_role("Admin"))
+):
+    """Últimas execuções da varredura, com as linhas alteradas em cada transição"""
+    execucoes = db.query(ExecucaoVarredura).order_by(ExecucaoVarredura.id.desc()).limit(limit).all()
+    return [_dados_execucao(execucao) for execucao in execucoes]
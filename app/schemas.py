@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional
+from typing import List, Optional
 from datetime import date, datetime
 from decimal import Decimal
 
@@ -59,6 +59,36 @@ class EmpresaResponse(EmpresaBase):
     class Config:
         from_attributes = True
 
+class EmpresaUpdate(BaseModel):
+    cnpj: Optional[str] = None
+    nome: Optional[str] = None
+    sigla: Optional[str] = None
+    porte: Optional[str] = None
+    er: Optional[str] = None
+    carteira: Optional[str] = None
+    endereco: Optional[str] = None
+    bairro: Optional[str] = None
+    zona: Optional[str] = None
+    municipio: Optional[str] = None
+    estado: Optional[str] = None
+    pais: Optional[str] = None
+    area: Optional[str] = None
+    cnae_principal: Optional[str] = None
+    descricao_cnae: Optional[str] = None
+    tipo_empresa: Optional[str] = None
+    cadastro_atualizacao: Optional[datetime] = None
+    num_funcionarios: Optional[int] = None
+    observacao: Optional[str] = None
+    segmento: Optional[str] = None
+    regiao: Optional[str] = None
+
+class EmpresaLoteItem(EmpresaCreate):
+    id: int
+
+class EmpresaLoteAtualizacao(BaseModel):
+    ids: List[int]
+    dados: EmpresaUpdate
+
 class ConsultorBase(BaseModel):
     nome: str
     email: EmailStr
@@ -112,6 +142,13 @@ class PropostaResponse(PropostaBase):
     class Config:
         from_attributes = True
 
+class PropostaLoteItem(PropostaUpdate):
+    id: int
+
+class PropostaLoteAtualizacao(BaseModel):
+    ids: List[int]
+    dados: PropostaUpdate
+
 class CronogramaBase(BaseModel):
     proposta_id: int
     data_inicio: Optional[date] = None
@@ -136,6 +173,8 @@ class CronogramaUpdate(BaseModel):
 
 class CronogramaResponse(CronogramaBase):
     id: int
+    total_tarefas: Optional[int] = 0
+    tarefas_concluidas: Optional[int] = 0
     criado_em: datetime
     atualizado_em: datetime
     
@@ -152,6 +191,12 @@ class TarefaBase(BaseModel):
 class TarefaCreate(TarefaBase):
     pass
 
+class TarefaUpdate(BaseModel):
+    descricao: Optional[str] = None
+    data_vencimento: Optional[date] = None
+    concluida: Optional[bool] = None
+    ordem: Optional[int] = None
+
 class TarefaResponse(TarefaBase):
     id: int
     criado_em: datetime
@@ -213,3 +258,6 @@ class ImportacaoResponse(BaseModel):
     sucesso: bool
     registros_importados: int
     erros: list = []
+
+class LoteExclusao(BaseModel):
+    ids: List[int]
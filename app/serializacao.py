@@ -0,0 +1,93 @@
+"""Caminho rápido para respostas JSON de listas grandes.
+
+As rotas de listagem normalmente carregam objetos completos do ORM e os validam
+com o `response_model` do Pydantic antes de gerar o JSON. Em páginas de 1000
+linhas, isso é quase todo o custo da requisição. `listar_colunas` consulta só as
+colunas do schema de resposta como tuplas (sem identity map), monta os dicts
+diretamente e os codifica com `RespostaJSON`.
+
+Com `fields=empresa,cnpj,...` a consulta e a resposta se limitam aos campos
+pedidos (o `id` sempre vem junto), o que reduz o SELECT, o tráfego e a
+serialização nas telas de tabela.
+
+O JSON gerado é o mesmo do caminho do Pydantic: mesmas chaves e na mesma ordem,
+Decimal como string, datas em ISO 8601 e UTF-8 sem escapes. Usa orjson se estiver
+instalado; senão, o módulo json com as mesmas opções do JSONResponse do FastAPI.
+"""
+from datetime import date, datetime, time
+from decimal import Decimal
+from functools import lru_cache
+from typing import Optional
+import json
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson é opcional
+    orjson = None
+
+_campos_por_schema = {}
+
+
+def _converter(valor):
+    # Mesmo formato do Pydantic em modo JSON
+    if isinstance(valor, Decimal):
+        return str(valor)
+    if isinstance(valor, (datetime, date, time)):
+        return valor.isoformat()
+    raise TypeError(f"Tipo não serializável: {type(valor).__name__}")
+
+
+def dumps(conteudo) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(conteudo, default=_converter)
+    return json.dumps(
+        conteudo, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":"), default=_converter
+    ).encode("utf-8")
+
+
+class RespostaJSON(JSONResponse):
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def campos(schema) -> tuple:
+    """Nomes dos campos do schema de resposta, na ordem em que aparecem no JSON"""
+    nomes = _campos_por_schema.get(schema)
+    if nomes is None:
+        nomes = _campos_por_schema[schema] = tuple(schema.model_fields)
+    return nomes
+
+
+@lru_cache(maxsize=256)
+def campos_solicitados(schema, fields: Optional[str] = None) -> tuple:
+    """Campos pedidos em `fields` (separados por vírgula), na ordem do schema"""
+    todos = campos(schema)
+    if not fields:
+        return todos
+    pedidos = {nome.strip() for nome in fields.split(",") if nome.strip()}
+    invalidos = pedidos - set(todos)
+    if invalidos:
+        raise HTTPException(status_code=400, detail=f"Campos inválidos em fields: {', '.join(sorted(invalidos))}")
+    pedidos.add("id")
+    return tuple(nome for nome in todos if nome in pedidos)
+
+
+def _selecionar(query, modelo, nomes):
+    return query.with_entities(*(getattr(modelo, nome) for nome in nomes))
+
+
+def listar_colunas(query, modelo, schema, fields: Optional[str] = None) -> RespostaJSON:
+    """Executa a consulta (já filtrada e paginada) trazendo só as colunas do schema ou de `fields`"""
+    nomes = campos_solicitados(schema, fields)
+    linhas = _selecionar(query, modelo, nomes).all()
+    return RespostaJSON([dict(zip(nomes, linha)) for linha in linhas])
+
+
+def obter_colunas(query, modelo, schema, fields: Optional[str] = None) -> Optional[dict]:
+    """Primeira linha da consulta como dict com as colunas do schema ou de `fields`, ou None"""
+    nomes = campos_solicitados(schema, fields)
+    linha = _selecionar(query, modelo, nomes).first()
+    return dict(zip(nomes, linha)) if linha is not None else None
@@ -0,0 +1,166 @@
+"""Varredura diária dos status que mudam só com a passagem do tempo.
+
+Um cronograma fica "Atrasado" quando passa de `data_termino` sem chegar a 100%,
+passa a "Em andamento" quando chega `data_inicio`, e um contrato "Pendente"
+vira "Vencido" depois de `data_vencimento`. Cada transição trava as linhas
+que mudam (SELECT ... FOR UPDATE, junto com as propostas, de onde vem o
+consultor), troca o status com um único UPDATE e a execução é registrada em
+`execucoes_varredura` com quantas linhas mudaram. Os contratos alterados
+entram na auditoria como alterações do sistema, sem usuário.
+
+A varredura roda uma vez por dia (e na subida, se ainda não rodou hoje) e sob
+demanda em `POST /api/sistema/varredura`. No Postgres um advisory lock da
+transação garante que só um worker varre por vez. Como o resumo mensal do BI
+é agrupado por status, as contribuições das linhas alteradas passam do status
+antigo para o novo na mesma transação; o resto do resumo não é tocado, então as
+atualizações incrementais de outras transações continuam valendo.
+"""
+import asyncio
+import logging
+import os
+import time
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import or_, select, text, update
+from sqlalchemy.orm import Session
+
+from app.auditoria import registrar_em_massa
+from app.database import SessionLocal
+from app.models.models import Contrato, Cronograma, ExecucaoVarredura, Proposta
+from app.resumo_mensal import CAMPOS_CONTRATO, CAMPOS_CRONOGRAMA, ajustar_status
+
+logger = logging.getLogger(__name__)
+
+HORARIO_VARREDURA = os.getenv("VARREDURA_HORARIO", "00:05")
+VARREDURA_ATIVA = os.getenv("VARREDURA_ATIVA", "true").lower() not in ("0", "false", "nao", "não")
+CHAVE_LOCK = 727100042
+
+# Status que a varredura não altera
+STATUS_FINAIS_CRONOGRAMA = ("Concluído", "Atrasado")
+
+
+def _transicoes(hoje: date) -> dict:
+    """(modelo, coluna de status, novo status, condições) de cada transição, na ordem em que são aplicadas"""
+    incompleto = or_(Cronograma.percentual_conclusao.is_(None), Cronograma.percentual_conclusao < 100)
+    return {
+        "cronogramas_atrasados": (Cronograma, "status", "Atrasado", (
+            Cronograma.data_termino < hoje,
+            incompleto,
+            or_(Cronograma.status.is_(None), Cronograma.status.notin_(STATUS_FINAIS_CRONOGRAMA)),
+        )),
+        "cronogramas_em_andamento": (Cronograma, "status", "Em andamento", (
+            Cronograma.data_inicio <= hoje,
+            or_(Cronograma.data_termino.is_(None), Cronograma.data_termino >= hoje),
+            incompleto,
+            or_(Cronograma.status.is_(None), Cronograma.status == "Não iniciado"),
+        )),
+        "contratos_vencidos": (Contrato, "status_pagamento", "Vencido", (
+            Contrato.data_vencimento < hoje,
+            Contrato.status_pagamento == "Pendente",
+        )),
+    }
+
+
+def _aplicar_transicao(db: Session, modelo, coluna: str, novo_status: str, condicoes) -> list:
+    """Trava as linhas da transição, troca o status, audita e retorna as mudanças para o resumo mensal"""
+    campos = CAMPOS_CONTRATO if modelo is Contrato else CAMPOS_CRONOGRAMA
+    linhas = db.execute(
+        select(modelo.id, Proposta.consultor_id, *(getattr(modelo, campo) for campo in campos))
+        .join(Proposta, Proposta.id == modelo.proposta_id)
+        .where(*condicoes)
+        .with_for_update()
+    ).all()
+    if not linhas:
+        return []
+    db.execute(
+        update(modelo).where(modelo.id.in_([linha[0] for linha in linhas])).values({coluna: novo_status}),
+        execution_options={"synchronize_session": False},
+    )
+    indice = 2 + campos.index(coluna)
+    registrar_em_massa(db, modelo.__tablename__, {
+        linha[0]: {coluna: [linha[indice], novo_status]} for linha in linhas
+    })
+    return [(modelo, dict(zip(campos, linha[2:])), linha[1], novo_status) for linha in linhas]
+
+
+def _obter_lock(db: Session) -> bool:
+    if db.get_bind().dialect.name != "postgresql":
+        return True
+    return db.execute(text("SELECT pg_try_advisory_xact_lock(:chave)"), {"chave": CHAVE_LOCK}).scalar()
+
+
+def executar_varredura(db: Session, origem: str = "manual", hoje: Optional[date] = None) -> Optional[ExecucaoVarredura]:
+    """Aplica as transições e registra a execução.
+
+    Retorna None se outro processo está varrendo ou se a varredura agendada já rodou hoje.
+    """
+    hoje = hoje or date.today()
+    inicio = time.perf_counter()
+    if not _obter_lock(db):
+        db.rollback()
+        return None
+    if origem == "agendada" and db.query(ExecucaoVarredura.id).filter(
+        ExecucaoVarredura.origem == "agendada", ExecucaoVarredura.data_referencia == hoje
+    ).first():
+        db.rollback()
+        return None
+
+    execucao = ExecucaoVarredura(data_referencia=hoje, origem=origem, iniciado_em=datetime.utcnow())
+    mudancas = []
+    for campo, (modelo, coluna, novo_status, condicoes) in _transicoes(hoje).items():
+        alteradas = _aplicar_transicao(db, modelo, coluna, novo_status, condicoes)
+        setattr(execucao, campo, len(alteradas))
+        mudancas.extend(alteradas)
+    # Resumo por último, depois de travar todas as linhas, na mesma ordem das escritas pelo ORM
+    if mudancas:
+        ajustar_status(db, mudancas)
+    execucao.duracao_ms = int((time.perf_counter() - inicio) * 1000)
+    db.add(execucao)
+    db.commit()
+    db.refresh(execucao)
+    return execucao
+
+
+def _segundos_ate_proxima(agora: datetime) -> float:
+    hora, minuto = (int(parte) for parte in HORARIO_VARREDURA.split(":"))
+    proxima = agora.replace(hour=hora, minute=minuto, second=0, microsecond=0)
+    if proxima <= agora:
+        proxima += timedelta(days=1)
+    return (proxima - agora).total_seconds()
+
+
+def _varredura_agendada():
+    db = SessionLocal()
+    try:
+        execucao = executar_varredura(db, origem="agendada")
+        if execucao is not None:
+            logger.info(
+                f"Varredura de status: {execucao.cronogramas_atrasados} cronogramas atrasados, "
+                f"{execucao.cronogramas_em_andamento} em andamento, {execucao.contratos_vencidos} contratos vencidos"
+            )
+    finally:
+        db.close()
+
+
+class AgendadorVarredura:
+    """Roda a varredura na subida (se ainda não rodou hoje) e depois todo dia no horário configurado"""
+
+    def __init__(self):
+        self._tarefa = None
+
+    def iniciar(self):
+        if VARREDURA_ATIVA and (self._tarefa is None or self._tarefa.done()):
+            self._tarefa = asyncio.get_running_loop().create_task(self._executar())
+
+    async def _executar(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await loop.run_in_executor(None, _varredura_agendada)
+            except Exception as e:
+                logger.error(f"Erro na varredura de status: {e}")
+            await asyncio.sleep(_segundos_ate_proxima(datetime.now()))
+
+
+agendador_varredura = AgendadorVarredura()
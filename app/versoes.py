@@ -0,0 +1,90 @@
+"""Versões de dados por tabela, usadas para invalidar caches em memória.
+
+Cada commit que altera uma tabela (pelo ORM ou por UPDATE/DELETE em massa na
+sessão) incrementa a versão dessa tabela neste processo e avisa os ouvintes
+registrados com `ao_alterar`. No Postgres o commit também publica as tabelas
+alteradas para os outros workers, que incrementam as mesmas versões ao
+receber o aviso (`app/eventos.py`).
+"""
+from collections import defaultdict
+import logging
+import threading
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_versoes = defaultdict(int)
+_ouvintes = []
+
+CHAVE_SESSAO = "tabelas_alteradas"
+
+
+def versao(*tabelas: str) -> tuple:
+    """Retorna a tupla de versões atuais das tabelas informadas"""
+    with _lock:
+        return tuple(_versoes[t] for t in tabelas)
+
+
+def marcar_alterada(session: Session, *tabelas: str):
+    """Registra tabelas alteradas na transação atual (para SQL executado fora do ORM)"""
+    session.info.setdefault(CHAVE_SESSAO, set()).update(tabelas)
+
+
+def incrementar(*tabelas: str):
+    """Incrementa as versões imediatamente, fora de uma sessão"""
+    if not tabelas:
+        return
+    with _lock:
+        for tabela in tabelas:
+            _versoes[tabela] += 1
+    _notificar(set(tabelas))
+
+
+def ao_alterar(callback):
+    """Registra uma função chamada com o conjunto de tabelas alteradas após cada commit"""
+    _ouvintes.append(callback)
+    return callback
+
+
+def _notificar(tabelas: set):
+    for callback in list(_ouvintes):
+        try:
+            callback(tabelas)
+        except Exception as e:
+            logger.error(f"Erro ao notificar alteração de {sorted(tabelas)}: {e}")
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _registrar_flush(session: Session, flush_context):
+    tabelas = {
+        obj.__tablename__
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted)
+        if hasattr(obj, "__tablename__")
+    }
+    if tabelas:
+        marcar_alterada(session, *tabelas)
+
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _registrar_dml(orm_execute_state):
+    if orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert:
+        tabela = getattr(orm_execute_state.statement, "table", None)
+        if tabela is not None:
+            marcar_alterada(orm_execute_state.session, tabela.name)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _confirmar(session: Session):
+    tabelas = session.info.pop(CHAVE_SESSAO, None)
+    if tabelas:
+        incrementar(*tabelas)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _descartar(session: Session):
+    session.info.pop(CHAVE_SESSAO, None)
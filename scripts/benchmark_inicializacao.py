@@ -0,0 +1,59 @@
+"""Mede o tempo de import e a memória (RSS) de um worker com e sem os backends pesados.
+
+"eager" carrega pandas, openpyxl e reportlab logo após o import da aplicação,
+como acontecia quando as rotas os importavam no topo do módulo; "sob demanda"
+é o comportamento atual. Cada modo roda em processos novos.
+
+Uso: DATABASE_URL=... python scripts/benchmark_inicializacao.py [repeticoes]
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CODIGO = """
+import json, time
+inicio = time.perf_counter()
+import app.main
+from app.backends import pre_carregar
+pre_carregar()
+tempo = time.perf_counter() - inicio
+rss_kb = 0
+with open("/proc/self/status") as status:
+    for linha in status:
+        if linha.startswith("VmRSS:"):
+            rss_kb = int(linha.split()[1])
+print(json.dumps({"tempo_ms": tempo * 1000, "rss_mb": rss_kb / 1024}))
+"""
+
+
+def medir(pre_carregar: str, repeticoes: int) -> dict:
+    env = dict(os.environ, BACKENDS_PRE_CARREGAR=pre_carregar)
+    amostras = []
+    for _ in range(repeticoes):
+        saida = subprocess.run(
+            [sys.executable, "-c", CODIGO], cwd=RAIZ, env=env, capture_output=True, text=True, check=True
+        ).stdout.strip().splitlines()[-1]
+        amostras.append(json.loads(saida))
+    return {
+        "tempo_ms": round(statistics.median(a["tempo_ms"] for a in amostras), 1),
+        "rss_mb": round(statistics.median(a["rss_mb"] for a in amostras), 1),
+    }
+
+
+def main():
+    repeticoes = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    resultados = {
+        "eager (antes)": medir("todos", repeticoes),
+        "sob demanda (depois)": medir("", repeticoes),
+    }
+    print(f"{'modo':<22}{'import (ms)':>14}{'RSS (MB)':>12}")
+    for modo, r in resultados.items():
+        print(f"{modo:<22}{r['tempo_ms']:>14}{r['rss_mb']:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Mede a vazão de /api/login e a latência de /health durante uma rajada de logins.
+
+"inline (antes)" verifica a senha com bcrypt dentro do event loop, como a rota
+fazia; "pool (depois)" é o comportamento atual, com o hash em um pool de
+threads limitado. Enquanto os logins rodam, /health é chamado em sequência
+para medir quanto o resto da API espera.
+
+Uso: DATABASE_URL=... python scripts/benchmark_login.py [logins] [concorrencia]
+"""
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+os.chdir(RAIZ)
+
+import httpx  # noqa: E402
+
+from app.main import app  # noqa: E402
+from app.bootstrap import garantir_inicializacao  # noqa: E402
+from app import auth  # noqa: E402
+from app.routes import auth as rotas_auth  # noqa: E402
+
+EMAIL = os.getenv("ADMIN_EMAIL", "admin@sistema.com")
+SENHA = os.getenv("ADMIN_PASSWORD", "admin123")
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+
+async def _verificar_inline(senha, hash_senha):
+    return auth.verify_password(senha, hash_senha)
+
+
+def _percentil(valores, p):
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(len(valores) * p))]
+
+
+async def rodada(logins: int, concorrencia: int) -> dict:
+    transporte = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://teste") as cliente:
+        limite = asyncio.Semaphore(concorrencia)
+        codigos = {}
+
+        async def logar():
+            async with limite:
+                resposta = await cliente.post("/api/login", data={"username": EMAIL, "password": SENHA})
+                codigos[resposta.status_code] = codigos.get(resposta.status_code, 0) + 1
+
+        latencias = []
+        terminou = asyncio.Event()
+
+        async def sondar():
+            while not terminou.is_set():
+                inicio = time.perf_counter()
+                await cliente.get("/health")
+                latencias.append((time.perf_counter() - inicio) * 1000)
+                await asyncio.sleep(0.01)
+
+        sonda = asyncio.create_task(sondar())
+        inicio = time.perf_counter()
+        await asyncio.gather(*(logar() for _ in range(logins)))
+        duracao = time.perf_counter() - inicio
+        terminou.set()
+        await sonda
+
+    return {
+        "logins_s": round(logins / duracao, 1),
+        "sondas": len(latencias),
+        "health_p50_ms": round(statistics.median(latencias), 1),
+        "health_p99_ms": round(_percentil(latencias, 0.99), 1),
+        "health_max_ms": round(max(latencias), 1),
+        "status": codigos,
+    }
+
+
+def main():
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    concorrencia = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    garantir_inicializacao()
+
+    original = rotas_auth.verificar_senha
+    rotas_auth.verificar_senha = _verificar_inline
+    resultados = {"inline (antes)": asyncio.run(rodada(logins, concorrencia))}
+    rotas_auth.verificar_senha = original
+    resultados["pool (depois)"] = asyncio.run(rodada(logins, concorrencia))
+
+    print(f"{'modo':<16}{'logins/s':>10}{'sondas':>8}{'p50 (ms)':>10}{'p99 (ms)':>10}{'max (ms)':>10}  status")
+    for modo, r in resultados.items():
+        print(f"{modo:<16}{r['logins_s']:>10}{r['sondas']:>8}{r['health_p50_ms']:>10}{r['health_p99_ms']:>10}"
+              f"{r['health_max_ms']:>10}  {r['status']}")
+
+
+if __name__ == "__main__":
+    main()
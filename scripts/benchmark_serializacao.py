@@ -0,0 +1,116 @@
+"""Compara o custo de CPU por página das listagens antes e depois do caminho rápido.
+
+"ORM + Pydantic" é como as rotas respondiam: objetos completos do ORM validados
+pelo `response_model`. "colunas + orjson" é o caminho atual (`listar_colunas`).
+As duas versões são chamadas pela aplicação com as mesmas linhas, e o script
+confere se o JSON gerado é idêntico byte a byte. Por fim, compara a listagem
+completa com a pedida pela tela (`fields=` só com as colunas da tabela).
+
+Os dados são sintéticos, gravados num SQLite temporário.
+
+Uso: python scripts/benchmark_serializacao.py [linhas] [repeticoes]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import List
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+os.chdir(RAIZ)
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "benchmark.db")
+
+from fastapi import Depends  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from app.main import app  # noqa: E402
+from app.auth import get_current_user  # noqa: E402
+from app.database import SessionLocal, get_db, init_db  # noqa: E402
+from app.models.models import Contato, LinhaTecnologia  # noqa: E402
+from app.routes.contatos import ContatoResponse  # noqa: E402
+from app.routes.linha_tecnologia import LinhaTecnologiaResponse  # noqa: E402
+from app.serializacao import orjson  # noqa: E402
+
+
+CAMPOS_TABELA_CONTATOS = "empresa,cnpj,contato,cargo,celular,telefone_fixo,email,er"
+
+
+def popular(linhas: int):
+    init_db()
+    db = SessionLocal()
+    agora = datetime(2025, 10, 17, 9, 30, 15, 123456)
+    db.add_all(Contato(
+        empresa=f"Indústria Paulista {i:05d}", cnpj=f"{i:08d}000199", carteira="Carteira Leste", porte="Médio",
+        er="ER Capital", contato=f"João da Silva {i}", cargo="Gerente de Produção", email=f"contato{i}@empresa.com.br",
+        celular="(11) 91234-5678", observacoes="Visita técnica agendada; aguarda retorno.",
+        atualizacao=date(2025, 1, 1) + timedelta(days=i % 300), dados_iniciais=i % 2 == 0,
+        criado_em=agora, atualizado_em=agora
+    ) for i in range(linhas))
+    db.add_all(LinhaTecnologia(
+        linha="Tecnologia", tipo_programa="Brasil Mais Produtivo", cnpj=f"{i:08d}000199",
+        empresa=f"Indústria Paulista {i:05d}", porte="Pequeno", er="ER Capital", numero_proposta=f"PT-{i:06d}",
+        consultor="Maria Souza", valor_proposta=Decimal("18750.50") + i, situacao="Em execução",
+        data_inicio=date(2025, 3, 1), data_termino=date(2025, 9, 30), ano=2025, mes="Março",
+        dados_iniciais=False, criado_em=agora, atualizado_em=agora
+    ) for i in range(linhas))
+    db.commit()
+    db.close()
+
+
+def registrar_rotas_antigas():
+    @app.get("/_antigo/contatos", response_model=List[ContatoResponse])
+    async def contatos_antigo(limit: int = 100, db: Session = Depends(get_db)):
+        return db.query(Contato).order_by(Contato.empresa).offset(0).limit(limit).all()
+
+    @app.get("/_antigo/linha-tecnologia", response_model=List[LinhaTecnologiaResponse])
+    async def linha_antigo(limit: int = 100, db: Session = Depends(get_db)):
+        return db.query(LinhaTecnologia).order_by(LinhaTecnologia.empresa).offset(0).limit(limit).all()
+
+
+def medir(cliente: TestClient, url: str, repeticoes: int) -> tuple:
+    cliente.get(url)
+    amostras = []
+    for _ in range(repeticoes):
+        inicio = time.process_time()
+        resposta = cliente.get(url)
+        amostras.append((time.process_time() - inicio) * 1000)
+    return statistics.median(amostras), resposta.content
+
+
+def main():
+    linhas = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    repeticoes = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    popular(linhas)
+    registrar_rotas_antigas()
+    app.dependency_overrides[get_current_user] = lambda: None
+    cliente = TestClient(app)
+
+    print(f"{linhas} linhas por página, mediana de {repeticoes} requisições "
+          f"(codificador: {'orjson' if orjson else 'json'})")
+    print(f"{'listagem':<20}{'ORM + Pydantic':>16}{'colunas':>10}{'economia':>10}  JSON idêntico")
+    for nome, antigo, novo in (
+        ("contatos", "/_antigo/contatos", "/api/contatos/"),
+        ("linha-tecnologia", "/_antigo/linha-tecnologia", "/api/linha-tecnologia/"),
+    ):
+        ms_antigo, corpo_antigo = medir(cliente, f"{antigo}?limit={linhas}", repeticoes)
+        ms_novo, corpo_novo = medir(cliente, f"{novo}?limit={linhas}", repeticoes)
+        economia = (1 - ms_novo / ms_antigo) * 100
+        print(f"{nome:<20}{ms_antigo:>13.1f} ms{ms_novo:>7.1f} ms{economia:>9.0f}%  {corpo_antigo == corpo_novo}")
+
+    print()
+    print(f"{'contatos':<20}{'CPU':>10}{'bytes':>12}")
+    for rotulo, url in (
+        ("todas as colunas", f"/api/contatos/?limit={linhas}"),
+        ("fields da tabela", f"/api/contatos/?limit={linhas}&fields={CAMPOS_TABELA_CONTATOS}"),
+    ):
+        ms, corpo = medir(cliente, url, repeticoes)
+        print(f"{rotulo:<20}{ms:>7.1f} ms{len(corpo):>12}")
+
+
+if __name__ == "__main__":
+    main()
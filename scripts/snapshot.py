@@ -0,0 +1,195 @@
+"""Snapshot e restauração de todas as tabelas do sistema com COPY binário do Postgres.
+
+"criar" grava as tabelas de `app/models/models.py` em um único arquivo .zip:
+um membro `<tabela>.copy` por tabela, no formato binário do COPY e comprimido
+enquanto é lido, e um `manifest.json` com as colunas e a contagem de linhas de
+cada tabela. Todas as tabelas são lidas na mesma transação REPEATABLE READ, então o
+snapshot é consistente mesmo com a aplicação no ar.
+
+"restaurar" cria as tabelas que faltarem, esvazia todas, remove os índices
+secundários, carrega os dados em ordem de dependência (chaves estrangeiras),
+recria os índices, acerta as sequências dos ids e roda ANALYZE, tudo em uma
+única transação: se algo falhar, o banco fica como estava. Como
+os caches dos workers não veem a carga, reinicie a aplicação depois de restaurar.
+
+Uso:
+    DATABASE_URL=... python scripts/snapshot.py criar snapshot.zip [--compressao 1]
+    DATABASE_URL=... python scripts/snapshot.py restaurar snapshot.zip [--substituir]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import zipfile
+from datetime import datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from app.database import Base, engine, init_db  # noqa: E402
+from app.models import models  # noqa: E402,F401
+
+FORMATO = 1
+MANIFESTO = "manifest.json"
+
+
+def _tabelas():
+    """Tabelas dos modelos, das referenciadas para as que referenciam"""
+    return Base.metadata.sorted_tables
+
+
+def _identificador(cursor, nome: str) -> str:
+    from psycopg2 import sql
+    return sql.Identifier(nome).as_string(cursor)
+
+
+def _lista_colunas(cursor, colunas) -> str:
+    return ", ".join(_identificador(cursor, coluna) for coluna in colunas)
+
+
+def criar(arquivo: str, compressao: int = 1):
+    conexao = engine.raw_connection()
+    inicio = time.perf_counter()
+    manifesto = {"formato": FORMATO, "criado_em": datetime.utcnow().isoformat(), "tabelas": []}
+    try:
+        cursor = conexao.cursor()
+        cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+        cursor.execute("SHOW server_version")
+        manifesto["versao_postgres"] = cursor.fetchone()[0]
+        with zipfile.ZipFile(arquivo, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=compressao) as destino:
+            for tabela in _tabelas():
+                colunas = [coluna.name for coluna in tabela.columns]
+                membro = f"{tabela.name}.copy"
+                t0 = time.perf_counter()
+                with destino.open(membro, "w", force_zip64=True) as saida:
+                    cursor.copy_expert(
+                        f"COPY {_identificador(cursor, tabela.name)} ({_lista_colunas(cursor, colunas)}) "
+                        "TO STDOUT (FORMAT binary)",
+                        saida,
+                    )
+                linhas = cursor.rowcount if cursor.rowcount >= 0 else None
+                manifesto["tabelas"].append({"nome": tabela.name, "arquivo": membro, "colunas": colunas, "linhas": linhas})
+                print(f"  {tabela.name:<24}{linhas if linhas is not None else '?':>10} linhas  {time.perf_counter() - t0:.2f}s")
+            destino.writestr(MANIFESTO, json.dumps(manifesto, ensure_ascii=False, indent=2))
+        conexao.rollback()
+    finally:
+        conexao.close()
+    tamanho = os.path.getsize(arquivo) / 1024 / 1024
+    print(f"✓ Snapshot gravado em {arquivo} ({tamanho:.1f} MB, {time.perf_counter() - inicio:.1f}s)")
+
+
+def _indices_secundarios(cursor, tabelas) -> list:
+    """Índices que não sustentam uma constraint (PK, UNIQUE, FK), com o comando para recriá-los"""
+    cursor.execute(
+        """
+        SELECT i.relname, pg_get_indexdef(ix.indexrelid)
+        FROM pg_index ix
+        JOIN pg_class i ON i.oid = ix.indexrelid
+        JOIN pg_class t ON t.oid = ix.indrelid
+        JOIN pg_namespace n ON n.oid = t.relnamespace
+        WHERE n.nspname = current_schema()
+          AND t.relname = ANY(%s)
+          AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = ix.indexrelid)
+        """,
+        (list(tabelas),),
+    )
+    return cursor.fetchall()
+
+
+def _acertar_sequencias(cursor, tabelas):
+    for tabela in tabelas:
+        if "id" not in tabela.columns:
+            continue
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", (tabela.name,))
+        sequencia = cursor.fetchone()[0]
+        if sequencia:
+            cursor.execute(
+                f"SELECT setval(%s, COALESCE(MAX(id), 0) + 1, false) FROM {_identificador(cursor, tabela.name)}",
+                (sequencia,),
+            )
+
+
+def restaurar(arquivo: str, substituir: bool = False):
+    inicio = time.perf_counter()
+    with zipfile.ZipFile(arquivo) as origem:
+        manifesto = json.loads(origem.read(MANIFESTO))
+        if manifesto.get("formato") != FORMATO:
+            sys.exit(f"Formato de snapshot não suportado: {manifesto.get('formato')}")
+
+        conhecidas = {tabela.name: tabela for tabela in _tabelas()}
+        desconhecidas = [t["nome"] for t in manifesto["tabelas"] if t["nome"] not in conhecidas]
+        if desconhecidas:
+            sys.exit(f"Tabelas do snapshot que não existem nos modelos: {', '.join(desconhecidas)}")
+        for item in manifesto["tabelas"]:
+            faltando = set(item["colunas"]) - set(conhecidas[item["nome"]].columns.keys())
+            if faltando:
+                sys.exit(f"Colunas de {item['nome']} que não existem nos modelos: {', '.join(sorted(faltando))}")
+
+        init_db()
+        posicao = {tabela.name: i for i, tabela in enumerate(_tabelas())}
+        itens = sorted(manifesto["tabelas"], key=lambda t: posicao[t["nome"]])
+        ordem = [conhecidas[t["nome"]] for t in itens]
+
+        conexao = engine.raw_connection()
+        try:
+            cursor = conexao.cursor()
+            nomes = ", ".join(_identificador(cursor, tabela.name) for tabela in ordem)
+            if not substituir:
+                for tabela in ordem:
+                    cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {_identificador(cursor, tabela.name)})")
+                    if cursor.fetchone()[0]:
+                        sys.exit(f"A tabela {tabela.name} já tem dados; use --substituir para apagá-los")
+
+            cursor.execute(f"TRUNCATE {nomes} RESTART IDENTITY CASCADE")
+            indices = _indices_secundarios(cursor, conhecidas)
+            for nome, _ in indices:
+                cursor.execute(f"DROP INDEX {_identificador(cursor, nome)}")
+
+            for item in itens:
+                t0 = time.perf_counter()
+                with origem.open(item["arquivo"]) as entrada:
+                    cursor.copy_expert(
+                        f"COPY {_identificador(cursor, item['nome'])} ({_lista_colunas(cursor, item['colunas'])}) "
+                        "FROM STDIN (FORMAT binary)",
+                        entrada,
+                    )
+                print(f"  {item['nome']:<24}{item['linhas'] if item['linhas'] is not None else '?':>10} linhas  {time.perf_counter() - t0:.2f}s")
+
+            t0 = time.perf_counter()
+            for _, definicao in indices:
+                cursor.execute(definicao)
+            print(f"  {len(indices)} índices recriados em {time.perf_counter() - t0:.2f}s")
+            _acertar_sequencias(cursor, ordem)
+            for tabela in ordem:
+                cursor.execute(f"ANALYZE {_identificador(cursor, tabela.name)}")
+            conexao.commit()
+        except BaseException:
+            conexao.rollback()
+            raise
+        finally:
+            conexao.close()
+    print(f"✓ Snapshot de {manifesto['criado_em']} restaurado ({time.perf_counter() - inicio:.1f}s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Snapshot e restauração do banco com COPY binário")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+    p_criar = comandos.add_parser("criar", help="grava todas as tabelas em um arquivo .zip")
+    p_criar.add_argument("arquivo")
+    p_criar.add_argument("--compressao", type=int, default=1, choices=range(0, 10), help="nível do deflate (0 a 9)")
+    p_restaurar = comandos.add_parser("restaurar", help="carrega um snapshot neste banco")
+    p_restaurar.add_argument("arquivo")
+    p_restaurar.add_argument("--substituir", action="store_true", help="apaga os dados atuais antes de carregar")
+    args = parser.parse_args()
+
+    if engine.dialect.name != "postgresql":
+        sys.exit("Snapshot e restauração exigem Postgres (COPY binário)")
+    if args.comando == "criar":
+        criar(args.arquivo, args.compressao)
+    else:
+        restaurar(args.arquivo, args.substituir)
+
+
+if __name__ == "__main__":
+    main()